@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Maintenance commands for the training management backend.
+
+Run from the backend directory (uses the same .env as server.py):
+    python manage.py migrate-report-photos
+    python manage.py check-indexes
+    python manage.py ensure-indexes [--drop-extra]
+    python manage.py dedupe-unique-keys [--apply]
+    python manage.py refresh-report-listings   # after upgrading; see below
+    python manage.py rebuild-session-stats [--session-id ID]
+    python manage.py rescore-test --test-id ID
+    python manage.py benchmark-docx-tables [--rows N]
+
+Upgrading: the admin report listing filters and searches on company_id, program_id,
+search_text and has_session copied onto each training report. The server backfills reports
+that lack them in the background at startup (BACKFILL_REPORT_LISTINGS_ON_STARTUP=false turns
+that off); with it off, run refresh-report-listings once after deploying, or filtered and
+searched listings will not include older reports.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+
+from server import (
+    db, client, TRAINING_REPORT_PHOTO_FIELDS, store_report_photo, reconcile_indexes, dedupe_unique_keys, DEDUPE_RULES,
+    refresh_report_listing_fields, rebuild_session_stats, rescore_test_results
+)
+from docx_report import benchmark_table_rows
+
+
+async def migrate_report_photos(args):
+    """Move inline base64 photos out of existing training_reports documents into REPORT_PHOTOS_DIR"""
+    query = {"$or": [{field: {"$regex": "^data:"}} for field in TRAINING_REPORT_PHOTO_FIELDS]}
+    projection = {field: 1 for field in TRAINING_REPORT_PHOTO_FIELDS}
+    projection["session_id"] = 1
+
+    migrated = 0
+    failed = 0
+    # Small batches so only a handful of multi-MB documents are held in memory at once
+    async for report in db.training_reports.find(query, projection).batch_size(10):
+        update_data = {}
+        for field in TRAINING_REPORT_PHOTO_FIELDS:
+            value = report.get(field)
+            try:
+                stored = store_report_photo(value)
+            except ValueError as e:
+                logging.error(f"Skipping {field} for session {report.get('session_id')}: {str(e)}")
+                failed += 1
+                continue
+            if stored != value:
+                update_data[field] = stored
+
+        if update_data:
+            await db.training_reports.update_one({"_id": report["_id"]}, {"$set": update_data})
+            migrated += 1
+
+    print(f"✅ Migrated photos for {migrated} training reports ({failed} photos skipped)")
+
+
+async def check_indexes(args):
+    """Report missing, extra, conflicting and building indexes without changing anything"""
+    report = await reconcile_indexes(create_missing=False)
+    print(json.dumps(report, indent=2, default=str))
+
+
+async def ensure_indexes(args):
+    """Create every missing index in INDEX_REGISTRY (and optionally drop unregistered ones)"""
+    report = await reconcile_indexes(create_missing=True, drop_extra=args.drop_extra)
+    print(json.dumps(report, indent=2, default=str))
+
+
+async def dedupe_unique(args):
+    """Merge duplicate rows and deactivate duplicate-email users that block the unique indexes"""
+    report = await dedupe_unique_keys(apply=args.apply)
+    print(json.dumps(report, indent=2, default=str))
+    groups = ", ".join(f"{len(report[name])} {name}" for name in DEDUPE_RULES)
+    if not args.apply:
+        print(f"Dry run: duplicate groups in {groups}, {len(report['users'])} duplicated emails; rerun with --apply")
+        return
+    # Merged attendance and access rows change the session counters
+    for session_id in report["sessions"]:
+        await rebuild_session_stats(session_id)
+    print(f"✅ Merged duplicate groups in {groups} and resolved {len(report['users'])} duplicate emails")
+    print(json.dumps(await reconcile_indexes(create_missing=True), indent=2, default=str))
+
+
+async def refresh_report_listings(args):
+    """Backfill the company/program/date/search fields the admin report listing filters on"""
+    updated = await refresh_report_listing_fields({})
+    print(f"✅ Refreshed listing fields for {updated} training reports")
+
+
+async def rebuild_stats(args):
+    """Recompute session_stats from participant_access, test_results, attendance, checklists and feedback"""
+    rebuilt = await rebuild_session_stats(args.session_id)
+    print(f"✅ Rebuilt stats for {rebuilt} sessions")
+
+
+async def rescore_test(args):
+    """Rescore every stored result of a test against its current answer key"""
+    if not args.test_id:
+        raise SystemExit("rescore-test requires --test-id")
+    outcome = await rescore_test_results(args.test_id)
+    print(f"✅ Rescored {outcome['rescored']} results ({outcome['changed']} changed)")
+
+
+async def benchmark_docx_tables(args):
+    """Time filling a report table row by row (python-docx add_row) versus add_table_rows"""
+    timings = benchmark_table_rows(args.rows)
+    print(json.dumps(timings, indent=2))
+    speedup = timings["row_by_row_seconds"] / timings["bulk_seconds"] if timings["bulk_seconds"] else float("inf")
+    print(f"✅ {args.rows} rows: {timings['row_by_row_seconds']:.3f}s row by row, {timings['bulk_seconds']:.3f}s bulk ({speedup:.0f}x)")
+
+
+COMMANDS = {
+    "migrate-report-photos": migrate_report_photos,
+    "check-indexes": check_indexes,
+    "ensure-indexes": ensure_indexes,
+    "dedupe-unique-keys": dedupe_unique,
+    "refresh-report-listings": refresh_report_listings,
+    "rebuild-session-stats": rebuild_stats,
+    "rescore-test": rescore_test,
+    "benchmark-docx-tables": benchmark_docx_tables,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Training management maintenance commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("--drop-extra", action="store_true", help="ensure-indexes: drop indexes not in the registry")
+    parser.add_argument("--apply", action="store_true", help="dedupe-unique-keys: write the merges instead of only reporting them")
+    parser.add_argument("--session-id", help="rebuild-session-stats: only rebuild this session")
+    parser.add_argument("--test-id", help="rescore-test: the test whose results are rescored")
+    parser.add_argument("--rows", type=int, default=500, help="benchmark-docx-tables: table rows to render")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(COMMANDS[args.command](args))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Query, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, UpdateOne, IndexModel, ReturnDocument, ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure, DuplicateKeyError, BulkWriteError
+from bson import ObjectId
 import os
 import logging
 from pathlib import Path
@@ -12,14 +15,33 @@ from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
 from passlib.context import CryptContext
+from cachetools import TTLCache
 import jwt
+import numpy as np
 import random
 import shutil
-import subprocess
 from docx import Document
+from docx.opc.oxml import serialize_part_xml
+from docx.table import _Cell
+from docx.text.paragraph import Paragraph
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 import json
+import csv
+import re
 import asyncio
+import contextvars
+import base64
+import copy
+import io
+import zipfile
+import hashlib
+import time
+import socket
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+from docx_report import build_training_report_docx
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -34,9 +56,37 @@ logging.info(f"🔥🔥🔥 CONNECTED TO DATABASE: {db_name} 🔥🔥🔥")
 # Security
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+# Lifetime of the single-URL tokens that let the browser download a file natively (no auth header)
+DOWNLOAD_TOKEN_SECONDS = int(os.environ.get('DOWNLOAD_TOKEN_SECONDS', 60))
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 
+# Password hashing pool - bcrypt is CPU bound (~200ms) and must not run on the event loop
+# PASSWORD_POOL_KIND is "thread" (bcrypt releases the GIL) or "process"
+PASSWORD_POOL_KIND = os.environ.get('PASSWORD_POOL_KIND', 'thread')
+PASSWORD_POOL_WORKERS = int(os.environ.get('PASSWORD_POOL_WORKERS', str(os.cpu_count() or 2)))
+PASSWORD_POOL_MAX_QUEUE = int(os.environ.get('PASSWORD_POOL_MAX_QUEUE', '64'))
+if PASSWORD_POOL_KIND == 'process':
+    password_executor = ProcessPoolExecutor(max_workers=PASSWORD_POOL_WORKERS)
+else:
+    password_executor = ThreadPoolExecutor(max_workers=PASSWORD_POOL_WORKERS, thread_name_prefix="password")
+password_pool_stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "in_flight": 0, "total_seconds": 0.0}
+
+# DOCX report pool - python-docx construction is CPU bound, so reports are built in worker
+# processes from a plain-dict snapshot. Spawned workers only import docx_report, not this module.
+DOCX_POOL_WORKERS = int(os.environ.get('DOCX_POOL_WORKERS', str(min(4, os.cpu_count() or 2))))
+docx_executor = ProcessPoolExecutor(max_workers=DOCX_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+# Authenticated user cache (bounded LRU with TTL) used by get_current_user.
+# invalidate_cached_user only clears the cache of the worker that made the change, so other
+# workers keep serving the old user - including role and is_active - for up to
+# USER_CACHE_TTL_SECONDS. Keep the TTL short; set it to 0 to disable the cache.
+USER_CACHE_MAX_SIZE = int(os.environ.get('USER_CACHE_MAX_SIZE', '2048'))
+USER_CACHE_TTL_SECONDS = int(os.environ.get('USER_CACHE_TTL_SECONDS', '15'))
+user_cache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+user_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
 # Create the main app
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
@@ -50,6 +100,8 @@ CERTIFICATE_DIR = STATIC_DIR / "certificates"
 CERTIFICATE_DIR.mkdir(exist_ok=True)
 CERTIFICATE_PDF_DIR = STATIC_DIR / "certificates_pdf"
 CERTIFICATE_PDF_DIR.mkdir(exist_ok=True)
+CERTIFICATE_CACHE_DIR = STATIC_DIR / "certificate_cache"
+CERTIFICATE_CACHE_DIR.mkdir(exist_ok=True)
 REPORT_DIR = STATIC_DIR / "reports"
 REPORT_DIR.mkdir(exist_ok=True)
 REPORT_PDF_DIR = STATIC_DIR / "reports_pdf"
@@ -60,6 +112,8 @@ TEMPLATE_DIR = STATIC_DIR / "templates"
 TEMPLATE_DIR.mkdir(exist_ok=True)
 CHECKLIST_PHOTOS_DIR = STATIC_DIR / "checklist_photos"
 CHECKLIST_PHOTOS_DIR.mkdir(exist_ok=True)
+REPORT_PHOTOS_DIR = STATIC_DIR / "report_photos"
+REPORT_PHOTOS_DIR.mkdir(exist_ok=True)
 
 # ============ MODELS ============
 
@@ -325,42 +379,527 @@ class AttendanceClockIn(BaseModel):
 class AttendanceClockOut(BaseModel):
     session_id: str
 
-# Helper function to convert DOCX to PDF
-def convert_docx_to_pdf(docx_path: Path, pdf_path: Path) -> bool:
-    """Convert DOCX to PDF using LibreOffice"""
-    try:
-        # Verify input file exists
-        if not docx_path.exists():
-            logging.error(f"DOCX file not found: {docx_path}")
-            return False
+class AttendanceBatch(BaseModel):
+    session_id: str
+    action: str  # "clock_in" or "clock_out"
+    participant_ids: List[str] = []
+    id_numbers: List[str] = []
+
+# ============ DOCUMENT CONVERSION ============
+
+# DOCX -> PDF runs on a pool of warm headless office instances. Each worker owns one soffice
+# process with its own profile directory and UNO listener port, so conversions never share a
+# profile and skip the multi-second cold start. Without the python UNO bindings the workers
+# fall back to one `--convert-to` process per job, still on their own profile.
+OFFICE_BINARY = os.environ.get('OFFICE_BINARY', 'libreoffice')
+OFFICE_POOL_SIZE = int(os.environ.get('OFFICE_POOL_SIZE', 2))
+# Every API worker process runs its own pool, so listener ports and profiles must not be shared
+# between processes: unless OFFICE_BASE_PORT pins them (base + worker index, one process only),
+# each listener takes a free port from the OS, and profiles live under a per-pid directory.
+OFFICE_BASE_PORT = int(os.environ['OFFICE_BASE_PORT']) if os.environ.get('OFFICE_BASE_PORT') else None
+OFFICE_PROFILE_DIR = Path(os.environ.get('OFFICE_PROFILE_DIR', '/tmp/office_profiles'))
+OFFICE_JOB_TIMEOUT_SECONDS = float(os.environ.get('OFFICE_JOB_TIMEOUT_SECONDS', 30))
+OFFICE_STARTUP_TIMEOUT_SECONDS = float(os.environ.get('OFFICE_STARTUP_TIMEOUT_SECONDS', 30))
+# Conversions allowed to wait for a worker before new ones are rejected with 503
+OFFICE_MAX_QUEUE = int(os.environ.get('OFFICE_MAX_QUEUE', 16))
+OFFICE_RETRY_AFTER_SECONDS = int(os.environ.get('OFFICE_RETRY_AFTER_SECONDS', 5))
+
+try:
+    import uno
+except ImportError:
+    uno = None
+
+def _free_local_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _uno_property(name: str, value):
+    prop = uno.createUnoStruct("com.sun.star.beans.PropertyValue")
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+class OfficeWorker:
+    """One headless office instance with its own profile directory and UNO listener port"""
+    
+    def __init__(self, index: int):
+        self.index = index
+        self.port = OFFICE_BASE_PORT + index if OFFICE_BASE_PORT is not None else None
+        self.process = None
+        self.desktop = None
+        self.started = False
+        self.restarts = 0
+        self.jobs = 0
+        self.busy = False
+    
+    @property
+    def profile_dir(self) -> Path:
+        # Resolved at use, so a pool imported before the server forks its workers still splits by pid
+        return OFFICE_PROFILE_DIR / str(os.getpid()) / f"worker_{self.index}"
+    
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+    
+    async def ensure_started(self):
+        """Start the listener, or restart it if it has crashed or was killed after a timeout"""
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        if uno is None or self.alive:
+            return
+        if self.started:
+            self.restarts += 1
+            logging.warning(f"Restarting office worker {self.index}")
+        self.started = True
+        self.desktop = None
+        if OFFICE_BASE_PORT is None:
+            self.port = _free_local_port()
+        self.process = await asyncio.create_subprocess_exec(
+            OFFICE_BINARY, '--headless', '--invisible', '--nologo', '--norestore', '--nodefault',
+            f'-env:UserInstallation={self.profile_dir.as_uri()}',
+            f'--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext',
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        
+        deadline = time.monotonic() + OFFICE_STARTUP_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            if not self.alive:
+                raise RuntimeError(f"Office worker {self.index} exited during startup")
+            try:
+                _, writer = await asyncio.open_connection('127.0.0.1', self.port)
+                writer.close()
+                return
+            except OSError:
+                await asyncio.sleep(0.25)
+        await self.stop()
+        raise RuntimeError(f"Office worker {self.index} did not start listening on port {self.port}")
+    
+    async def stop(self):
+        self.desktop = None
+        if self.alive:
+            self.process.kill()
+            await self.process.wait()
+    
+    @property
+    def interruptible(self) -> bool:
+        """CLI conversions can be killed mid-job; a UNO call on a thread has to run to completion"""
+        return uno is None
+    
+    async def convert(self, docx_path: Path, pdf_path: Path):
+        """
+        Convert into a fresh staging directory and move the result onto pdf_path, so an existing
+        pdf_path (a hard link into the certificate cache, say) is replaced instead of overwritten
+        """
+        staging_dir = pdf_path.parent / f".convert_{uuid.uuid4().hex}"
+        staging_dir.mkdir()
+        staged_path = staging_dir / f"{docx_path.stem}.pdf"
+        try:
+            if uno is None:
+                await self._convert_with_cli(docx_path, staged_path)
+            else:
+                await asyncio.to_thread(self._convert_with_uno, docx_path, staged_path)
+            os.replace(staged_path, pdf_path)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+    
+    def _convert_with_uno(self, docx_path: Path, pdf_path: Path):
+        if self.desktop is None:
+            local_context = uno.getComponentContext()
+            resolver = local_context.ServiceManager.createInstanceWithContext(
+                "com.sun.star.bridge.UnoUrlResolver", local_context
+            )
+            context = resolver.resolve(
+                f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+            )
+            self.desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
         
-        # Use LibreOffice in headless mode to convert DOCX to PDF
-        result = subprocess.run([
-            'libreoffice',
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(str(docx_path.resolve())), "_blank", 0, (_uno_property("Hidden", True),)
+        )
+        if document is None:
+            raise RuntimeError(f"Office could not load {docx_path.name}")
+        try:
+            document.storeToURL(
+                uno.systemPathToFileUrl(str(pdf_path.resolve())),
+                (_uno_property("FilterName", "writer_pdf_Export"),)
+            )
+        finally:
+            document.close(True)
+    
+    async def _convert_with_cli(self, docx_path: Path, pdf_path: Path):
+        process = await asyncio.create_subprocess_exec(
+            OFFICE_BINARY,
             '--headless',
+            f'-env:UserInstallation={self.profile_dir.as_uri()}',
             '--convert-to', 'pdf',
             '--outdir', str(pdf_path.parent),
-            str(docx_path)
-        ], check=True, capture_output=True, timeout=30)
+            str(docx_path),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            # Timed out or the client went away: don't leave the office process running
+            process.kill()
+            await process.wait()
+            raise
         
-        # Verify output file was created
+        if process.returncode != 0:
+            raise RuntimeError(f"LibreOffice exited with {process.returncode}: {stderr.decode(errors='replace')}")
+        output_path = pdf_path.parent / f"{docx_path.stem}.pdf"
+        if output_path != pdf_path and output_path.exists():
+            output_path.replace(pdf_path)
         if not pdf_path.exists():
-            logging.error(f"PDF file was not created: {pdf_path}")
-            logging.error(f"LibreOffice output: {result.stdout.decode()}")
-            logging.error(f"LibreOffice errors: {result.stderr.decode()}")
-            return False
+            raise RuntimeError(f"PDF was not created: {stderr.decode(errors='replace')}")
+
+class OfficeConversionPool:
+    """Dispatches conversion jobs from a queue to a fixed set of OfficeWorkers"""
+    
+    def __init__(self, size: int):
+        self.workers = [OfficeWorker(index) for index in range(size)]
+        self.queue = None
+        self.slots = None
+        self.tasks = []
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "cancelled": 0, "rejected": 0}
+        self.latencies = deque(maxlen=500)
+        self.wait_times = deque(maxlen=500)
+        self.completed_at = deque(maxlen=5000)
+    
+    async def start(self):
+        if uno is None:
+            logging.warning(
+                "⚠️ Python UNO bindings not importable (install python3-uno and run the backend on a "
+                "Python that can see them); office workers fall back to a cold `--convert-to` run per job"
+            )
+        self.queue = asyncio.Queue()
+        # Global admission limit: one slot per worker plus OFFICE_MAX_QUEUE waiting jobs
+        self.slots = asyncio.Semaphore(len(self.workers) + OFFICE_MAX_QUEUE)
+        self.tasks = [asyncio.create_task(self._run(worker)) for worker in self.workers]
+    
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        for worker in self.workers:
+            await worker.stop()
+        shutil.rmtree(OFFICE_PROFILE_DIR / str(os.getpid()), ignore_errors=True)
+    
+    async def convert(self, docx_path: Path, pdf_path: Path, timeout: float = OFFICE_JOB_TIMEOUT_SECONDS):
+        """
+        Queue a conversion and wait for it; raises on failure or timeout, and with 503 when the
+        pool and its wait queue are full. Cancelling the caller drops a queued job and kills a
+        running CLI conversion.
+        """
+        if not docx_path.exists():
+            raise FileNotFoundError(f"DOCX file not found: {docx_path}")
+        if self.slots.locked():
+            self.stats["rejected"] += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Document conversion is busy, please try again shortly",
+                headers={"Retry-After": str(OFFICE_RETRY_AFTER_SECONDS)}
+            )
         
-        return True
-    except subprocess.TimeoutExpired:
-        logging.error("PDF conversion timed out after 30 seconds")
-        return False
-    except subprocess.CalledProcessError as e:
-        logging.error(f"LibreOffice conversion failed: {e.stderr.decode() if e.stderr else str(e)}")
-        return False
+        async with self.slots:
+            future = asyncio.get_running_loop().create_future()
+            self.stats["submitted"] += 1
+            await self.queue.put((docx_path, pdf_path, timeout, future, time.monotonic()))
+            return await future
+    
+    async def _run(self, worker: OfficeWorker):
+        try:
+            await worker.ensure_started()
+        except Exception as e:
+            logging.error(f"Office worker {worker.index} failed to start: {str(e)}")
+        
+        while True:
+            docx_path, pdf_path, timeout, future, queued_at = await self.queue.get()
+            if future.done():
+                # The caller gave up while the job was still queued
+                self.stats["cancelled"] += 1
+                continue
+            started_at = time.monotonic()
+            self.wait_times.append(started_at - queued_at)
+            worker.busy = True
+            try:
+                await worker.ensure_started()
+                job = asyncio.ensure_future(asyncio.wait_for(worker.convert(docx_path, pdf_path), timeout))
+                if worker.interruptible:
+                    future.add_done_callback(lambda f, job=job: job.cancel() if f.cancelled() else None)
+                await job
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                self.stats["cancelled"] += 1
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                self.stats["failed"] += 1
+                # A hung instance is killed; the next job restarts it
+                await worker.stop()
+                if not future.done():
+                    future.set_exception(TimeoutError(f"PDF conversion timed out after {timeout:.0f} seconds"))
+            except Exception as e:
+                self.stats["failed"] += 1
+                worker.desktop = None
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                finished_at = time.monotonic()
+                self.stats["completed"] += 1
+                self.latencies.append(finished_at - started_at)
+                self.completed_at.append(finished_at)
+                if not future.done():
+                    future.set_result(pdf_path)
+            finally:
+                worker.jobs += 1
+                worker.busy = False
+    
+    def get_stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        now = time.monotonic()
+        return {
+            **self.stats,
+            "mode": "cli" if uno is None else "uno",
+            "size": len(self.workers),
+            "queued": self.queue.qsize() if self.queue else 0,
+            "busy": sum(1 for worker in self.workers if worker.busy),
+            "restarts": sum(worker.restarts for worker in self.workers),
+            "completed_last_minute": sum(1 for finished_at in self.completed_at if now - finished_at <= 60),
+            "avg_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0,
+            "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1) if latencies else 0,
+            "avg_wait_ms": round(sum(self.wait_times) / len(self.wait_times) * 1000, 1) if self.wait_times else 0,
+            "workers": [
+                {"index": worker.index, "alive": worker.alive, "busy": worker.busy,
+                 "jobs": worker.jobs, "restarts": worker.restarts}
+                for worker in self.workers
+            ]
+        }
+
+office_pool = OfficeConversionPool(OFFICE_POOL_SIZE)
+
+async def convert_docx_to_pdf(docx_path: Path, pdf_path: Path) -> bool:
+    """
+    Convert DOCX to PDF on the office worker pool without blocking the event loop.
+    Conversions run inside jobs; cancelling the job (POST /jobs/{job_id}/cancel) cancels this
+    call, which drops a queued conversion or kills a running CLI one.
+    """
+    try:
+        await office_pool.convert(docx_path, pdf_path)
+        return pdf_path.exists()
+    except HTTPException:
+        raise
     except Exception as e:
-        logging.error(f"PDF conversion failed: {str(e)}")
+        logging.error(f"PDF conversion failed for {docx_path.name}: {str(e)}")
+        return False
+
+# ============ CERTIFICATE RENDERING ============
+
+CERTIFICATE_TEMPLATE_PATH = TEMPLATE_DIR / "certificate_template.docx"
+CERTIFICATE_PLACEHOLDERS = (
+    '«PARTICIPANT_NAME»', '«IC_NUMBER»', '«COMPANY_NAME»', '«PROGRAMME NAME»',
+    '<<PROGRAMME NAME>>', '«VENUE»', '«DATE»'
+)
+
+# Rendered certificate PDFs are cached by a hash of the template bytes and the replacement
+# values, so regenerating an unchanged certificate skips both the render and the conversion.
+CERTIFICATE_CACHE_MAX_MB = int(os.environ.get('CERTIFICATE_CACHE_MAX_MB', 512))
+certificate_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "scans": 0}
+# Upper bound on the cache's own disk use since the last scan: every store adds its file size,
+# a scan resets it to the measured value. The directory is only scanned once this crosses the limit.
+certificate_cache_size = {"bytes": None}
+certificate_cache_lock = threading.Lock()
+
+class CompiledCertificateTemplate:
+    """
+    Certificate template parsed once, with the body paragraphs and table cells that hold
+    placeholders located up front. A render deep-copies only the document XML, fills those
+    elements and zips it back up with the template's other parts unchanged.
+    """
+    
+    def __init__(self, template_bytes: bytes):
+        self.digest = hashlib.sha256(template_bytes).hexdigest()
+        document = Document(io.BytesIO(template_bytes))
+        self.root = document.element
+        self.document_part_name = document.part.partname.lstrip('/')
+        
+        # Positions are indexes into root.iter(), which a deep copy preserves
+        positions = {element: index for index, element in enumerate(self.root.iter())}
+        self.paragraph_positions = [
+            positions[paragraph._p] for paragraph in document.paragraphs
+            if self._has_placeholder(paragraph.text)
+        ]
+        cells = {}
+        for table in document.tables:
+            for row in table.rows:
+                for cell in row.cells:
+                    if self._has_placeholder(cell.text):
+                        cells[cell._tc] = positions[cell._tc]
+        self.cell_positions = list(cells.values())
+        
+        with zipfile.ZipFile(io.BytesIO(template_bytes)) as archive:
+            self.document_info = archive.getinfo(self.document_part_name)
+            self.parts = [
+                (info, archive.read(info.filename)) for info in archive.infolist()
+                if info.filename != self.document_part_name
+            ]
+    
+    @staticmethod
+    def _has_placeholder(text: str) -> bool:
+        return any(key in text for key in CERTIFICATE_PLACEHOLDERS)
+    
+    def render(self, replacements: dict) -> bytes:
+        """Return the DOCX bytes for one certificate"""
+        root = copy.deepcopy(self.root)
+        elements = list(root.iter())
+        
+        for position in self.paragraph_positions:
+            paragraph = Paragraph(elements[position], None)
+            for key, value in replacements.items():
+                if key in paragraph.text:
+                    paragraph.text = paragraph.text.replace(key, value)
+        
+        for position in self.cell_positions:
+            cell = _Cell(elements[position], None)
+            for key, value in replacements.items():
+                if key in cell.text:
+                    cell.text = cell.text.replace(key, value)
+        
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for info, data in self.parts:
+                archive.writestr(info, data)
+            archive.writestr(self.document_info, serialize_part_xml(root))
+        return buffer.getvalue()
+
+_compiled_certificate_template = {"signature": None, "template": None}
+
+def get_certificate_template() -> Optional[CompiledCertificateTemplate]:
+    """Compiled certificate template, recompiled when the file on disk changes"""
+    if not CERTIFICATE_TEMPLATE_PATH.exists():
+        return None
+    stat = CERTIFICATE_TEMPLATE_PATH.stat()
+    signature = (stat.st_mtime_ns, stat.st_size)
+    if _compiled_certificate_template["signature"] != signature:
+        _compiled_certificate_template["template"] = CompiledCertificateTemplate(CERTIFICATE_TEMPLATE_PATH.read_bytes())
+        _compiled_certificate_template["signature"] = signature
+    return _compiled_certificate_template["template"]
+
+def invalidate_certificate_template():
+    """Drop the compiled template and every cached certificate PDF rendered from earlier templates"""
+    _compiled_certificate_template["signature"] = None
+    _compiled_certificate_template["template"] = None
+    removed = 0
+    for entry in CERTIFICATE_CACHE_DIR.glob("*.pdf"):
+        entry.unlink(missing_ok=True)
+        removed += 1
+    certificate_cache_size["bytes"] = 0
+    certificate_cache_stats["invalidations"] += 1
+    return removed
+
+def certificate_cache_key(template: CompiledCertificateTemplate, replacements: dict) -> str:
+    payload = json.dumps([template.digest, sorted(replacements.items())], ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _link_or_copy(source: Path, destination: Path):
+    """Atomically place `source` at `destination`, sharing storage via a hard link when possible"""
+    tmp_path = destination.with_name(f".{destination.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, destination)
+
+def evict_certificate_cache():
+    """
+    Remove least recently used cache entries until the cache fits CERTIFICATE_CACHE_MAX_MB.
+    Only entries whose inode has no other link count: an entry still hard linked to a served
+    certificate PDF takes no extra space, and removing it would free nothing.
+    """
+    entries = []
+    for entry in os.scandir(CERTIFICATE_CACHE_DIR):
+        if not entry.name.endswith(".pdf"):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        if stat.st_nlink == 1:
+            entries.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+    total = sum(size for _, size, _ in entries)
+    limit = CERTIFICATE_CACHE_MAX_MB * 1024 * 1024
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        certificate_cache_stats["evictions"] += 1
+    certificate_cache_stats["scans"] += 1
+    return total
+
+def restore_cached_certificate(key: str, pdf_path: Path) -> bool:
+    cached_path = CERTIFICATE_CACHE_DIR / f"{key}.pdf"
+    try:
+        _link_or_copy(cached_path, pdf_path)
+        os.utime(cached_path)  # mark as recently used
+        return True
+    except FileNotFoundError:
         return False
 
+def store_cached_certificate(key: str, pdf_path: Path):
+    _link_or_copy(pdf_path, CERTIFICATE_CACHE_DIR / f"{key}.pdf")
+    limit = CERTIFICATE_CACHE_MAX_MB * 1024 * 1024
+    with certificate_cache_lock:
+        if certificate_cache_size["bytes"] is not None:
+            certificate_cache_size["bytes"] += pdf_path.stat().st_size
+            if certificate_cache_size["bytes"] <= limit:
+                return
+        # First store since startup, or the estimate crossed the limit: measure and evict
+        certificate_cache_size["bytes"] = evict_certificate_cache()
+
+def build_certificate_replacements(participant: dict, session: dict, program_name: str, company_name: str) -> dict:
+    return {
+        '«PARTICIPANT_NAME»': participant['full_name'],
+        '«IC_NUMBER»': participant['id_number'],
+        '«COMPANY_NAME»': company_name,
+        '«PROGRAMME NAME»': program_name,
+        '<<PROGRAMME NAME>>': program_name,
+        '«VENUE»': session['location'],
+        '«DATE»': session['end_date']
+    }
+
+async def render_certificate_pdf(
+    template: CompiledCertificateTemplate,
+    replacements: dict,
+    participant_id: str,
+    session_id: str
+) -> Optional[str]:
+    """
+    Render one certificate to CERTIFICATE_DIR and convert it; returns the PDF filename or None.
+    An unchanged certificate is served from the render cache without rendering or converting.
+    """
+    pdf_filename = f"certificate_{participant_id}_{session_id}.pdf"
+    pdf_path = CERTIFICATE_PDF_DIR / pdf_filename
+    cache_key = certificate_cache_key(template, replacements)
+    if await asyncio.to_thread(restore_cached_certificate, cache_key, pdf_path):
+        certificate_cache_stats["hits"] += 1
+        return pdf_filename
+    certificate_cache_stats["misses"] += 1
+    
+    docx_bytes = await asyncio.to_thread(template.render, replacements)
+    cert_path = CERTIFICATE_DIR / f"certificate_{participant_id}_{session_id}.docx"
+    await asyncio.to_thread(cert_path.write_bytes, docx_bytes)
+    
+    if not await convert_docx_to_pdf(cert_path, pdf_path) or not pdf_path.exists():
+        return None
+    
+    try:
+        await asyncio.to_thread(store_cached_certificate, cache_key, pdf_path)
+    except OSError as e:
+        logging.warning(f"Could not cache certificate {pdf_filename}: {str(e)}")
+    return pdf_filename
+
 class ChecklistItem(BaseModel):
     item: str
     status: str  # "good", "needs_repair"
@@ -535,12 +1074,124 @@ class FeedbackTemplateUpdate(BaseModel):
 
 # ============ HELPER FUNCTIONS ============
 
-def hash_password(password: str) -> str:
+# Training report photo fields that the coordinator dashboard sends as data URLs
+TRAINING_REPORT_PHOTO_FIELDS = [
+    "group_photo",
+    "theory_photo_1",
+    "theory_photo_2",
+    "practical_photo_1",
+    "practical_photo_2",
+    "practical_photo_3",
+]
+
+PHOTO_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/heic": "heic",
+}
+
+def store_report_photo(photo: Optional[str]) -> Optional[str]:
+    """
+    Decode a base64 data URL into REPORT_PHOTOS_DIR and return its static URL.
+    Files are named by content hash so re-saving the same photo is a no-op.
+    Anything that is not a data URL (an existing reference, empty string, None) is returned unchanged.
+    """
+    if not photo or not photo.startswith("data:"):
+        return photo
+    
+    header, _, encoded = photo.partition(",")
+    if ";base64" not in header or not encoded:
+        raise ValueError("Photo must be a base64 encoded data URL")
+    
+    mime_type = header[len("data:"):].split(";")[0].lower()
+    if not mime_type.startswith("image/"):
+        raise ValueError(f"Unsupported photo type: {mime_type or 'unknown'}")
+    
+    try:
+        content = base64.b64decode(encoded, validate=True)
+    except (ValueError, TypeError):
+        raise ValueError("Photo data is not valid base64")
+    
+    extension = PHOTO_EXTENSIONS.get(mime_type, "jpg")
+    filename = f"{hashlib.sha256(content).hexdigest()}.{extension}"
+    file_path = REPORT_PHOTOS_DIR / filename
+    if not file_path.exists():
+        tmp_path = file_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(content)
+        tmp_path.replace(file_path)
+    
+    return f"/api/static/report-photos/{filename}"
+
+def store_report_photos(report_data: dict) -> dict:
+    """Replace inline data URL photos in a training report dict with stored file references"""
+    for field in TRAINING_REPORT_PHOTO_FIELDS:
+        if field in report_data:
+            report_data[field] = store_report_photo(report_data[field])
+    return report_data
+
+def _bcrypt_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+def _bcrypt_verify(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+async def run_password_job(func, *args, reject_when_busy: bool = True):
+    """Run a password hashing job on password_executor, rejecting with 503 when the queue is full"""
+    if reject_when_busy and password_pool_stats["in_flight"] >= PASSWORD_POOL_WORKERS + PASSWORD_POOL_MAX_QUEUE:
+        password_pool_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please try again shortly",
+            headers={"Retry-After": "1"}
+        )
+    
+    password_pool_stats["submitted"] += 1
+    password_pool_stats["in_flight"] += 1
+    started = time.perf_counter()
+    try:
+        result = await asyncio.get_running_loop().run_in_executor(password_executor, func, *args)
+        password_pool_stats["completed"] += 1
+        return result
+    except Exception:
+        password_pool_stats["failed"] += 1
+        raise
+    finally:
+        password_pool_stats["in_flight"] -= 1
+        password_pool_stats["total_seconds"] += time.perf_counter() - started
+
+async def hash_password(password: str) -> str:
+    return await run_password_job(_bcrypt_hash, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await run_password_job(_bcrypt_verify, plain_password, hashed_password)
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """
+    Hash a batch of passwords in parallel for bulk provisioning.
+    At most PASSWORD_POOL_WORKERS jobs are queued at a time so logins can interleave,
+    and the batch waits for capacity instead of being rejected.
+    """
+    semaphore = asyncio.Semaphore(PASSWORD_POOL_WORKERS)
+    
+    async def hash_one(password: str) -> str:
+        async with semaphore:
+            return await run_password_job(_bcrypt_hash, password, reject_when_busy=False)
+    
+    return await asyncio.gather(*(hash_one(password) for password in passwords))
+
+def get_password_pool_stats() -> dict:
+    finished = password_pool_stats["completed"] + password_pool_stats["failed"]
+    return {
+        **password_pool_stats,
+        "kind": PASSWORD_POOL_KIND,
+        "workers": PASSWORD_POOL_WORKERS,
+        "max_queue": PASSWORD_POOL_MAX_QUEUE,
+        "avg_ms": round(password_pool_stats["total_seconds"] / finished * 1000, 1) if finished else 0.0
+    }
+
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(days=7)):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + expires_delta
@@ -548,27 +1199,82 @@ def create_access_token(data: dict, expires_delta: timedelta = timedelta(days=7)
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def invalidate_cached_user(user_id: Optional[str] = None):
+    """Evict a user from the auth cache, or clear the whole cache when no id is given"""
+    if user_id is None:
+        user_cache.clear()
+    else:
+        user_cache.pop(user_id, None)
+    user_cache_stats["invalidations"] += 1
+
+def get_user_cache_stats() -> dict:
+    lookups = user_cache_stats["hits"] + user_cache_stats["misses"]
+    return {
+        **user_cache_stats,
+        "hit_rate": round(user_cache_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "size": len(user_cache),
+        "max_size": USER_CACHE_MAX_SIZE,
+        "ttl_seconds": USER_CACHE_TTL_SECONDS
+    }
+
+async def load_authenticated_user(user_id: str) -> User:
+    """The user a verified token names, from the auth cache when possible"""
+    cached_user = user_cache.get(user_id)
+    if cached_user is not None:
+        user_cache_stats["hits"] += 1
+        # Callers get their own copy; the cached instance is shared across requests
+        return cached_user.model_copy()
+    user_cache_stats["misses"] += 1
+    
+    user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0, "hashed_password": 0})
+    if not user_doc:
+        raise HTTPException(status_code=401, detail="User not found")
+    
+    if isinstance(user_doc.get('created_at'), str):
+        user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
+    
+    user = User(**user_doc)
+    if USER_CACHE_TTL_SECONDS > 0:
+        user_cache[user_id] = user.model_copy()
+    return user
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
-        if user_id is None:
+        # Download tokens only open the one URL they were issued for (get_download_user)
+        if user_id is None or payload.get("scope") == "download":
             raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_doc = await db.users.find_one({"id": user_id}, {"_id": 0})
-        if not user_doc:
-            raise HTTPException(status_code=401, detail="User not found")
-        
-        if isinstance(user_doc.get('created_at'), str):
-            user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
-        
-        return User(**user_doc)
+        return await load_authenticated_user(user_id)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_download_user(
+    request: Request,
+    token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    """
+    Authenticate a file download either with the usual bearer header or with a `token` query
+    parameter from POST /auth/download-token, so a plain link can stream the file to disk
+    """
+    if credentials is not None:
+        return await get_current_user(credentials)
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Download link expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("scope") != "download" or payload.get("path") != request.url.path or not payload.get("sub"):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return await load_authenticated_user(payload["sub"])
+
 async def get_or_create_participant_access(participant_id: str, session_id: str):
     access_doc = await db.participant_access.find_one(
         {"participant_id": participant_id, "session_id": session_id},
@@ -582,10 +1288,156 @@ async def get_or_create_participant_access(participant_id: str, session_id: str)
         )
         doc = access_obj.model_dump()
         await db.participant_access.insert_one(doc)
+        await bump_session_stats(session_id, {"participants": 1})
         return access_obj
     
     return ParticipantAccess(**access_doc)
 
+async def provision_users(candidates: List[tuple], company_id: str) -> List[dict]:
+    """
+    Bulk find-or-create for (user_data, role) candidates, in order.
+    Existing users are matched by fullname OR email OR id_number (any match), including
+    users created earlier in the same batch, and updated with the new details.
+    All candidates are resolved with one query, new passwords are hashed in parallel
+    and all user writes go out in a single bulk_write.
+    When a row's email belongs to a different user than its id_number/full_name, the
+    email's owner is reused (emails are unique) and the row gets a 'conflict' note.
+    If the bulk_write fails, users inserted by it are deleted again before the 400.
+    Returns: one dict per candidate with 'is_existing' flag, 'conflict' note and User
+    """
+    full_names = {data.get("full_name") for data, _ in candidates if data.get("full_name")}
+    emails = {data.get("email") for data, _ in candidates if data.get("email")}
+    id_numbers = {data.get("id_number") for data, _ in candidates if data.get("id_number")}
+    
+    query = []
+    if full_names:
+        query.append({"full_name": {"$in": list(full_names)}})
+    if emails:
+        query.append({"email": {"$in": list(emails)}})
+    if id_numbers:
+        query.append({"id_number": {"$in": list(id_numbers)}})
+    
+    existing_users = []
+    if query:
+        existing_users = await db.users.find(
+            {"$or": query},
+            {"_id": 0, "password": 0, "hashed_password": 0}
+        ).to_list(length=None)
+    
+    # Lookup indexes over existing users plus users created in this batch
+    lookup = {"email": {}, "id_number": {}, "full_name": {}}
+    
+    def index_user(user_doc: dict):
+        for field, users_by_value in lookup.items():
+            if user_doc.get(field):
+                users_by_value.setdefault(user_doc[field], user_doc)
+    
+    for user_doc in existing_users:
+        index_user(user_doc)
+    
+    resolved = []
+    updates = {}
+    update_rows = {}
+    new_users = []
+    for row, (user_data, role) in enumerate(candidates, start=1):
+        other_match = None
+        for field in ("id_number", "full_name"):
+            if user_data.get(field) and user_data[field] in lookup[field]:
+                other_match = lookup[field][user_data[field]]
+                break
+        
+        conflict = None
+        email_owner = lookup["email"].get(user_data.get("email")) if user_data.get("email") else None
+        match = email_owner or other_match
+        if email_owner is not None and other_match is not None and email_owner is not other_match:
+            # The email can't move onto the other user (email_unique), so its owner is reused
+            conflict = f"email already used by {email_owner.get('full_name')}; that account was reused instead of {other_match.get('full_name')}"
+        
+        if match:
+            # User found - update with new data
+            update_data = {
+                "email": user_data.get("email"),
+                "id_number": user_data.get("id_number"),
+                "phone_number": user_data.get("phone_number"),
+                "company_id": company_id,
+            }
+            # Remove None values
+            update_data = {k: v for k, v in update_data.items() if v is not None}
+            match.update(update_data)
+            index_user(match)
+            # Users created earlier in this batch are inserted with the merged data
+            if not match.get("_is_new"):
+                updates.setdefault(match["id"], {}).update(update_data)
+                update_rows.setdefault(match["id"], row)
+            resolved.append((True, match, conflict))
+        else:
+            # User not found - create new
+            new_user = User(
+                email=user_data.get("email"),
+                full_name=user_data.get("full_name"),
+                id_number=user_data.get("id_number"),
+                role=role,
+                company_id=company_id,
+                phone_number=user_data.get("phone_number")
+            )
+            user_doc = new_user.model_dump()
+            user_doc["_is_new"] = True
+            user_doc["_row"] = row
+            index_user(user_doc)
+            new_users.append((user_doc, user_data.get("password")))
+            resolved.append((False, user_doc, None))
+    
+    hashed_passwords = await hash_passwords([password for _, password in new_users])
+    
+    operations = []
+    operation_rows = []
+    for (user_doc, _), hashed_password in zip(new_users, hashed_passwords):
+        insert_doc = {k: v for k, v in user_doc.items() if not k.startswith("_")}
+        insert_doc["created_at"] = insert_doc["created_at"].isoformat()
+        insert_doc["password"] = hashed_password
+        operations.append(InsertOne(insert_doc))
+        operation_rows.append((user_doc["_row"], user_doc))
+    for user_id, update_data in updates.items():
+        operations.append(UpdateOne({"id": user_id}, {"$set": update_data}))
+        operation_rows.append((update_rows[user_id], update_data))
+    
+    if operations:
+        try:
+            await db.users.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Lost a race with a concurrent write of the same email. Users this batch did insert
+            # are deleted again so nothing is orphaned; the $set updates are left, they repeat
+            # harmlessly when the request is retried.
+            failed = []
+            failed_indexes = set()
+            for error in e.details.get('writeErrors', []):
+                failed_indexes.add(error['index'])
+                row, doc = operation_rows[error['index']]
+                reason = "email already used by another user" if error.get('code') == 11000 else error.get('errmsg')
+                failed.append(f"row {row} ({doc.get('email')}): {reason}")
+            inserted_ids = [
+                user_doc["id"] for index, (user_doc, _) in enumerate(new_users) if index not in failed_indexes
+            ]
+            if inserted_ids:
+                await db.users.delete_many({"id": {"$in": inserted_ids}})
+            invalidate_cached_user()
+            raise HTTPException(status_code=400, detail="Some users could not be saved, no new users were created: " + "; ".join(failed))
+    for user_id in updates:
+        invalidate_cached_user(user_id)
+    
+    results = []
+    for is_existing, user_doc, conflict in resolved:
+        user_doc = {k: v for k, v in user_doc.items() if not k.startswith("_")}
+        if isinstance(user_doc.get('created_at'), str):
+            user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
+        results.append({
+            "is_existing": is_existing,
+            "conflict": conflict,
+            "user": User(**user_doc)
+        })
+    
+    return results
+
 async def find_or_create_user(user_data: dict, role: str, company_id: str) -> dict:
     """
     Find existing user by fullname OR email OR id_number (any match)
@@ -593,76 +1445,396 @@ async def find_or_create_user(user_data: dict, role: str, company_id: str) -> di
     If not found: create new user
     Returns: user dict with 'is_existing' flag and user data
     """
-    full_name = user_data.get("full_name")
-    email = user_data.get("email")
-    id_number = user_data.get("id_number")
-    phone_number = user_data.get("phone_number")
+    results = await provision_users([(user_data, role)], company_id)
+    return results[0]
+
+async def provision_participant_access(participant_ids: List[str], session_id: str):
+    """Create any missing participant_access records for a session in one bulk_write"""
+    operations = []
+    for participant_id in dict.fromkeys(participant_ids):
+        access_doc = ParticipantAccess(participant_id=participant_id, session_id=session_id).model_dump()
+        key = {"participant_id": access_doc.pop("participant_id"), "session_id": access_doc.pop("session_id")}
+        operations.append(UpdateOne(key, {"$setOnInsert": access_doc}, upsert=True))
+    if operations:
+        result = await db.participant_access.bulk_write(operations, ordered=False)
+        if result.upserted_count:
+            await bump_session_stats(session_id, {"participants": result.upserted_count})
+
+async def refresh_report_listing_fields(query: dict):
+    """
+    Copy session, company, program and coordinator details onto matching training_reports.
+    The admin report listing filters and text-searches on these fields, so they have to live
+    on the report document to be served from its indexes.
+    """
+    pipeline = [
+        {"$match": query},
+        {"$project": {"session_id": 1, "coordinator_id": 1}},
+        {"$lookup": {"from": "sessions", "localField": "session_id", "foreignField": "id", "as": "session"}},
+        {"$unwind": {"path": "$session", "preserveNullAndEmptyArrays": True}},
+        {"$lookup": {"from": "companies", "localField": "session.company_id", "foreignField": "id", "as": "company"}},
+        {"$lookup": {"from": "programs", "localField": "session.program_id", "foreignField": "id", "as": "program"}},
+        {"$lookup": {"from": "users", "localField": "coordinator_id", "foreignField": "id", "as": "coordinator"}},
+        {"$project": {
+            "has_session": {"$ne": [{"$type": "$session"}, "missing"]},
+            "company_id": "$session.company_id",
+            "program_id": "$session.program_id",
+            "session_name": "$session.name",
+            "session_location": "$session.location",
+            "session_start_date": "$session.start_date",
+            "session_end_date": "$session.end_date",
+            "company_name": {"$arrayElemAt": ["$company.name", 0]},
+            "program_name": {"$arrayElemAt": ["$program.name", 0]},
+            "coordinator_name": {"$arrayElemAt": ["$coordinator.full_name", 0]}
+        }}
+    ]
     
-    # Search for existing user by fullname OR email OR id_number
-    query = {"$or": []}
+    operations = []
+    async for row in db.training_reports.aggregate(pipeline):
+        search_parts = [
+            row.get(field) for field in
+            ("session_name", "coordinator_name", "company_name", "program_name", "session_location")
+        ]
+        operations.append(UpdateOne({"_id": row["_id"]}, {"$set": {
+            "has_session": row["has_session"],
+            "company_id": row.get("company_id"),
+            "program_id": row.get("program_id"),
+            "session_start_date": row.get("session_start_date"),
+            "session_end_date": row.get("session_end_date"),
+            "search_text": " ".join(part for part in search_parts if part)
+        }}))
+    
+    if operations:
+        await db.training_reports.bulk_write(operations, ordered=False)
+    return len(operations)
+
+def csv_row(values: list) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(["" if value is None else value for value in values])
+    return buffer.getvalue()
+
+class _ZipStreamSink(io.RawIOBase):
+    """Unseekable sink for zipfile; the bytes written so far are drained into the response"""
+    
+    def __init__(self):
+        self.chunks = []
+    
+    def writable(self):
+        return True
     
-    if full_name:
-        query["$or"].append({"full_name": full_name})
-    if email:
-        query["$or"].append({"email": email})
-    if id_number:
-        query["$or"].append({"id_number": id_number})
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+    
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+XLSX_ILLEGAL_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def xlsx_text(value) -> str:
+    return XLSX_ILLEGAL_CHARS.sub('', str(value)).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+
+def xlsx_cell(value) -> str:
+    if value is None:
+        return '<c/>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{xlsx_text(value)}</t></is></c>'
+
+class XlsxStreamWriter:
+    """
+    Single-sheet .xlsx written row by row into a streaming ZIP. Cells are inline strings, so no
+    shared string table has to be held in memory; drain() hands back the bytes produced so far.
+    """
     
-    # If no fields provided, skip search
-    if not query["$or"]:
-        query = None
+    def __init__(self, sheet_name: str = "Sheet1"):
+        self.sink = _ZipStreamSink()
+        self.archive = zipfile.ZipFile(self.sink, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1)
+        for name, content in XLSX_STATIC_PARTS.items():
+            self.archive.writestr(name, content)
+        sheet_name = re.sub(r'[\[\]:*?/\\]', '_', sheet_name)[:31] or "Sheet1"
+        self.archive.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{xlsx_text(sheet_name)}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        self.sheet = self.archive.open("xl/worksheets/sheet1.xml", 'w')
+        self.sheet.write((
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        ).encode())
+    
+    def write_row(self, values: list):
+        self.sheet.write(f'<row>{"".join(xlsx_cell(value) for value in values)}</row>'.encode())
+    
+    def drain(self) -> bytes:
+        return self.sink.drain()
+    
+    def close(self) -> bytes:
+        self.sheet.write(b'</sheetData></worksheet>')
+        self.sheet.close()
+        # Closing the archive writes the central directory
+        self.archive.close()
+        return self.sink.drain()
+
+def encode_page_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_page_cursor(cursor: str) -> tuple:
+    """Return (sort value, ObjectId) from a cursor made by encode_page_cursor; 400 on anything else"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != 2 or not isinstance(values[1], str) or not ObjectId.is_valid(values[1]):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values[0], ObjectId(values[1])
+
+# ============ SESSION STATS ============
+
+# session_stats holds one small counters document per session, kept in step with the events
+# that change it ($inc on each write) so status, summary and report endpoints don't have to
+# rescan participant_access, test_results, attendance and checklists.
+# `python manage.py rebuild-session-stats` recomputes it from those collections.
+
+# participant_access flag -> session_stats counter
+ACCESS_STAT_FIELDS = {
+    "can_access_pre_test": "released.pre_test",
+    "can_access_post_test": "released.post_test",
+    "can_access_checklist": "released.checklist",
+    "can_access_feedback": "released.feedback",
+    "pre_test_completed": "completed.pre_test",
+    "post_test_completed": "completed.post_test",
+    "checklist_submitted": "completed.checklist",
+    "feedback_submitted": "completed.feedback"
+}
+
+# A rebuild whose counters were bumped while it ran recomputes those sessions up to this many times
+SESSION_STATS_REBUILD_ATTEMPTS = 3
+
+def empty_session_stats(session_id: str) -> dict:
+    return {
+        "session_id": session_id,
+        "participants": 0,
+        "released": {"pre_test": 0, "post_test": 0, "checklist": 0, "feedback": 0},
+        "completed": {"pre_test": 0, "post_test": 0, "checklist": 0, "feedback": 0},
+        "tests": {test_type: {"count": 0, "passed": 0, "score_total": 0.0} for test_type in ("pre", "post")},
+        "attendance": {"participants": 0, "clock_ins": 0, "clock_outs": 0},
+        "checklists": {"submitted": 0, "needs_repair": 0},
+        "feedback": {"responses": 0},
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }
+
+async def bump_session_stats(session_id: str, inc: dict):
+    """Apply counter deltas; a session without stats yet gets them rebuilt on first read instead"""
+    await db.session_stats.update_one(
+        {"session_id": session_id},
+        {"$inc": {**inc, "version": 1}, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}}
+    )
+
+async def update_access_flags(participant_id: str, session_id: str, fields: dict, upsert: bool = False):
+    """Set participant_access flags for one participant and move the matching session_stats counters"""
+    before = await db.participant_access.find_one_and_update(
+        {"participant_id": participant_id, "session_id": session_id},
+        {"$set": fields},
+        projection={"_id": 0, **{field: 1 for field in fields}},
+        upsert=upsert,
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None and not upsert:
+        return
+    
+    inc = {"participants": 1} if before is None else {}
+    for field, value in fields.items():
+        was_set = bool(before.get(field)) if before is not None else False
+        if was_set != bool(value):
+            inc[ACCESS_STAT_FIELDS[field]] = 1 if value else -1
+    if inc:
+        await bump_session_stats(session_id, inc)
+
+async def set_session_access_flag(session_id: str, field: str, enabled: bool, participant_ids: Optional[List[str]] = None) -> int:
+    """Set one participant_access flag across a session; returns how many records changed"""
+    query = {"session_id": session_id, field: {"$ne": True} if enabled else True}
+    if participant_ids is not None:
+        query["participant_id"] = {"$in": participant_ids}
+    result = await db.participant_access.update_many(query, {"$set": {field: enabled}})
+    if result.modified_count:
+        delta = result.modified_count if enabled else -result.modified_count
+        await bump_session_stats(session_id, {ACCESS_STAT_FIELDS[field]: delta})
+    return result.modified_count
+
+async def compute_session_stats(session_ids: List[str], match: dict) -> dict:
+    """Counters for the given sessions, aggregated from the source collections rows matching `match`"""
+    stats = {key: empty_session_stats(key) for key in session_ids}
+    
+    def count_true(field: str) -> dict:
+        return {"$sum": {"$cond": [{"$eq": [f"${field}", True]}, 1, 0]}}
+    
+    def count_set(field: str) -> dict:
+        return {"$sum": {"$cond": [{"$ifNull": [f"${field}", False]}, 1, 0]}}
+    
+    access_group = {"_id": "$session_id", "participants": {"$sum": 1}}
+    access_group.update({field: count_true(field) for field in ACCESS_STAT_FIELDS})
+    async for row in db.participant_access.aggregate([{"$match": match}, {"$group": access_group}]):
+        if row["_id"] not in stats:
+            continue
+        entry = stats[row["_id"]]
+        entry["participants"] = row["participants"]
+        for field, counter in ACCESS_STAT_FIELDS.items():
+            section, name = counter.split(".")
+            entry[section][name] = row[field]
+    
+    async for row in db.test_results.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": {"session_id": "$session_id", "test_type": "$test_type"},
+            "count": {"$sum": 1},
+            "passed": count_true("passed"),
+            "score_total": {"$sum": "$score"}
+        }}
+    ]):
+        entry = stats.get(row["_id"]["session_id"])
+        if entry and row["_id"]["test_type"] in entry["tests"]:
+            entry["tests"][row["_id"]["test_type"]] = {
+                "count": row["count"], "passed": row["passed"], "score_total": row["score_total"]
+            }
     
-    existing_user = None
-    if query:
-        existing_user = await db.users.find_one(query, {"_id": 0})
+    async for row in db.attendance.aggregate([
+        {"$match": {**match, "clock_in": {"$ne": None}}},
+        {"$group": {
+            "_id": "$session_id",
+            "participants": {"$addToSet": "$participant_id"},
+            "clock_ins": {"$sum": 1},
+            "clock_outs": count_set("clock_out")
+        }}
+    ]):
+        if row["_id"] in stats:
+            stats[row["_id"]]["attendance"] = {
+                "participants": len(row["participants"]),
+                "clock_ins": row["clock_ins"],
+                "clock_outs": row["clock_outs"]
+            }
     
-    if existing_user:
-        # User found - update with new data
-        update_data = {
-            "email": email,
-            "id_number": user_data.get("id_number"),
-            "phone_number": phone_number,
-            "company_id": company_id,
-        }
-        # Remove None values
-        update_data = {k: v for k, v in update_data.items() if v is not None}
-        
-        await db.users.update_one(
-            {"id": existing_user["id"]},
-            {"$set": update_data}
-        )
-        
-        # Return updated user data
-        updated_user = await db.users.find_one({"id": existing_user["id"]}, {"_id": 0})
-        if isinstance(updated_user.get('created_at'), str):
-            updated_user['created_at'] = datetime.fromisoformat(updated_user['created_at'])
-        
-        return {
-            "is_existing": True,
-            "user": User(**updated_user)
-        }
-    else:
-        # User not found - create new
-        hashed_password = pwd_context.hash(user_data.get("password"))
-        new_user = User(
-            email=email,
-            full_name=full_name,
-            id_number=user_data.get("id_number"),
-            role=role,
-            company_id=company_id,
-            phone_number=phone_number
-        )
-        
-        user_doc = new_user.model_dump()
-        user_doc["created_at"] = user_doc["created_at"].isoformat()
-        user_doc["password"] = hashed_password
+    async for row in db.vehicle_checklists.aggregate([
+        {"$match": match},
+        {"$group": {
+            "_id": "$session_id",
+            "submitted": {"$sum": 1},
+            "needs_repair": {"$sum": {"$size": {"$filter": {
+                "input": {"$ifNull": ["$checklist_items", []]},
+                "cond": {"$eq": ["$$this.status", "needs_repair"]}
+            }}}}
+        }}
+    ]):
+        if row["_id"] in stats:
+            stats[row["_id"]]["checklists"] = {"submitted": row["submitted"], "needs_repair": row["needs_repair"]}
+    
+    async for row in db.course_feedback.aggregate([{"$match": match}, {"$group": {"_id": "$session_id", "responses": {"$sum": 1}}}]):
+        if row["_id"] in stats:
+            stats[row["_id"]]["feedback"] = {"responses": row["responses"]}
+    
+    return stats
+
+async def rebuild_session_stats(session_id: Optional[str] = None) -> int:
+    """
+    Recompute session_stats from the source collections for one session, or for all of them.
+    Counters are written with $set only where the document's version (bumped by every $inc) is
+    unchanged since the rebuild started; sessions that moved meanwhile are recomputed again.
+    """
+    session_ids = [session['id'] async for session in db.sessions.find({"id": session_id} if session_id else {}, {"_id": 0, "id": 1})]
+    if not session_ids:
+        return 0
+    
+    pending = session_ids
+    match = {"session_id": session_id} if session_id else {}
+    for _ in range(SESSION_STATS_REBUILD_ATTEMPTS):
+        versions = {}
+        async for row in db.session_stats.find({"session_id": {"$in": pending}}, {"_id": 0, "session_id": 1, "version": 1}):
+            versions[row["session_id"]] = row.get("version")
+        stats = await compute_session_stats(pending, match)
         
-        await db.users.insert_one(user_doc)
+        operations = []
+        for key, value in stats.items():
+            if key in versions:
+                operations.append(UpdateOne({"session_id": key, "version": versions[key]}, {"$set": value}))
+            else:
+                value.pop("session_id")
+                operations.append(UpdateOne({"session_id": key}, {"$setOnInsert": {**value, "version": 0}}, upsert=True))
+        try:
+            result = await db.session_stats.bulk_write(operations, ordered=False)
+            if result.matched_count + result.upserted_count == len(operations):
+                return len(session_ids)
+        except BulkWriteError:
+            # Another rebuild inserted the same session first; its row is checked below
+            pass
         
+        written = set()
+        async for row in db.session_stats.find({"session_id": {"$in": pending}}, {"_id": 0, "session_id": 1, "version": 1}):
+            if row["session_id"] not in versions or row.get("version") == versions[row["session_id"]]:
+                written.add(row["session_id"])
+        pending = [key for key in pending if key not in written]
+        if not pending:
+            return len(session_ids)
+        match = {"session_id": {"$in": pending}}
+    
+    logging.warning(f"session_stats kept changing during rebuild; {len(pending)} sessions left as they were")
+    return len(session_ids) - len(pending)
+
+async def get_session_stats(session_id: str) -> dict:
+    stats = await db.session_stats.find_one({"session_id": session_id}, {"_id": 0})
+    if stats is None:
+        await rebuild_session_stats(session_id)
+        stats = await db.session_stats.find_one({"session_id": session_id}, {"_id": 0}) or empty_session_stats(session_id)
+    return stats
+
+def summarize_session_stats(stats: dict) -> dict:
+    """Averages and rates derived from a session_stats document"""
+    def test_summary(test_type: str) -> dict:
+        test = stats["tests"][test_type]
         return {
-            "is_existing": False,
-            "user": new_user
+            "count": test["count"],
+            "passed": test["passed"],
+            "average_score": test["score_total"] / test["count"] if test["count"] else 0,
+            "pass_rate": test["passed"] / test["count"] * 100 if test["count"] else 0
         }
+    
+    pre_test = test_summary("pre")
+    post_test = test_summary("post")
+    return {
+        "participants": stats["participants"],
+        "pre_test": pre_test,
+        "post_test": post_test,
+        "improvement": post_test["average_score"] - pre_test["average_score"],
+        "attendance": stats["attendance"],
+        "checklists": stats["checklists"],
+        "feedback_submitted": stats["completed"]["feedback"]
+    }
 
 # Training Report Models
 class TrainingReport(BaseModel):
@@ -680,10 +1852,609 @@ class TrainingReport(BaseModel):
 
 class ReportGenerateRequest(BaseModel):
     session_id: str
+    force_refresh: bool = False
 
 class ReportUpdateRequest(BaseModel):
     content: str
 
+# ============ BACKGROUND JOBS ============
+
+# Report and certificate work that can outlive a proxy timeout runs as documents in the jobs
+# collection: the endpoint enqueues and answers 202 with a job id, JobQueue workers claim queued
+# jobs with find_one_and_update and clients poll /jobs/{job_id}. A running job holds a lease;
+# if its worker dies the lease expires and another worker picks the job up again.
+JOB_WORKER_CONCURRENCY = int(os.environ.get('JOB_WORKER_CONCURRENCY', 2))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get('JOB_RETRY_BASE_SECONDS', 5))
+JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 600))
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 2))
+
+JOB_HANDLERS = {}
+JOB_READERS = {}
+# The claimed job whose handler is running in this task, for report_job_progress
+current_job = contextvars.ContextVar("current_job", default=None)
+
+def job_handler(job_type: str, can_read=None):
+    """
+    Register `async def handler(params: dict, current_user: User) -> dict` for a job type.
+    can_read(params, user) repeats the enqueueing endpoint's access rule: enqueue hands an
+    already queued job to every caller with the same params, so they must all be able to poll it.
+    """
+    def register(func):
+        JOB_HANDLERS[job_type] = func
+        if can_read:
+            JOB_READERS[job_type] = can_read
+        return func
+    return register
+
+def can_read_job(job: dict, current_user: User) -> bool:
+    if current_user.role == "admin" or job.get('created_by') == current_user.id:
+        return True
+    can_read = JOB_READERS.get(job['type'])
+    return bool(can_read and can_read(job['params'], current_user))
+
+async def report_job_progress(update: dict):
+    """
+    Apply an update document to the running job's `progress` (e.g. {"$inc": {"progress.done": 1}})
+    so pollers of /jobs/{job_id} can follow it; fenced like the final update, a no-op outside a job.
+    """
+    job = current_job.get()
+    if job is not None:
+        await db.jobs.update_one({"id": job['id'], "claim_id": job['claim_id']}, update)
+
+def staff_report_reader(params: dict, current_user: User) -> bool:
+    return current_user.role in ["coordinator", "admin"]
+
+def job_dedupe_key(job_type: str, params: dict) -> str:
+    return hashlib.sha256(json.dumps([job_type, params], sort_keys=True, default=str).encode()).hexdigest()
+
+class PermanentJobError(Exception):
+    """A handler failure that would fail the same way on every attempt (configuration, bad input)"""
+
+def job_retryable(error: Exception) -> bool:
+    if isinstance(error, PermanentJobError):
+        return False
+    # Client errors (missing data, permissions) fail the same way every time
+    if isinstance(error, HTTPException):
+        return not 400 <= error.status_code < 500
+    # Upstream API errors (LLM client) carry the HTTP status; only timeouts and rate limits recover
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int) and 400 <= status_code < 500 and status_code not in (408, 429):
+        return False
+    # Validation errors (pydantic's included) and malformed data don't change between attempts
+    return not isinstance(error, (ValueError, TypeError, KeyError))
+
+class JobQueue:
+    def __init__(self, concurrency: int):
+        self.concurrency = max(1, concurrency)
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.tasks = []
+        self.wakeup = asyncio.Event()
+        self.stats = {"completed": 0, "failed": 0, "retried": 0, "cancelled": 0}
+    
+    def get_stats(self) -> dict:
+        return {"worker_id": self.worker_id, "workers": len(self.tasks), **self.stats}
+    
+    async def enqueue(self, job_type: str, params: dict, current_user: User) -> dict:
+        """
+        Queue a job, or return the matching one that is already queued or running.
+        The read is only a shortcut; dedupe_key_active_unique settles concurrent enqueues.
+        """
+        existing = await db.jobs.find_one(
+            {"type": job_type, "params": params, "status": {"$in": ["queued", "running"]}},
+            {"_id": 0}
+        )
+        if existing:
+            return existing
+        
+        now = datetime.now(timezone.utc).isoformat()
+        dedupe_key = job_dedupe_key(job_type, params)
+        job = {
+            "id": str(uuid.uuid4()),
+            "type": job_type,
+            "params": params,
+            "dedupe_key": dedupe_key,
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": JOB_MAX_ATTEMPTS,
+            "result": None,
+            "error": None,
+            "progress": None,
+            "created_by": current_user.id,
+            "created_at": now,
+            "run_after": now,
+            "started_at": None,
+            "finished_at": None,
+            "lease_until": None
+        }
+        for _ in range(3):
+            try:
+                await db.jobs.insert_one(job)
+                break
+            except DuplicateKeyError:
+                job.pop("_id", None)
+                existing = await db.jobs.find_one({"dedupe_key": dedupe_key}, {"_id": 0})
+                if existing:
+                    return existing
+                # The other job finished in between; this one is still wanted
+        else:
+            raise HTTPException(status_code=503, detail="Job queue is busy, please try again shortly", headers={"Retry-After": "1"})
+        job.pop("_id", None)
+        self.wakeup.set()
+        return job
+    
+    async def claim(self) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        return await db.jobs.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "run_after": {"$lte": now.isoformat()}},
+                {"status": "running", "lease_until": {"$lt": now.isoformat()}}
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "started_at": now.isoformat(),
+                    "lease_until": (now + timedelta(seconds=JOB_LEASE_SECONDS)).isoformat(),
+                    "worker": self.worker_id,
+                    # Fences every later write to this attempt, even against a worker in this process
+                    "claim_id": str(uuid.uuid4())
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("run_after", ASCENDING)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def heartbeat(self, job: dict, execution: asyncio.Task):
+        """
+        While the handler runs, stop it once the job is cancelled (checked every JOB_POLL_SECONDS)
+        and keep extending the lease so the job isn't claimed a second time
+        """
+        renew_at = time.monotonic() + JOB_LEASE_SECONDS / 3
+        while True:
+            await asyncio.sleep(JOB_POLL_SECONDS)
+            try:
+                current = await db.jobs.find_one({"id": job['id']}, {"_id": 0, "status": 1})
+                if current and current['status'] == "cancelled":
+                    logging.info(f"Job {job['id']} ({job['type']}) was cancelled; stopping its handler")
+                    execution.cancel()
+                    return
+                if time.monotonic() < renew_at:
+                    continue
+                lease_until = datetime.now(timezone.utc) + timedelta(seconds=JOB_LEASE_SECONDS)
+                renewed = await db.jobs.update_one(
+                    {"id": job['id'], "claim_id": job['claim_id'], "status": "running"},
+                    {"$set": {"lease_until": lease_until.isoformat()}}
+                )
+            except Exception as e:
+                logging.error(f"Failed to check or renew the lease of job {job['id']}: {str(e)}")
+                continue
+            if renewed.matched_count == 0:
+                logging.warning(f"Job {job['id']} ({job['type']}) lost its lease; its result will be discarded")
+                return
+            renew_at = time.monotonic() + JOB_LEASE_SECONDS / 3
+    
+    async def finish(self, job: dict, update: dict):
+        operation = {"$set": update}
+        if update.get("status") in ("completed", "failed"):
+            # Frees the (type, params) slot for the next enqueue
+            operation["$unset"] = {"dedupe_key": ""}
+        # A cancelled job keeps its status even if the handler got to the end first
+        finished = await db.jobs.update_one({"id": job['id'], "claim_id": job['claim_id'], "status": "running"}, operation)
+        if finished.matched_count == 0:
+            logging.warning(f"Job {job['id']} ({job['type']}) was cancelled or reclaimed by another worker; dropping this attempt's outcome ({update.get('status')})")
+        return finished.matched_count > 0
+    
+    async def run(self, job: dict):
+        execution = asyncio.create_task(self.execute(job))
+        heartbeat = asyncio.create_task(self.heartbeat(job, execution))
+        try:
+            await execution
+        except asyncio.CancelledError:
+            if execution.cancelled():
+                # Stopped by heartbeat because the job was cancelled; keep this worker running
+                self.stats["cancelled"] += 1
+                return
+            # Shutting down: let the handler hand its job back before stopping
+            execution.cancel()
+            await asyncio.gather(execution, return_exceptions=True)
+            raise
+        finally:
+            heartbeat.cancel()
+    
+    async def execute(self, job: dict):
+        current_job.set(job)
+        try:
+            handler = JOB_HANDLERS.get(job['type'])
+            if handler is None:
+                raise HTTPException(status_code=400, detail=f"Unknown job type: {job['type']}")
+            if job['attempts'] > job['max_attempts']:
+                raise HTTPException(status_code=500, detail="Job was abandoned by its worker too many times")
+            current_user = await get_user_by_id(job['created_by'])
+            if current_user is None:
+                raise HTTPException(status_code=404, detail="Job owner no longer exists")
+            result = await handler(job['params'], current_user)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back without counting the attempt
+            await db.jobs.update_one(
+                {"id": job['id'], "claim_id": job['claim_id'], "status": "running"},
+                {"$set": {"status": "queued", "lease_until": None}, "$inc": {"attempts": -1}}
+            )
+            raise
+        except Exception as e:
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            now = datetime.now(timezone.utc)
+            if job_retryable(e) and job['attempts'] < job['max_attempts']:
+                delay = JOB_RETRY_BASE_SECONDS * 2 ** (job['attempts'] - 1)
+                if isinstance(e, HTTPException) and e.status_code == 503:
+                    delay = max(delay, OFFICE_RETRY_AFTER_SECONDS)
+                logging.warning(f"Job {job['id']} ({job['type']}) attempt {job['attempts']} failed, retrying in {delay:.0f}s: {error}")
+                update = {"status": "queued", "run_after": (now + timedelta(seconds=delay)).isoformat()}
+                self.stats["retried"] += 1
+            else:
+                logging.error(f"Job {job['id']} ({job['type']}) failed: {error}")
+                update = {"status": "failed", "finished_at": now.isoformat()}
+                self.stats["failed"] += 1
+            await self.finish(job, {**update, "error": error, "lease_until": None})
+            return
+        
+        if await self.finish(job, {
+            "status": "completed",
+            "result": result,
+            "error": None,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "lease_until": None
+        }):
+            self.stats["completed"] += 1
+    
+    async def work(self):
+        while True:
+            try:
+                job = await self.claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Failed to claim a job: {str(e)}")
+                job = None
+            
+            if job is None:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run(job)
+    
+    def start(self):
+        if not self.tasks:
+            self.tasks = [asyncio.create_task(self.work()) for _ in range(self.concurrency)]
+    
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+job_queue = JobQueue(JOB_WORKER_CONCURRENCY)
+
+def job_accepted(job: dict) -> dict:
+    return {
+        "job_id": job['id'],
+        "status": job['status'],
+        "status_url": f"/api/jobs/{job['id']}"
+    }
+
+async def get_user_by_id(user_id: str) -> Optional[User]:
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user.model_copy()
+    user_doc = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0, "hashed_password": 0})
+    if not user_doc:
+        return None
+    if isinstance(user_doc.get('created_at'), str):
+        user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
+    return User(**user_doc)
+
+# ============ DATABASE INDEXES ============
+
+# Every index the application relies on, declared in one place.
+# Unique indexes mark lookups where the code assumes at most one document.
+INDEX_REGISTRY = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("id_number", ASCENDING)], name="id_number"),
+        IndexModel([("full_name", ASCENDING)], name="full_name"),
+        IndexModel([("role", ASCENDING)], name="role"),
+    ],
+    "companies": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "programs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "sessions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("participant_ids", ASCENDING)], name="participant_ids"),
+        IndexModel([("supervisor_ids", ASCENDING)], name="supervisor_ids"),
+        IndexModel([("company_id", ASCENDING), ("start_date", DESCENDING)], name="company_start_date"),
+        IndexModel([("coordinator_id", ASCENDING)], name="coordinator_id"),
+    ],
+    "participant_access": [
+        IndexModel([("participant_id", ASCENDING), ("session_id", ASCENDING)], name="participant_session_unique", unique=True),
+        IndexModel([("session_id", ASCENDING)], name="session_id"),
+        IndexModel([("certificate_uploaded_at", DESCENDING), ("_id", DESCENDING)], name="certificate_uploaded_at"),
+    ],
+    "tests": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("program_id", ASCENDING), ("test_type", ASCENDING)], name="program_test_type"),
+    ],
+    "test_results": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("session_id", ASCENDING), ("participant_id", ASCENDING), ("test_type", ASCENDING)], name="session_participant_test_type"),
+        IndexModel([("participant_id", ASCENDING)], name="participant_id"),
+        IndexModel([("test_id", ASCENDING)], name="test_id"),
+    ],
+    "attendance": [
+        IndexModel([("participant_id", ASCENDING), ("session_id", ASCENDING), ("date", ASCENDING)], name="participant_session_date_unique", unique=True),
+        IndexModel([("session_id", ASCENDING), ("date", ASCENDING)], name="session_date"),
+    ],
+    "vehicle_checklists": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("session_id", ASCENDING), ("participant_id", ASCENDING), ("verified_by", ASCENDING)], name="session_participant_verified_by"),
+        IndexModel([("participant_id", ASCENDING)], name="participant_id"),
+        IndexModel([("verification_status", ASCENDING)], name="verification_status"),
+    ],
+    "vehicle_details": [
+        IndexModel([("participant_id", ASCENDING), ("session_id", ASCENDING)], name="participant_session_unique", unique=True),
+    ],
+    "course_feedback": [
+        IndexModel([("session_id", ASCENDING), ("participant_id", ASCENDING)], name="session_participant"),
+    ],
+    "coordinator_feedback": [
+        IndexModel([("session_id", ASCENDING)], name="session_id"),
+    ],
+    "chief_trainer_feedback": [
+        IndexModel([("session_id", ASCENDING)], name="session_id"),
+    ],
+    "training_reports": [
+        IndexModel([("session_id", ASCENDING)], name="session_id"),
+        IndexModel([("id", ASCENDING)], name="id"),
+        IndexModel([("coordinator_id", ASCENDING)], name="coordinator_id"),
+        IndexModel([("status", ASCENDING), ("submitted_at", DESCENDING), ("_id", DESCENDING)], name="status_submitted_at"),
+        IndexModel([("status", ASCENDING), ("company_id", ASCENDING), ("submitted_at", DESCENDING)], name="status_company_submitted_at"),
+        IndexModel([("status", ASCENDING), ("program_id", ASCENDING), ("submitted_at", DESCENDING)], name="status_program_submitted_at"),
+        IndexModel([("search_text", TEXT)], name="search_text"),
+    ],
+    "certificates": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("participant_id", ASCENDING), ("session_id", ASCENDING)], name="participant_session_unique", unique=True),
+    ],
+    "session_stats": [
+        IndexModel([("session_id", ASCENDING)], name="session_id_unique", unique=True),
+    ],
+    "report_cache": [
+        IndexModel([("fingerprint", ASCENDING), ("model", ASCENDING)], name="fingerprint_model_unique", unique=True),
+        IndexModel([("session_id", ASCENDING)], name="session_id"),
+    ],
+    "jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("run_after", ASCENDING)], name="status_run_after"),
+        IndexModel([("type", ASCENDING), ("status", ASCENDING)], name="type_status"),
+        # One queued/running job per (type, params): dedupe_key only exists while the job is active
+        IndexModel([("dedupe_key", ASCENDING)], name="dedupe_key_active_unique", unique=True,
+                   partialFilterExpression={"dedupe_key": {"$exists": True}}),
+    ],
+    "notifications": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+    ],
+}
+
+def _index_key(key_spec) -> tuple:
+    """Normalise an index key document so declared and existing indexes compare equal"""
+    key = []
+    for field, direction in key_spec.items():
+        if direction == TEXT:
+            # MongoDB stores text indexes as {_fts: "text", _ftsx: 1} whatever the fields are
+            if ("_fts", TEXT) not in key:
+                key += [("_fts", TEXT), ("_ftsx", 1)]
+            continue
+        key.append((field, int(direction) if isinstance(direction, (int, float)) else direction))
+    return tuple(key)
+
+async def get_index_builds() -> List[dict]:
+    """Index builds currently in progress on this database (needs the inprog privilege)"""
+    builds = []
+    try:
+        cursor = client.admin.aggregate([
+            {"$currentOp": {"allUsers": True}},
+            {"$match": {"command.createIndexes": {"$exists": True}, "ns": {"$regex": f"^{db_name}\\."}}}
+        ])
+        async for op in cursor:
+            builds.append({
+                "collection": op["command"]["createIndexes"],
+                "indexes": [index.get("name") for index in op["command"].get("indexes", [])],
+                "progress": op.get("progress"),
+                "msg": op.get("msg")
+            })
+    except OperationFailure as e:
+        logging.warning(f"Could not inspect index builds: {str(e)}")
+    return builds
+
+# Outcome of the startup reconciliation, surfaced by /system/indexes and /system/metrics so a
+# unique index that failed to build (usually duplicate rows) is visible without reading logs
+index_startup_status = {"ran_at": None, "failed": [], "conflicts": [], "error": None}
+
+async def reconcile_indexes(create_missing: bool = True, drop_extra: bool = False) -> dict:
+    """
+    Compare INDEX_REGISTRY against the database.
+    Reports missing, extra, conflicting (same keys, different options) and building indexes,
+    optionally creating the missing ones and dropping the extra ones.
+    """
+    report = {"missing": [], "created": [], "failed": [], "extra": [], "dropped": [], "conflicts": []}
+    
+    for collection_name, index_models in INDEX_REGISTRY.items():
+        collection = db[collection_name]
+        existing = {}
+        async for index in collection.list_indexes():
+            existing[_index_key(index["key"])] = index
+        
+        declared_keys = set()
+        for index_model in index_models:
+            spec = index_model.document
+            key = _index_key(spec["key"])
+            declared_keys.add(key)
+            label = f"{collection_name}.{spec['name']}"
+            
+            current = existing.get(key)
+            if current is None:
+                report["missing"].append(label)
+                if create_missing:
+                    try:
+                        await collection.create_indexes([index_model])
+                        report["created"].append(label)
+                    except OperationFailure as e:
+                        # Typically duplicate data blocking a unique index
+                        report["failed"].append({"index": label, "error": str(e)})
+            elif bool(current.get("unique")) != bool(spec.get("unique")):
+                report["conflicts"].append({
+                    "index": label,
+                    "existing": current["name"],
+                    "detail": f"unique={bool(current.get('unique'))}, declared unique={bool(spec.get('unique'))}"
+                })
+        
+        for key, index in existing.items():
+            if index["name"] == "_id_" or key in declared_keys:
+                continue
+            label = f"{collection_name}.{index['name']}"
+            report["extra"].append(label)
+            if drop_extra:
+                await collection.drop_index(index["name"])
+                report["dropped"].append(label)
+    
+    report["building"] = await get_index_builds()
+    return report
+
+def merge_attendance_duplicates(rows: List[dict]) -> dict:
+    """Fields to set on the kept (oldest) attendance row: earliest clock_in, latest clock_out"""
+    clock_ins = [row["clock_in"] for row in rows if row.get("clock_in")]
+    clock_outs = [row["clock_out"] for row in rows if row.get("clock_out")]
+    return {"clock_in": min(clock_ins) if clock_ins else None, "clock_out": max(clock_outs) if clock_outs else None}
+
+def merge_access_duplicates(rows: List[dict]) -> dict:
+    """
+    Fields to set on the kept (oldest) participant_access row: a flag is set if any duplicate had
+    it, and the certificate fields come from the most recent upload
+    """
+    merged = {field: any(row.get(field) for row in rows) for field in ACCESS_STAT_FIELDS}
+    uploads = [row for row in rows if row.get("certificate_url")]
+    if uploads:
+        latest = max(uploads, key=lambda row: row.get("certificate_uploaded_at") or "")
+        merged.update({field: latest.get(field) for field in ("certificate_url", "certificate_uploaded_at", "certificate_uploaded_by")})
+    return merged
+
+def merge_certificate_duplicates(rows: List[dict]) -> dict:
+    """The kept (oldest) certificate keeps its id, so download links stay valid, with the latest issue"""
+    latest = max(rows, key=lambda row: str(row.get("issue_date") or ""))
+    return {"certificate_url": latest.get("certificate_url"), "issue_date": latest.get("issue_date")}
+
+def merge_vehicle_details_duplicates(rows: List[dict]) -> dict:
+    """find_one and the update path always hit the oldest row, so it already holds the current details"""
+    return {}
+
+# collection -> (fields of its unique key, merge rule). The oldest row of each duplicate group is
+# kept, since that is the one find_one (and so every read and update) has been returning.
+DEDUPE_RULES = {
+    "attendance": (("participant_id", "session_id", "date"), merge_attendance_duplicates),
+    "participant_access": (("participant_id", "session_id"), merge_access_duplicates),
+    "certificates": (("participant_id", "session_id"), merge_certificate_duplicates),
+    "vehicle_details": (("participant_id", "session_id"), merge_vehicle_details_duplicates),
+}
+
+async def dedupe_collection(collection_name: str, apply: bool = False) -> List[dict]:
+    """Merge each group of rows sharing a DEDUPE_RULES key into its oldest row"""
+    key_fields, merge = DEDUPE_RULES[collection_name]
+    collection = db[collection_name]
+    groups = collection.aggregate([
+        {"$group": {"_id": {field: f"${field}" for field in key_fields}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+    
+    merged = []
+    async for group in groups:
+        rows = await collection.find({"_id": {"$in": group["ids"]}}).sort("_id", ASCENDING).to_list(None)
+        update = merge(rows)
+        merged.append({**group["_id"], "rows": len(rows), "kept": str(rows[0]["_id"]), "merged": update})
+        if apply:
+            if update:
+                await collection.update_one({"_id": rows[0]["_id"]}, {"$set": update})
+            await collection.delete_many({"_id": {"$in": [row["_id"] for row in rows[1:]]}})
+    return merged
+
+async def dedupe_unique_keys(apply: bool = False) -> dict:
+    """
+    Find rows that block the unique indexes in INDEX_REGISTRY from building.
+    Duplicates in the DEDUPE_RULES collections are merged into their oldest row. Duplicate user
+    emails keep the active, oldest account; the others are deactivated and their email prefixed
+    with "duplicate-<id>+" so an admin can still find them. `sessions` lists the sessions whose
+    stats need rebuilding. Nothing is written unless apply is set.
+    """
+    report = {"users": [], "sessions": []}
+    for collection_name in DEDUPE_RULES:
+        report[collection_name] = await dedupe_collection(collection_name, apply)
+    for collection_name in ("attendance", "participant_access"):
+        for group in report[collection_name]:
+            if group["session_id"] not in report["sessions"]:
+                report["sessions"].append(group["session_id"])
+    
+    user_groups = db.users.aggregate([
+        {"$group": {
+            "_id": "$email",
+            "users": {"$push": {"id": "$id", "is_active": "$is_active", "created_at": "$created_at"}},
+            "count": {"$sum": 1}
+        }},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+    async for group in user_groups:
+        users = sorted(group["users"], key=lambda user: (user.get("is_active") is False, str(user.get("created_at") or "")))
+        keep, extra = users[0], users[1:]
+        report["users"].append({"email": group["_id"], "kept": keep["id"], "deactivated": [user["id"] for user in extra]})
+        if apply:
+            for user in extra:
+                await db.users.update_one(
+                    {"id": user["id"]},
+                    {"$set": {"email": f"duplicate-{user['id'][:8]}+{group['_id']}", "is_active": False}}
+                )
+                invalidate_cached_user(user["id"])
+    
+    return report
+
+# Unique indexes some write paths depend on for correctness; once seen they are not rechecked
+verified_unique_indexes = set()
+
+async def require_unique_index(collection_name: str, index_name: str):
+    """
+    503 unless the registered unique index exists. Paths that rely on DuplicateKeyError instead
+    of a read-then-write check would otherwise insert duplicates while the index is missing.
+    """
+    label = f"{collection_name}.{index_name}"
+    if label in verified_unique_indexes:
+        return
+    spec = next(model.document for model in INDEX_REGISTRY[collection_name] if model.document["name"] == index_name)
+    key = _index_key(spec["key"])
+    async for index in db[collection_name].list_indexes():
+        if _index_key(index["key"]) == key and index.get("unique"):
+            verified_unique_indexes.add(label)
+            return
+    logging.error(f"❌ Unique index {label} is missing; run `python manage.py dedupe-unique-keys --apply`")
+    raise HTTPException(
+        status_code=503,
+        detail="Attendance is temporarily unavailable, please try again shortly",
+        headers={"Retry-After": "30"}
+    )
+
 # ============ ROUTES ============
 
 @api_router.get("/")
@@ -704,7 +2475,7 @@ async def register_user(user_data: UserCreate, current_user: User = Depends(get_
     if existing:
         raise HTTPException(status_code=400, detail="User already exists")
     
-    hashed_pw = hash_password(user_data.password)
+    hashed_pw = await hash_password(user_data.password)
     user_obj = User(
         email=user_data.email,
         full_name=user_data.full_name,
@@ -732,7 +2503,7 @@ async def login(user_data: UserLogin):
     if not password_hash:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not verify_password(user_data.password, password_hash):
+    if not await verify_password(user_data.password, password_hash):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     if not user_doc.get('is_active', True):
@@ -749,10 +2520,47 @@ async def login(user_data: UserLogin):
     
     return TokenResponse(access_token=token, token_type="bearer", user=user)
 
+class DownloadTokenRequest(BaseModel):
+    path: str
+
+@api_router.post("/auth/download-token")
+async def create_download_token(token_request: DownloadTokenRequest, current_user: User = Depends(get_current_user)):
+    """A short-lived token for one download URL (e.g. /api/certificates/export-zip), passed as ?token="""
+    token = create_access_token(
+        {"sub": current_user.id, "scope": "download", "path": token_request.path},
+        timedelta(seconds=DOWNLOAD_TOKEN_SECONDS)
+    )
+    return {"token": token, "expires_in": DOWNLOAD_TOKEN_SECONDS}
+
 @api_router.get("/auth/me", response_model=User)
 async def get_me(current_user: User = Depends(get_current_user)):
     return current_user
 
+@api_router.get("/system/metrics")
+async def get_system_metrics(current_user: User = Depends(get_current_user)):
+    """In-process cache and worker metrics for this API worker (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view system metrics")
+    
+    return {
+        "user_cache": get_user_cache_stats(),
+        "password_pool": get_password_pool_stats(),
+        "office_pool": office_pool.get_stats(),
+        "certificate_cache": certificate_cache_stats,
+        "test_cache": {**test_cache_stats, "size": len(test_payload_cache)},
+        "job_queue": job_queue.get_stats(),
+        "ai_report_cache": ai_report_cache_stats,
+        "index_startup": index_startup_status
+    }
+
+@api_router.get("/system/indexes")
+async def get_index_status(current_user: User = Depends(get_current_user)):
+    """Report missing, extra and building indexes without changing anything (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view index status")
+    
+    return {**await reconcile_indexes(create_missing=False), "startup": index_startup_status}
+
 class ForgotPasswordRequest(BaseModel):
     email: EmailStr
 
@@ -789,13 +2597,14 @@ async def reset_password(request: ResetPasswordRequest):
         raise HTTPException(status_code=404, detail="User not found")
     
     # Hash new password
-    hashed_password = pwd_context.hash(request.new_password)
+    hashed_password = await hash_password(request.new_password)
     
     # Update password
     await db.users.update_one(
         {"email": request.email},
         {"$set": {"password": hashed_password}}
     )
+    invalidate_cached_user(user_doc['id'])
     
     return {"message": "Password reset successfully"}
 
@@ -833,6 +2642,8 @@ async def update_company(company_id: str, company_data: CompanyUpdate, current_u
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Company not found")
     
+    await refresh_report_listing_fields({"company_id": company_id})
+    
     company_doc = await db.companies.find_one({"id": company_id}, {"_id": 0})
     if isinstance(company_doc.get('created_at'), str):
         company_doc['created_at'] = datetime.fromisoformat(company_doc['created_at'])
@@ -886,6 +2697,9 @@ async def update_program(program_id: str, program_data: ProgramUpdate, current_u
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Program not found")
     
+    await refresh_report_listing_fields({"program_id": program_id})
+    invalidate_program_answer_keys(program_id)
+    
     program_doc = await db.programs.find_one({"id": program_id}, {"_id": 0})
     if isinstance(program_doc.get('created_at'), str):
         program_doc['created_at'] = datetime.fromisoformat(program_doc['created_at'])
@@ -913,6 +2727,7 @@ async def delete_user(user_id: str, current_user: User = Depends(get_current_use
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
     
     result = await db.users.delete_one({"id": user_id})
+    invalidate_cached_user(user_id)
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
@@ -961,39 +2776,30 @@ async def create_session(session_data: SessionCreate, current_user: User = Depen
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can create sessions")
     
-    # Process new participants (find or create)
+    # Process new participants and supervisors (find or create) in one batch
+    candidates = [(p.model_dump(), "participant") for p in session_data.participants]
+    candidates += [(sup.model_dump(), "pic_supervisor") for sup in session_data.supervisors]
+    provisioned = await provision_users(candidates, company_id=session_data.company_id)
+    
     processed_participant_ids = list(session_data.participant_ids)  # Start with existing IDs
     participant_results = []
-    
-    for participant_data in session_data.participants:
-        result = await find_or_create_user(
-            participant_data.model_dump(),
-            role="participant",
-            company_id=session_data.company_id
-        )
-        processed_participant_ids.append(result["user"].id)
-        participant_results.append({
-            "name": result["user"].full_name,
-            "email": result["user"].email,
-            "is_existing": result["is_existing"]
-        })
-    
-    # Process new supervisors (find or create)
     processed_supervisor_ids = list(session_data.supervisor_ids)  # Start with existing IDs
     supervisor_results = []
     
-    for supervisor_data in session_data.supervisors:
-        result = await find_or_create_user(
-            supervisor_data.model_dump(),
-            role="pic_supervisor",
-            company_id=session_data.company_id
+    for (_, role), result in zip(candidates, provisioned):
+        ids, results = (
+            (processed_participant_ids, participant_results) if role == "participant"
+            else (processed_supervisor_ids, supervisor_results)
         )
-        processed_supervisor_ids.append(result["user"].id)
-        supervisor_results.append({
+        ids.append(result["user"].id)
+        entry = {
             "name": result["user"].full_name,
             "email": result["user"].email,
             "is_existing": result["is_existing"]
-        })
+        }
+        if result["conflict"]:
+            entry["conflict"] = result["conflict"]
+        results.append(entry)
     
     # Create session with processed IDs
     session_obj = Session(
@@ -1014,9 +2820,18 @@ async def create_session(session_data: SessionCreate, current_user: User = Depen
     
     await db.sessions.insert_one(doc)
     
+    # A new session has nothing to aggregate yet: start its stats at zero and let
+    # provision_participant_access count the participants in
+    stats_doc = empty_session_stats(session_obj.id)
+    stats_doc.pop("session_id")
+    await db.session_stats.update_one(
+        {"session_id": session_obj.id},
+        {"$setOnInsert": {**stats_doc, "version": 0}},
+        upsert=True
+    )
+    
     # Create participant access records
-    for participant_id in processed_participant_ids:
-        await get_or_create_participant_access(participant_id, session_obj.id)
+    await provision_participant_access(processed_participant_ids, session_obj.id)
     
     return {
         "session": session_obj,
@@ -1125,6 +2940,8 @@ async def update_session(session_id: str, session_data: dict, current_user: User
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Session not found")
     
+    await refresh_report_listing_fields({"session_id": session_id})
+    
     return {"message": "Session updated successfully"}
 
 @api_router.delete("/sessions/{session_id}")
@@ -1139,6 +2956,8 @@ async def delete_session(session_id: str, current_user: User = Depends(get_curre
     
     # Also delete related participant_access records
     await db.participant_access.delete_many({"session_id": session_id})
+    await db.session_stats.delete_one({"session_id": session_id})
+    await db.training_reports.update_many({"session_id": session_id}, {"$set": {"has_session": False}})
     
     return {"message": "Session deleted successfully"}
 
@@ -1168,10 +2987,8 @@ async def update_participant_access(access_data: UpdateParticipantAccess, curren
     if access_data.can_access_feedback is not None:
         update_fields['can_access_feedback'] = access_data.can_access_feedback
     
-    await db.participant_access.update_one(
-        {"participant_id": access_data.participant_id, "session_id": access_data.session_id},
-        {"$set": update_fields}
-    )
+    if update_fields:
+        await update_access_flags(access_data.participant_id, access_data.session_id, update_fields)
     
     return {"message": "Access updated successfully"}
 
@@ -1222,15 +3039,9 @@ async def toggle_session_access(session_id: str, access_data: dict, current_user
     # Update all participant access records for this session
     participant_ids = session.get("participant_ids", [])
     
-    for participant_id in participant_ids:
-        # Ensure access record exists
-        await get_or_create_participant_access(participant_id, session_id)
-        
-        # Update the field
-        await db.participant_access.update_one(
-            {"participant_id": participant_id, "session_id": session_id},
-            {"$set": {field_name: enabled}}
-        )
+    # Ensure access records exist, then update the field
+    await provision_participant_access(participant_ids, session_id)
+    await set_session_access_flag(session_id, field_name, enabled, participant_ids)
     
     status_text = "enabled" if enabled else "disabled"
     return {"message": f"{access_type} access {status_text} for {len(participant_ids)} participants"}
@@ -1247,12 +3058,9 @@ async def release_pre_test(session_id: str, current_user: User = Depends(get_cur
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Update all participant access records for this session
-    result = await db.participant_access.update_many(
-        {"session_id": session_id},
-        {"$set": {"can_access_pre_test": True}}
-    )
+    released = await set_session_access_flag(session_id, "can_access_pre_test", True)
     
-    return {"message": f"Pre-test released to {result.modified_count} participants"}
+    return {"message": f"Pre-test released to {released} participants"}
 
 @api_router.post("/sessions/{session_id}/release-post-test")
 async def release_post_test(session_id: str, current_user: User = Depends(get_current_user)):
@@ -1263,12 +3071,9 @@ async def release_post_test(session_id: str, current_user: User = Depends(get_cu
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    result = await db.participant_access.update_many(
-        {"session_id": session_id},
-        {"$set": {"can_access_post_test": True}}
-    )
+    released = await set_session_access_flag(session_id, "can_access_post_test", True)
     
-    return {"message": f"Post-test released to {result.modified_count} participants"}
+    return {"message": f"Post-test released to {released} participants"}
 
 @api_router.post("/sessions/{session_id}/release-feedback")
 async def release_feedback(session_id: str, current_user: User = Depends(get_current_user)):
@@ -1279,12 +3084,9 @@ async def release_feedback(session_id: str, current_user: User = Depends(get_cur
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    result = await db.participant_access.update_many(
-        {"session_id": session_id},
-        {"$set": {"can_access_feedback": True}}
-    )
+    released = await set_session_access_flag(session_id, "can_access_feedback", True)
     
-    return {"message": f"Feedback form released to {result.modified_count} participants"}
+    return {"message": f"Feedback form released to {released} participants"}
 
 @api_router.get("/sessions/{session_id}/status")
 async def get_session_status(session_id: str, current_user: User = Depends(get_current_user)):
@@ -1296,17 +3098,16 @@ async def get_session_status(session_id: str, current_user: User = Depends(get_c
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Get all participant access records
-    access_records = await db.participant_access.find({"session_id": session_id}, {"_id": 0}).to_list(1000)
+    stats = await get_session_stats(session_id)
     
-    total_participants = len(access_records)
-    pre_test_released = any(a.get('can_access_pre_test', False) for a in access_records)
-    post_test_released = any(a.get('can_access_post_test', False) for a in access_records)
-    feedback_released = any(a.get('can_access_feedback', False) for a in access_records)
+    total_participants = stats["participants"]
+    pre_test_released = stats["released"]["pre_test"] > 0
+    post_test_released = stats["released"]["post_test"] > 0
+    feedback_released = stats["released"]["feedback"] > 0
     
-    pre_test_completed = sum(1 for a in access_records if a.get('pre_test_completed', False))
-    post_test_completed = sum(1 for a in access_records if a.get('post_test_completed', False))
-    feedback_submitted = sum(1 for a in access_records if a.get('feedback_submitted', False))
+    pre_test_completed = stats["completed"]["pre_test"]
+    post_test_completed = stats["completed"]["post_test"]
+    feedback_submitted = stats["completed"]["feedback"]
     
     return {
         "session_id": session_id,
@@ -1327,7 +3128,20 @@ async def get_session_status(session_id: str, current_user: User = Depends(get_c
     }
 
 @api_router.get("/sessions/{session_id}/results-summary")
-async def get_results_summary(session_id: str, current_user: User = Depends(get_current_user)):
+async def get_results_summary(
+    session_id: str,
+    sort_by: Optional[str] = Query(None, pattern="^(name|pre_score|post_score|improvement)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    format: str = Query("json", pattern="^(json|csv)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Pre/post test results and feedback status per participant, built in one aggregation.
+    Sort by name, pre_score, post_score or improvement; page with skip/limit; format=csv
+    streams the same rows as a CSV download.
+    """
     # Check if user has permission (admin, coordinator, or chief trainer)
     if current_user.role not in ["admin", "coordinator"]:
         # Check if trainer is chief trainer for this session
@@ -1353,63 +3167,105 @@ async def get_results_summary(session_id: str, current_user: User = Depends(get_
     
     participant_ids = session.get('participant_ids', [])
     
-    # Get participant details
-    participants = await db.users.find(
-        {"id": {"$in": participant_ids}},
-        {"_id": 0, "password": 0}
-    ).to_list(1000)
-    
-    # Get test results for all participants
-    test_results = await db.test_results.find(
-        {"session_id": session_id},
-        {"_id": 0}
-    ).to_list(1000)
+    def test_fields(test_type: str) -> dict:
+        result = f"${test_type}_result"
+        return {
+            "completed": {"$ne": [{"$type": result}, "missing"]},
+            "score": {"$ifNull": [f"{result}.score", 0]},
+            "correct": {"$ifNull": [f"{result}.correct_answers", 0]},
+            "total": {"$ifNull": [f"{result}.total_questions", 0]},
+            "passed": {"$ifNull": [f"{result}.passed", False]},
+            "result_id": {"$ifNull": [f"{result}.id", None]}
+        }
     
-    # Get feedback for all participants
-    feedbacks = await db.course_feedback.find(
-        {"session_id": session_id},
-        {"_id": 0}
-    ).to_list(1000)
+    pipeline = [
+        {"$match": {"id": {"$in": participant_ids}}},
+        # First pre and post result per participant for this session
+        {"$lookup": {
+            "from": "test_results",
+            "localField": "id",
+            "foreignField": "participant_id",
+            "pipeline": [
+                {"$match": {"session_id": session_id}},
+                {"$sort": {"submitted_at": 1}},
+                {"$group": {"_id": "$test_type", "result": {"$first": "$$ROOT"}}}
+            ],
+            "as": "results"
+        }},
+        {"$lookup": {
+            "from": "course_feedback",
+            "localField": "id",
+            "foreignField": "participant_id",
+            "pipeline": [{"$match": {"session_id": session_id}}, {"$limit": 1}, {"$project": {"_id": 1}}],
+            "as": "feedback"
+        }},
+        {"$addFields": {
+            f"{test_type}_result": {"$arrayElemAt": [
+                {"$map": {
+                    "input": {"$filter": {"input": "$results", "cond": {"$eq": ["$$this._id", test_type]}}},
+                    "in": "$$this.result"
+                }}, 0
+            ]}
+            for test_type in ("pre", "post")
+        }},
+        {"$project": {
+            "_id": 0,
+            "participant": {"id": "$id", "name": "$full_name", "email": "$email", "id_number": "$id_number"},
+            "pre_test": test_fields("pre"),
+            "post_test": test_fields("post"),
+            "improvement": {"$subtract": [
+                {"$ifNull": ["$post_result.score", 0]},
+                {"$ifNull": ["$pre_result.score", 0]}
+            ]},
+            "feedback_submitted": {"$gt": [{"$size": "$feedback"}, 0]}
+        }}
+    ]
     
-    # Build summary
-    summary = []
-    for participant in participants:
-        p_results = [r for r in test_results if r['participant_id'] == participant['id']]
-        p_feedback = next((f for f in feedbacks if f['participant_id'] == participant['id']), None)
-        
-        pre_test = next((r for r in p_results if r['test_type'] == 'pre'), None)
-        post_test = next((r for r in p_results if r['test_type'] == 'post'), None)
+    sort_fields = {
+        "name": "participant.name",
+        "pre_score": "pre_test.score",
+        "post_score": "post_test.score",
+        "improvement": "improvement"
+    }
+    if sort_by:
+        direction = 1 if order == "asc" else -1
+        pipeline.append({"$sort": {sort_fields[sort_by]: direction, "participant.id": 1}})
+    
+    if format == "csv":
+        async def generate_csv():
+            yield csv_row([
+                "Name", "Email", "ID Number", "Pre-Test Score", "Pre-Test Passed",
+                "Post-Test Score", "Post-Test Passed", "Improvement", "Feedback Submitted"
+            ])
+            async for row in db.users.aggregate(pipeline):
+                yield csv_row([
+                    row["participant"].get("name"), row["participant"].get("email"), row["participant"].get("id_number"),
+                    round(row["pre_test"]["score"], 1), "Yes" if row["pre_test"]["passed"] else "No",
+                    round(row["post_test"]["score"], 1), "Yes" if row["post_test"]["passed"] else "No",
+                    round(row["improvement"], 1), "Yes" if row["feedback_submitted"] else "No"
+                ])
         
-        summary.append({
-            "participant": {
-                "id": participant['id'],
-                "name": participant['full_name'],
-                "email": participant['email']
-            },
-            "pre_test": {
-                "completed": pre_test is not None,
-                "score": pre_test['score'] if pre_test else 0,
-                "correct": pre_test['correct_answers'] if pre_test else 0,
-                "total": pre_test['total_questions'] if pre_test else 0,
-                "passed": pre_test['passed'] if pre_test else False,
-                "result_id": pre_test['id'] if pre_test else None
-            },
-            "post_test": {
-                "completed": post_test is not None,
-                "score": post_test['score'] if post_test else 0,
-                "correct": post_test['correct_answers'] if post_test else 0,
-                "total": post_test['total_questions'] if post_test else 0,
-                "passed": post_test['passed'] if post_test else False,
-                "result_id": post_test['id'] if post_test else None
-            },
-            "feedback_submitted": p_feedback is not None
-        })
+        filename = f"results_{re.sub(r'[^A-Za-z0-9_-]+', '_', session.get('name', '') or session_id)}.csv"
+        return StreamingResponse(
+            generate_csv(),
+            media_type="text/csv",
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
+    
+    page = [{"$skip": skip}]
+    if limit:
+        page.append({"$limit": limit})
+    pipeline.append({"$facet": {"total": [{"$count": "count"}], "participants": page}})
+    result = await db.users.aggregate(pipeline).to_list(1)
+    facet = result[0] if result else {"total": [], "participants": []}
     
     return {
         "session_id": session_id,
         "session_name": session.get('name', ''),
         "program_id": session.get('program_id', ''),
-        "participants": summary
+        "total": facet["total"][0]["count"] if facet["total"] else 0,
+        "stats": summarize_session_stats(await get_session_stats(session_id)),
+        "participants": facet["participants"]
     }
 
 # User Routes
@@ -1443,6 +3299,309 @@ async def get_user(user_id: str, current_user: User = Depends(get_current_user))
     
     return user
 
+# Compiled test payloads: the participant-safe question list (no correct answers, original
+# positions attached) is built once per test and shared, so opening a test only shuffles indices.
+TEST_CACHE_TTL_SECONDS = int(os.environ.get('TEST_CACHE_TTL_SECONDS', 300))
+test_payload_cache = TTLCache(maxsize=512, ttl=TEST_CACHE_TTL_SECONDS)
+program_tests_cache = TTLCache(maxsize=256, ttl=TEST_CACHE_TTL_SECONDS)
+test_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+def compile_test_payload(test_doc: dict) -> dict:
+    questions = test_doc.get('questions', [])
+    metadata = {key: value for key, value in test_doc.items() if key != 'questions'}
+    if isinstance(metadata.get('created_at'), str):
+        metadata['created_at'] = datetime.fromisoformat(metadata['created_at'])
+    version = hashlib.sha256(json.dumps(test_doc, sort_keys=True, default=str).encode()).hexdigest()[:32]
+    return {
+        "test": metadata,
+        "questions": questions,
+        "participant_questions": [
+            {'question': q['question'], 'options': q['options'], 'original_index': index}
+            for index, q in enumerate(questions)
+        ],
+        "etag": f'"{version}"'
+    }
+
+async def get_compiled_test(test_id: str) -> Optional[dict]:
+    compiled = test_payload_cache.get(test_id)
+    if compiled is not None:
+        test_cache_stats["hits"] += 1
+        return compiled
+    
+    test_cache_stats["misses"] += 1
+    test_doc = await db.tests.find_one({"id": test_id}, {"_id": 0})
+    if not test_doc:
+        return None
+    compiled = compile_test_payload(test_doc)
+    test_payload_cache[test_id] = compiled
+    return compiled
+
+async def get_compiled_program_tests(program_id: str) -> List[dict]:
+    test_ids = program_tests_cache.get(program_id)
+    if test_ids is None:
+        tests = await db.tests.find({"program_id": program_id}, {"_id": 0}).to_list(10)
+        for test_doc in tests:
+            test_payload_cache[test_doc['id']] = compile_test_payload(test_doc)
+        test_ids = [test_doc['id'] for test_doc in tests]
+        program_tests_cache[program_id] = test_ids
+    
+    compiled_tests = []
+    for test_id in test_ids:
+        compiled = await get_compiled_test(test_id)
+        if compiled is not None:
+            compiled_tests.append(compiled)
+    return compiled_tests
+
+def invalidate_cached_test(test_id: str, program_id: Optional[str] = None):
+    """Evict a test (and its program's test list) after it changes. Other API workers expire via the TTL."""
+    test_payload_cache.pop(test_id, None)
+    if program_id:
+        program_tests_cache.pop(program_id, None)
+    test_cache_stats["invalidations"] += 1
+
+def render_participant_test(compiled: dict, shuffle: bool) -> dict:
+    """Participant view of a compiled test; shuffling reorders the shared question objects by index"""
+    questions = compiled["participant_questions"]
+    if shuffle:
+        questions = [questions[index] for index in random.sample(range(len(questions)), len(questions))]
+    return {**compiled["test"], "questions": questions}
+
+# Answer keys: each test's correct answers compiled to a NumPy vector, cached per test version
+# together with the program's pass_percentage, so scoring a submission is one vector compare.
+answer_key_cache = TTLCache(maxsize=512, ttl=TEST_CACHE_TTL_SECONDS)
+
+async def get_answer_key(test_id: str) -> Optional[dict]:
+    compiled = await get_compiled_test(test_id)
+    if compiled is None:
+        return None
+    
+    answer_key = answer_key_cache.get(test_id)
+    if answer_key is not None and answer_key["version"] == compiled["etag"]:
+        return answer_key
+    
+    test = compiled["test"]
+    program_doc = await db.programs.find_one({"id": test['program_id']}, {"_id": 0, "pass_percentage": 1})
+    answer_key = {
+        "version": compiled["etag"],
+        "test_id": test_id,
+        "program_id": test['program_id'],
+        "test_type": test['test_type'],
+        "key": np.array([int(q['correct_answer']) for q in compiled["questions"]], dtype=np.int64),
+        "pass_percentage": program_doc.get('pass_percentage', 70.0) if program_doc else 70.0
+    }
+    answer_key_cache[test_id] = answer_key
+    return answer_key
+
+def invalidate_program_answer_keys(program_id: str):
+    """Drop cached answer keys after a program's pass_percentage may have changed"""
+    for test_id, answer_key in list(answer_key_cache.items()):
+        if answer_key["program_id"] == program_id:
+            answer_key_cache.pop(test_id, None)
+
+def align_answers(answers: List[int], question_indices: Optional[List[int]], question_count: int) -> np.ndarray:
+    """
+    Put a submission's answers back in original question order. Position i of a shuffled
+    submission answers question question_indices[i]; unanswered or out-of-range slots are -1.
+    """
+    submitted = np.asarray(answers[:question_count], dtype=np.int64)
+    positions = np.arange(len(submitted))
+    if question_indices:
+        mapped = np.asarray(question_indices[:len(submitted)], dtype=np.int64)
+        positions[:len(mapped)] = mapped
+    valid = (positions >= 0) & (positions < question_count)
+    aligned = np.full(question_count, -1, dtype=np.int64)
+    aligned[positions[valid]] = submitted[valid]
+    return aligned
+
+def score_submission(answer_key: dict, answers: List[int], question_indices: Optional[List[int]]) -> dict:
+    key = answer_key["key"]
+    correct = int(np.count_nonzero(align_answers(answers, question_indices, len(key)) == key))
+    score = (correct / len(key)) * 100 if len(key) else 0
+    return {
+        "correct_answers": correct,
+        "total_questions": len(key),
+        "score": score,
+        "passed": score >= answer_key["pass_percentage"]
+    }
+
+async def rescore_test_results(test_id: str, batch_size: int = 1000) -> dict:
+    """
+    Rescore every stored result of a test against its current answer key, e.g. after a
+    corrected key. Each batch is scored as one matrix compare; session_stats move by the deltas.
+    """
+    invalidate_cached_test(test_id)
+    answer_key_cache.pop(test_id, None)
+    answer_key = await get_answer_key(test_id)
+    if answer_key is None:
+        return {"rescored": 0, "changed": 0}
+    key = answer_key["key"]
+    
+    rescored = 0
+    changed = 0
+    stats_deltas = {}
+    batch = []
+    
+    async def flush():
+        nonlocal rescored, changed
+        if not batch:
+            return
+        matrix = np.stack([align_answers(r.get('answers', []), r.get('question_indices'), len(key)) for r in batch])
+        correct_counts = np.count_nonzero(matrix == key, axis=1)
+        operations = []
+        for result, correct in zip(batch, correct_counts.tolist()):
+            score = (correct / len(key)) * 100 if len(key) else 0
+            passed = score >= answer_key["pass_percentage"]
+            rescored += 1
+            if (result.get('correct_answers'), result.get('total_questions'), result.get('passed')) == (correct, len(key), passed):
+                continue
+            changed += 1
+            operations.append(UpdateOne({"_id": result["_id"]}, {"$set": {
+                "correct_answers": correct,
+                "total_questions": len(key),
+                "score": score,
+                "passed": passed
+            }}))
+            delta = stats_deltas.setdefault(result['session_id'], {"score_total": 0.0, "passed": 0})
+            delta["score_total"] += score - result.get('score', 0)
+            delta["passed"] += int(passed) - int(bool(result.get('passed')))
+        if operations:
+            await db.test_results.bulk_write(operations, ordered=False)
+        batch.clear()
+    
+    projection = {"answers": 1, "question_indices": 1, "session_id": 1, "score": 1, "correct_answers": 1, "total_questions": 1, "passed": 1}
+    async for result in db.test_results.find({"test_id": test_id}, projection).batch_size(batch_size):
+        batch.append(result)
+        if len(batch) >= batch_size:
+            await flush()
+    await flush()
+    
+    test_type = answer_key["test_type"]
+    for session_id, delta in stats_deltas.items():
+        await bump_session_stats(session_id, {
+            f"tests.{test_type}.score_total": delta["score_total"],
+            f"tests.{test_type}.passed": delta["passed"]
+        })
+    
+    return {"rescored": rescored, "changed": changed}
+
+# Item analysis: per test, the aligned answers matrix (one row per submission, columns in original
+# question order) is kept in memory and only extended with results newer than the last _id seen.
+ITEM_ANALYSIS_TTL_SECONDS = int(os.environ.get('ITEM_ANALYSIS_TTL_SECONDS', 3600))
+item_analysis_cache = TTLCache(maxsize=256, ttl=ITEM_ANALYSIS_TTL_SECONDS)
+ITEM_ANALYSIS_GROUP_FRACTION = 0.27  # Upper/lower groups for the discrimination index
+
+async def get_item_answer_matrix(test_id: str) -> Optional[dict]:
+    answer_key = await get_answer_key(test_id)
+    if answer_key is None:
+        return None
+    question_count = len(answer_key["key"])
+    
+    state = item_analysis_cache.get(test_id)
+    if state is None or state["version"] != answer_key["version"]:
+        state = {
+            "version": answer_key["version"],
+            "matrix": np.empty((0, question_count), dtype=np.int64),
+            "last_id": None,
+            "analysis": None
+        }
+    
+    start_id = state["last_id"]
+    query = {"test_id": test_id}
+    if start_id is not None:
+        query["_id"] = {"$gt": start_id}
+    rows = []
+    last_id = start_id
+    async for result in db.test_results.find(query, {"answers": 1, "question_indices": 1}).sort("_id", ASCENDING):
+        rows.append(align_answers(result.get('answers', []), result.get('question_indices'), question_count))
+        last_id = result["_id"]
+    
+    # A concurrent request may have extended the same state while this one was reading
+    if rows and state["last_id"] == start_id:
+        state["matrix"] = np.vstack([state["matrix"], np.stack(rows)])
+        state["last_id"] = last_id
+        state["analysis"] = None
+    
+    # Results are never deleted through the API; if some were removed out of band, start over
+    if await db.test_results.count_documents({"test_id": test_id}) < len(state["matrix"]):
+        item_analysis_cache.pop(test_id, None)
+        return await get_item_answer_matrix(test_id)
+    
+    item_analysis_cache[test_id] = state
+    return state
+
+def analyse_answer_matrix(matrix: np.ndarray, key: np.ndarray, questions: List[dict]) -> List[dict]:
+    """Difficulty, discrimination and distractor frequencies for every question of one test"""
+    respondents, question_count = matrix.shape
+    correct = matrix == key
+    
+    difficulty = correct.mean(axis=0) if respondents else np.zeros(question_count)
+    
+    discrimination = None
+    if respondents >= 2:
+        group_size = max(1, int(round(respondents * ITEM_ANALYSIS_GROUP_FRACTION)))
+        ranked = np.argsort(correct.sum(axis=1), kind="stable")
+        discrimination = correct[ranked[-group_size:]].mean(axis=0) - correct[ranked[:group_size]].mean(axis=0)
+    
+    option_width = max((len(q['options']) for q in questions), default=0)
+    answered = (matrix >= 0) & (matrix < option_width)
+    columns = np.broadcast_to(np.arange(question_count), matrix.shape)
+    option_counts = np.bincount(
+        (columns * option_width + matrix)[answered],
+        minlength=question_count * option_width
+    ).reshape(question_count, option_width) if option_width else np.zeros((question_count, 0), dtype=np.int64)
+    unanswered = respondents - answered.sum(axis=0)
+    
+    items = []
+    for index, question in enumerate(questions):
+        counts = option_counts[index, :len(question['options'])]
+        frequencies = counts / respondents if respondents else np.zeros(len(counts))
+        correct_option = int(key[index])
+        flags = []
+        if respondents:
+            if difficulty[index] < 0.2:
+                flags.append("too_hard")
+            elif difficulty[index] > 0.95:
+                flags.append("too_easy")
+            if discrimination is not None and discrimination[index] < 0:
+                flags.append("negative_discrimination")
+            elif discrimination is not None and discrimination[index] < 0.2:
+                flags.append("low_discrimination")
+            distractor_counts = np.delete(counts, correct_option) if 0 <= correct_option < len(counts) else counts
+            if len(distractor_counts) and 0 <= correct_option < len(counts) and distractor_counts.max() > counts[correct_option]:
+                flags.append("distractor_beats_key")
+        items.append({
+            "index": index,
+            "question": question['question'],
+            "correct_answer": correct_option,
+            "difficulty": round(float(difficulty[index]), 4),
+            "discrimination": round(float(discrimination[index]), 4) if discrimination is not None else None,
+            "options": [
+                {"option": option, "count": int(count), "frequency": round(float(frequency), 4), "is_correct": option_index == correct_option}
+                for option_index, (option, count, frequency) in enumerate(zip(question['options'], counts, frequencies))
+            ],
+            "unanswered": int(unanswered[index]),
+            "flags": flags
+        })
+    return items
+
+async def get_item_analysis(test_id: str) -> Optional[dict]:
+    state = await get_item_answer_matrix(test_id)
+    if state is None:
+        return None
+    if state["analysis"] is None:
+        compiled = await get_compiled_test(test_id)
+        answer_key = await get_answer_key(test_id)
+        state["analysis"] = {
+            "test_id": test_id,
+            "test_type": answer_key["test_type"],
+            "respondents": len(state["matrix"]),
+            "questions": analyse_answer_matrix(state["matrix"], answer_key["key"], compiled["questions"])
+        }
+    return state["analysis"]
+
+def item_question_key(text: str) -> str:
+    return " ".join(text.split()).lower()
+
 # Test Routes
 @api_router.post("/tests", response_model=Test)
 async def create_test(test_data: TestCreate, current_user: User = Depends(get_current_user)):
@@ -1454,6 +3613,7 @@ async def create_test(test_data: TestCreate, current_user: User = Depends(get_cu
     doc['created_at'] = doc['created_at'].isoformat()
     
     await db.tests.insert_one(doc)
+    invalidate_cached_test(test_obj.id, test_obj.program_id)
     return test_obj
 
 @api_router.get("/tests/program/{program_id}", response_model=List[Test])
@@ -1469,13 +3629,74 @@ async def delete_test(test_id: str, current_user: User = Depends(get_current_use
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can delete tests")
     
-    result = await db.tests.delete_one({"id": test_id})
+    test_doc = await db.tests.find_one_and_delete({"id": test_id}, {"_id": 0, "program_id": 1})
     
-    if result.deleted_count == 0:
+    if not test_doc:
         raise HTTPException(status_code=404, detail="Test not found")
     
+    invalidate_cached_test(test_id, test_doc.get('program_id'))
+    answer_key_cache.pop(test_id, None)
     return {"message": "Test deleted successfully"}
 
+@api_router.post("/tests/{test_id}/rescore")
+async def rescore_test(test_id: str, current_user: User = Depends(get_current_user)):
+    """Rescore all stored results of a test against its current answer key (admin only)"""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can rescore tests")
+    
+    if not await db.tests.find_one({"id": test_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Test not found")
+    
+    outcome = await rescore_test_results(test_id)
+    return {"message": f"Rescored {outcome['rescored']} results ({outcome['changed']} changed)", **outcome}
+
+@api_router.get("/tests/{test_id}/item-analysis")
+async def get_test_item_analysis(test_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Per-question statistics for a test: difficulty (share answering correctly), discrimination
+    (upper minus lower 27% by total score), option frequencies, and the pre/post gain for
+    questions that also appear in the program's other test.
+    """
+    if current_user.role not in ["admin", "coordinator", "trainer"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    analysis = await get_item_analysis(test_id)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Test not found")
+    
+    compiled = await get_compiled_test(test_id)
+    counterpart_type = "post" if analysis["test_type"] == "pre" else "pre"
+    counterpart = next(
+        (t for t in await get_compiled_program_tests(compiled["test"]['program_id']) if t["test"]['test_type'] == counterpart_type),
+        None
+    )
+    counterpart_analysis = await get_item_analysis(counterpart["test"]['id']) if counterpart else None
+    
+    counterpart_difficulty = {}
+    if counterpart_analysis and counterpart_analysis["respondents"]:
+        counterpart_difficulty = {item_question_key(item["question"]): item["difficulty"] for item in counterpart_analysis["questions"]}
+    
+    questions = []
+    for item in analysis["questions"]:
+        other = counterpart_difficulty.get(item_question_key(item["question"]))
+        gain = None
+        if other is not None and analysis["respondents"]:
+            pre, post = (item["difficulty"], other) if analysis["test_type"] == "pre" else (other, item["difficulty"])
+            gain = {
+                "pre_difficulty": pre,
+                "post_difficulty": post,
+                "gain": round(post - pre, 4),
+                "normalized_gain": round((post - pre) / (1 - pre), 4) if pre < 1 else None
+            }
+        questions.append({**item, "pre_post": gain})
+    
+    return {
+        **analysis,
+        "counterpart_test_id": counterpart["test"]['id'] if counterpart else None,
+        "flagged": sum(1 for item in questions if item["flags"]),
+        "questions": questions
+    }
+
 @api_router.get("/sessions/{session_id}/tests/available")
 async def get_available_tests(session_id: str, current_user: User = Depends(get_current_user)):
     if current_user.role != "participant":
@@ -1490,14 +3711,11 @@ async def get_available_tests(session_id: str, current_user: User = Depends(get_
     access = await get_or_create_participant_access(current_user.id, session_id)
     
     # Get tests for the session's program
-    tests = await db.tests.find({"program_id": session['program_id']}, {"_id": 0}).to_list(10)
+    tests = await get_compiled_program_tests(session['program_id'])
     
     available_tests = []
-    for test in tests:
-        if isinstance(test.get('created_at'), str):
-            test['created_at'] = datetime.fromisoformat(test['created_at'])
-        
-        test_type = test['test_type']
+    for compiled in tests:
+        test_type = compiled['test']['test_type']
         can_access = False
         is_completed = False
         
@@ -1509,99 +3727,53 @@ async def get_available_tests(session_id: str, current_user: User = Depends(get_
             is_completed = access.post_test_completed
         
         if can_access and not is_completed:
-            # Don't send correct answers to participant
-            test_copy = test.copy()
-            questions = test['questions'].copy()
-            
-            # Shuffle post-test questions
-            if test_type == "post":
-                random.shuffle(questions)
-            
-            test_copy['questions'] = [
-                {
-                    'question': q['question'],
-                    'options': q['options']
-                }
-                for q in questions
-            ]
-            available_tests.append(test_copy)
+            # Don't send correct answers to participant; shuffle post-test questions
+            available_tests.append(render_participant_test(compiled, shuffle=test_type == "post"))
     
     return available_tests
 
 @api_router.get("/tests/{test_id}")
-async def get_test(test_id: str, current_user: User = Depends(get_current_user)):
-    test_doc = await db.tests.find_one({"id": test_id}, {"_id": 0})
-    if not test_doc:
+async def get_test(test_id: str, request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    compiled = await get_compiled_test(test_id)
+    if not compiled:
         raise HTTPException(status_code=404, detail="Test not found")
     
-    if isinstance(test_doc.get('created_at'), str):
-        test_doc['created_at'] = datetime.fromisoformat(test_doc['created_at'])
-    
-    # Make a copy of questions for shuffling
-    questions = test_doc['questions'].copy()
-    
-    # Shuffle post-test questions for participants
-    if current_user.role == "participant" and test_doc['test_type'] == "post":
-        random.shuffle(questions)
+    # Participants and staff get different bodies (staff see correct answers), so each view has
+    # its own ETag. A client holding its view of this version (shuffled or not) can keep its copy.
+    view = "participant" if current_user.role == "participant" else "staff"
+    etag = f'{compiled["etag"][:-1]}-{view}"'
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers)
+    response.headers.update(cache_headers)
     
-    # Don't send correct answers to participants before submission
-    if current_user.role == "participant":
-        test_doc['questions'] = [
-            {
-                'question': q['question'],
-                'options': q['options'],
-                'original_index': test_doc['questions'].index(q)  # Track original position
-            }
-            for q in questions
-        ]
-    else:
-        test_doc['questions'] = questions
+    # Don't send correct answers to participants before submission; shuffle post-test questions
+    if view == "participant":
+        return render_participant_test(compiled, shuffle=compiled['test']['test_type'] == "post")
     
-    return test_doc
+    return {**compiled["test"], "questions": compiled["questions"]}
 
 @api_router.post("/tests/submit", response_model=TestResult)
 async def submit_test(submission: TestSubmit, current_user: User = Depends(get_current_user)):
     if current_user.role != "participant":
         raise HTTPException(status_code=403, detail="Only participants can submit tests")
     
-    test_doc = await db.tests.find_one({"id": submission.test_id}, {"_id": 0})
-    if not test_doc:
+    answer_key = await get_answer_key(submission.test_id)
+    if not answer_key:
         raise HTTPException(status_code=404, detail="Test not found")
     
-    program_doc = await db.programs.find_one({"id": test_doc['program_id']}, {"_id": 0})
-    pass_percentage = program_doc.get('pass_percentage', 70.0) if program_doc else 70.0
-    
-    questions = test_doc['questions']
-    
-    # Ensure both are integers for comparison
-    correct = 0
-    for i, ans in enumerate(submission.answers):
-        if i < len(questions):
-            # If question_indices provided (shuffled test), use original index
-            if submission.question_indices and i < len(submission.question_indices):
-                original_idx = submission.question_indices[i]
-            else:
-                original_idx = i
-            
-            if original_idx < len(questions):
-                submitted_answer = int(ans)
-                correct_answer = int(questions[original_idx]['correct_answer'])
-                if submitted_answer == correct_answer:
-                    correct += 1
-    
-    score = (correct / len(questions)) * 100 if questions else 0
-    passed = score >= pass_percentage
+    result = score_submission(answer_key, submission.answers, submission.question_indices)
     
     result_obj = TestResult(
         test_id=submission.test_id,
         participant_id=current_user.id,
         session_id=submission.session_id,
-        test_type=test_doc['test_type'],
+        test_type=answer_key['test_type'],
         answers=submission.answers,
-        score=score,
-        total_questions=len(questions),
-        correct_answers=correct,
-        passed=passed,
+        score=result['score'],
+        total_questions=result['total_questions'],
+        correct_answers=result['correct_answers'],
+        passed=result['passed'],
         question_indices=submission.question_indices  # Store the shuffled order
     )
     
@@ -1610,11 +3782,14 @@ async def submit_test(submission: TestSubmit, current_user: User = Depends(get_c
     
     await db.test_results.insert_one(doc)
     
-    update_field = 'pre_test_completed' if test_doc['test_type'] == 'pre' else 'post_test_completed'
-    await db.participant_access.update_one(
-        {"participant_id": current_user.id, "session_id": submission.session_id},
-        {"$set": {update_field: True}}
-    )
+    test_type = answer_key['test_type']
+    await bump_session_stats(submission.session_id, {
+        f"tests.{test_type}.count": 1,
+        f"tests.{test_type}.passed": 1 if result_obj.passed else 0,
+        f"tests.{test_type}.score_total": result_obj.score
+    })
+    update_field = 'pre_test_completed' if test_type == 'pre' else 'post_test_completed'
+    await update_access_flags(current_user.id, submission.session_id, {update_field: True})
     
     return result_obj
 
@@ -1808,6 +3983,22 @@ async def get_vehicle_details(session_id: str, participant_id: str, current_user
     return vehicle
 
 # Attendance Routes
+def attendance_clock_in_update(participant_id: str, session_id: str, today: str, now: str):
+    """
+    Filter and update for one clock-in upsert against the participant/session/date unique index.
+    It only matches a row without a clock_in, so a second tap falls through to an insert that
+    the index rejects with a duplicate key error.
+    """
+    doc = Attendance(participant_id=participant_id, session_id=session_id, date=today).model_dump()
+    doc['created_at'] = doc['created_at'].isoformat()
+    return (
+        {"participant_id": participant_id, "session_id": session_id, "date": today, "clock_in": None},
+        {"$set": {"clock_in": now}, "$setOnInsert": {key: doc[key] for key in ("id", "clock_out", "created_at")}}
+    )
+
+def attendance_clock_out_filter(participant_id: str, session_id: str, today: str) -> dict:
+    return {"participant_id": participant_id, "session_id": session_id, "date": today, "clock_in": {"$ne": None}, "clock_out": None}
+
 @api_router.post("/attendance/clock-in")
 async def clock_in(attendance_data: AttendanceClockIn, current_user: User = Depends(get_current_user)):
     if current_user.role != "participant":
@@ -1816,35 +4007,23 @@ async def clock_in(attendance_data: AttendanceClockIn, current_user: User = Depe
     today = datetime.now(timezone.utc).date().isoformat()
     now = datetime.now(timezone.utc).strftime("%H:%M:%S")
     
-    # Check if already clocked in today
-    existing = await db.attendance.find_one({
-        "participant_id": current_user.id,
-        "session_id": attendance_data.session_id,
-        "date": today
-    }, {"_id": 0})
-    
-    if existing and existing.get('clock_in'):
+    await require_unique_index("attendance", "participant_session_date_unique")
+    attendance_filter, attendance_update = attendance_clock_in_update(current_user.id, attendance_data.session_id, today, now)
+    try:
+        await db.attendance.find_one_and_update(attendance_filter, attendance_update, projection={"_id": 1}, upsert=True)
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Already clocked in today")
     
-    if existing:
-        # Update existing
-        await db.attendance.update_one(
-            {"id": existing['id']},
-            {"$set": {"clock_in": now}}
-        )
-        return {"message": "Clocked in successfully", "time": now}
-    
-    # Create new
-    attendance_obj = Attendance(
-        participant_id=current_user.id,
-        session_id=attendance_data.session_id,
-        date=today,
-        clock_in=now
-    )
-    
-    doc = attendance_obj.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.attendance.insert_one(doc)
+    attended_before = await db.attendance.find_one({
+        "participant_id": current_user.id,
+        "session_id": attendance_data.session_id,
+        "date": {"$ne": today},
+        "clock_in": {"$ne": None}
+    }, {"_id": 1})
+    await bump_session_stats(attendance_data.session_id, {
+        "attendance.clock_ins": 1,
+        "attendance.participants": 0 if attended_before else 1
+    })
     
     return {"message": "Clocked in successfully", "time": now}
 
@@ -1856,25 +4035,172 @@ async def clock_out(attendance_data: AttendanceClockOut, current_user: User = De
     today = datetime.now(timezone.utc).date().isoformat()
     now = datetime.now(timezone.utc).strftime("%H:%M:%S")
     
-    existing = await db.attendance.find_one({
-        "participant_id": current_user.id,
-        "session_id": attendance_data.session_id,
-        "date": today
-    }, {"_id": 0})
-    
-    if not existing or not existing.get('clock_in'):
-        raise HTTPException(status_code=400, detail="Please clock in first")
+    updated = await db.attendance.find_one_and_update(
+        attendance_clock_out_filter(current_user.id, attendance_data.session_id, today),
+        {"$set": {"clock_out": now}},
+        projection={"_id": 1}
+    )
     
-    if existing.get('clock_out'):
+    if not updated:
+        # Only the rejected tap pays for a second read, to say why
+        existing = await db.attendance.find_one({
+            "participant_id": current_user.id,
+            "session_id": attendance_data.session_id,
+            "date": today
+        }, {"_id": 0, "clock_in": 1})
+        if not existing or not existing.get('clock_in'):
+            raise HTTPException(status_code=400, detail="Please clock in first")
         raise HTTPException(status_code=400, detail="Already clocked out today")
     
-    await db.attendance.update_one(
-        {"id": existing['id']},
-        {"$set": {"clock_out": now}}
-    )
+    await bump_session_stats(attendance_data.session_id, {"attendance.clock_outs": 1})
     
     return {"message": "Clocked out successfully", "time": now}
 
+@api_router.post("/attendance/batch")
+async def batch_attendance(batch: AttendanceBatch, current_user: User = Depends(get_current_user)):
+    """
+    Kiosk clock-in/out for many participants of one session, by user id or IC number.
+    Clock-ins go out in one bulk_write; clock-outs are conditional updates sent concurrently so each
+    one's modified_count says whether it took effect. The response has an outcome per requested
+    participant.
+    """
+    if batch.action not in ("clock_in", "clock_out"):
+        raise HTTPException(status_code=400, detail="action must be 'clock_in' or 'clock_out'")
+    if current_user.role not in ["coordinator", "admin"]:
+        raise HTTPException(status_code=403, detail="Only admins and coordinators can record attendance for participants")
+    
+    session = await db.sessions.find_one({"id": batch.session_id}, {"_id": 0, "participant_ids": 1, "coordinator_id": 1})
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if current_user.role == "coordinator" and session.get("coordinator_id") != current_user.id:
+        raise HTTPException(status_code=403, detail="You can only record attendance for sessions assigned to you")
+    
+    today = datetime.now(timezone.utc).date().isoformat()
+    now = datetime.now(timezone.utc).strftime("%H:%M:%S")
+    session_participants = set(session.get("participant_ids", []))
+    
+    # Resolve IC numbers to participant ids in one query
+    participant_by_id_number = {}
+    if batch.id_numbers:
+        users = await db.users.find(
+            {"id_number": {"$in": batch.id_numbers}, "role": "participant"},
+            {"_id": 0, "id": 1, "id_number": 1}
+        ).to_list(length=None)
+        participant_by_id_number = {user['id_number']: user['id'] for user in users}
+    
+    outcomes = []
+    requested = []  # (outcome, participant_id) in request order, deduplicated
+    seen = set()
+    lookups = [{"participant_id": pid} for pid in batch.participant_ids] + \
+        [{"id_number": number, "participant_id": participant_by_id_number.get(number)} for number in batch.id_numbers]
+    for outcome in lookups:
+        participant_id = outcome["participant_id"]
+        outcomes.append(outcome)
+        if participant_id is None:
+            outcome["status"] = "not_found"
+        elif participant_id not in session_participants:
+            outcome["status"] = "not_in_session"
+        elif participant_id in seen:
+            outcome["status"] = "duplicate"
+        else:
+            seen.add(participant_id)
+            requested.append((outcome, participant_id))
+    
+    participant_ids = [participant_id for _, participant_id in requested]
+    if batch.action == "clock_in":
+        await require_unique_index("attendance", "participant_session_date_unique")
+        operations = [UpdateOne(*attendance_clock_in_update(pid, batch.session_id, today, now), upsert=True) for pid in participant_ids]
+        attended_before = set()
+        if participant_ids:
+            attended_before = set(await db.attendance.distinct("participant_id", {
+                "session_id": batch.session_id,
+                "participant_id": {"$in": participant_ids},
+                "date": {"$ne": today},
+                "clock_in": {"$ne": None}
+            }))
+    else:
+        # Classify from today's rows up front; the conditional filters still guard the writes
+        today_rows = {}
+        if participant_ids:
+            async for row in db.attendance.find(
+                {"session_id": batch.session_id, "date": today, "participant_id": {"$in": participant_ids}},
+                {"_id": 0, "participant_id": 1, "clock_in": 1, "clock_out": 1}
+            ):
+                today_rows[row['participant_id']] = row
+        pending = []
+        for outcome, participant_id in requested:
+            row = today_rows.get(participant_id)
+            if not row or not row.get('clock_in'):
+                outcome["status"] = "not_clocked_in"
+            elif row.get('clock_out'):
+                outcome["status"] = "already_clocked_out"
+            else:
+                pending.append((outcome, participant_id))
+        requested = pending
+        operations = []
+    
+    failed = {}
+    if operations:
+        try:
+            await db.attendance.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            failed = {error['index']: error for error in e.details.get('writeErrors', [])}
+    
+    unmatched = {}
+    if batch.action == "clock_out" and requested:
+        results = await asyncio.gather(*(
+            db.attendance.update_one(attendance_clock_out_filter(pid, batch.session_id, today), {"$set": {"clock_out": now}})
+            for _, pid in requested
+        ), return_exceptions=True)
+        for index, result in enumerate(results):
+            if isinstance(result, Exception):
+                failed[index] = {"errmsg": str(result)}
+            elif result.modified_count == 0:
+                unmatched[index] = requested[index][1]
+        if unmatched:
+            # The row changed after the pre-read (clocked out elsewhere, or removed); say how it is now
+            today_rows = {}
+            async for row in db.attendance.find(
+                {"session_id": batch.session_id, "date": today, "participant_id": {"$in": list(unmatched.values())}},
+                {"_id": 0, "participant_id": 1, "clock_in": 1, "clock_out": 1}
+            ):
+                today_rows[row['participant_id']] = row
+            unmatched = {
+                index: "already_clocked_out" if today_rows.get(pid, {}).get('clock_out') else "not_clocked_in"
+                for index, pid in unmatched.items()
+            }
+    
+    recorded = []
+    for index, (outcome, participant_id) in enumerate(requested):
+        error = failed.get(index)
+        if index in unmatched:
+            outcome["status"] = unmatched[index]
+        elif error is None:
+            outcome["status"] = "clocked_in" if batch.action == "clock_in" else "clocked_out"
+            outcome["time"] = now
+            recorded.append(participant_id)
+        elif error.get('code') == 11000:
+            outcome["status"] = "already_clocked_in"
+        else:
+            outcome["status"] = "failed"
+            outcome["error"] = error.get('errmsg')
+    
+    if recorded:
+        if batch.action == "clock_in":
+            await bump_session_stats(batch.session_id, {
+                "attendance.clock_ins": len(recorded),
+                "attendance.participants": sum(1 for pid in recorded if pid not in attended_before)
+            })
+        else:
+            await bump_session_stats(batch.session_id, {"attendance.clock_outs": len(recorded)})
+    
+    return {
+        "session_id": batch.session_id,
+        "action": batch.action,
+        "recorded": len(recorded),
+        "outcomes": outcomes
+    }
+
 @api_router.get("/attendance/{session_id}/{participant_id}")
 async def get_attendance(session_id: str, participant_id: str, current_user: User = Depends(get_current_user)):
     attendance_records = await db.attendance.find({
@@ -1931,6 +4257,130 @@ async def get_session_attendance(session_id: str, current_user: User = Depends(g
     
     return attendance_records
 
+ATTENDANCE_EXPORT_COLUMNS = ["Company", "Program", "Session", "Date", "Participant Name", "Email", "ID Number", "Clock In", "Clock Out"]
+ATTENDANCE_EXPORT_CHUNK_ROWS = 500
+
+@api_router.get("/attendance/export")
+async def export_attendance(
+    company_id: Optional[str] = None,
+    program_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream attendance for every session of a company and/or program (or one session) within a
+    date range as CSV or XLSX. Rows come from one cursor over the session/date index joined with
+    user names and are written out in chunks, so memory stays flat however long the range is.
+    """
+    if current_user.role not in ["pic_supervisor", "coordinator", "admin"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    session_query = {}
+    if session_id:
+        session_query["id"] = session_id
+    if program_id:
+        session_query["program_id"] = program_id
+    if company_id:
+        session_query["company_id"] = company_id
+    if not session_query:
+        raise HTTPException(status_code=400, detail="Provide a session_id, program_id or company_id")
+    if current_user.role == "coordinator":
+        session_query["coordinator_id"] = current_user.id
+    elif current_user.role == "pic_supervisor":
+        session_query["supervisor_ids"] = current_user.id
+    
+    sessions = await db.sessions.find(
+        session_query, {"_id": 0, "id": 1, "name": 1, "program_id": 1, "company_id": 1}
+    ).to_list(length=None)
+    if not sessions:
+        raise HTTPException(status_code=404, detail="No sessions found")
+    
+    program_names = {
+        p['id']: p.get('name', '')
+        for p in await db.programs.find({"id": {"$in": list({s['program_id'] for s in sessions})}}, {"_id": 0, "id": 1, "name": 1}).to_list(length=None)
+    }
+    company_names = {
+        c['id']: c.get('name', '')
+        for c in await db.companies.find({"id": {"$in": list({s['company_id'] for s in sessions})}}, {"_id": 0, "id": 1, "name": 1}).to_list(length=None)
+    }
+    session_labels = {
+        s['id']: [company_names.get(s['company_id'], ''), program_names.get(s['program_id'], ''), s.get('name', '')]
+        for s in sessions
+    }
+    
+    match = {"session_id": {"$in": list(session_labels)}}
+    date_range = {}
+    if date_from:
+        date_range["$gte"] = date_from
+    if date_to:
+        date_range["$lte"] = date_to
+    if date_range:
+        match["date"] = date_range
+    
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"session_id": 1, "date": 1}},
+        {"$lookup": {"from": "users", "localField": "participant_id", "foreignField": "id", "as": "participant"}},
+        {"$project": {
+            "_id": 0,
+            "session_id": 1,
+            "date": 1,
+            "clock_in": 1,
+            "clock_out": 1,
+            "participant": {
+                "full_name": {"$arrayElemAt": ["$participant.full_name", 0]},
+                "email": {"$arrayElemAt": ["$participant.email", 0]},
+                "id_number": {"$arrayElemAt": ["$participant.id_number", 0]}
+            }
+        }}
+    ]
+    
+    def export_row(record: dict) -> list:
+        participant = record.get('participant') or {}
+        return session_labels[record['session_id']] + [
+            record.get('date'), participant.get('full_name'), participant.get('email'), participant.get('id_number'),
+            record.get('clock_in'), record.get('clock_out')
+        ]
+    
+    rows = db.attendance.aggregate(pipeline, allowDiskUse=True, batchSize=ATTENDANCE_EXPORT_CHUNK_ROWS)
+    
+    if format == "xlsx":
+        async def generate():
+            writer = XlsxStreamWriter("Attendance")
+            writer.write_row(ATTENDANCE_EXPORT_COLUMNS)
+            written = 0
+            async for record in rows:
+                writer.write_row(export_row(record))
+                written += 1
+                if written % ATTENDANCE_EXPORT_CHUNK_ROWS == 0:
+                    data = writer.drain()
+                    if data:
+                        yield data
+            yield writer.close()
+        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        async def generate():
+            chunk = [csv_row(ATTENDANCE_EXPORT_COLUMNS)]
+            async for record in rows:
+                chunk.append(csv_row(export_row(record)))
+                if len(chunk) >= ATTENDANCE_EXPORT_CHUNK_ROWS:
+                    yield "".join(chunk)
+                    chunk = []
+            yield "".join(chunk)
+        media_type = "text/csv"
+    
+    label = certificate_archive_name(sessions[0]['name'] if session_id else (company_names.get(company_id) or program_names.get(program_id)))
+    if date_from or date_to:
+        label = f"{label}_{date_from or 'start'}_{date_to or 'end'}"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=attendance_{label}.{format}"}
+    )
+
 # Training Report Routes
 @api_router.post("/training-reports", response_model=TrainingReport)
 async def create_training_report(report_data: TrainingReportCreate, current_user: User = Depends(get_current_user)):
@@ -1938,8 +4388,15 @@ async def create_training_report(report_data: TrainingReportCreate, current_user
     if current_user.role != "coordinator":
         raise HTTPException(status_code=403, detail="Only coordinators can create training reports")
     
+    # Store photos as files so the report document only keeps references
+    try:
+        photos = store_report_photos({field: getattr(report_data, field) for field in TRAINING_REPORT_PHOTO_FIELDS})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    report_data = report_data.model_copy(update=photos)
+    
     # Check if report already exists for this session
-    existing = await db.training_reports.find_one({"session_id": report_data.session_id}, {"_id": 0})
+    existing = await db.training_reports.find_one({"session_id": report_data.session_id}, {"_id": 1})
     
     if existing:
         # Update existing report
@@ -1951,8 +4408,9 @@ async def create_training_report(report_data: TrainingReportCreate, current_user
             {"session_id": report_data.session_id},
             {"$set": update_data}
         )
+        await refresh_report_listing_fields({"session_id": report_data.session_id})
         
-        updated = await db.training_reports.find_one({"session_id": report_data.session_id}, {"_id": 0})
+        updated = await db.training_reports.find_one({"session_id": report_data.session_id}, {"_id": 0, "search_text": 0})
         if isinstance(updated.get('created_at'), str):
             updated['created_at'] = datetime.fromisoformat(updated['created_at'])
         if isinstance(updated.get('submitted_at'), str):
@@ -1974,6 +4432,7 @@ async def create_training_report(report_data: TrainingReportCreate, current_user
         doc['submitted_at'] = doc['submitted_at'].isoformat()
     
     await db.training_reports.insert_one(doc)
+    await refresh_report_listing_fields({"session_id": report_data.session_id})
     return report_obj
 
 @api_router.get("/training-reports/{session_id}")
@@ -2017,101 +4476,140 @@ async def get_all_training_reports(
     status: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all training reports with search and filter - Admin only"""
+    """
+    Get training reports with search and filter - Admin only
+    Filtering, sorting and the keyset page run on the report indexes before any join; session,
+    coordinator, company and program details are joined for the returned page only.
+    Pass the returned next_cursor back as `cursor` to fetch the next page.
+    """
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access only")
     
     # Build query
-    query = {"status": "submitted"}  # Only show submitted reports
-    
-    if status:
-        query["status"] = status
+    query = {"status": status or "submitted"}  # Only show submitted reports by default
+    # Reports whose session was deleted are not listed (has_session is kept by
+    # refresh_report_listing_fields and delete_session, so this needs no join)
+    query["has_session"] = {"$ne": False}
+    
+    if search:
+        query["$text"] = {"$search": search}
+    if company_id:
+        query["company_id"] = company_id
+    if program_id:
+        query["program_id"] = program_id
+    # Reports without session dates are kept, as before
+    if start_date:
+        query["session_start_date"] = {"$not": {"$lt": start_date}}
+    if end_date:
+        query["session_end_date"] = {"$not": {"$gt": end_date}}
+    
+    # Keyset pagination on (submitted_at, _id), most recent first
+    page_query = dict(query)
+    if cursor:
+        last_submitted_at, last_id = decode_page_cursor(cursor)
+        page_query["$or"] = [
+            {"submitted_at": {"$lt": last_submitted_at}},
+            {"submitted_at": last_submitted_at, "_id": {"$lt": last_id}}
+        ]
     
-    # Get all submitted reports
-    reports = await db.training_reports.find(query, {"_id": 0}).to_list(1000)
+    pipeline = [
+        {"$match": page_query},
+        {"$sort": {"submitted_at": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$lookup": {"from": "sessions", "localField": "session_id", "foreignField": "id", "as": "session"}},
+        {"$unwind": {"path": "$session", "preserveNullAndEmptyArrays": True}},
+        {"$lookup": {"from": "users", "localField": "coordinator_id", "foreignField": "id", "as": "coordinator"}},
+        {"$lookup": {"from": "companies", "localField": "session.company_id", "foreignField": "id", "as": "company"}},
+        {"$lookup": {"from": "programs", "localField": "session.program_id", "foreignField": "id", "as": "program"}},
+        {"$addFields": {
+            "cursor_id": {"$toString": "$_id"},
+            "session_name": {"$ifNull": ["$session.name", "Unknown"]},
+            "session_start_date": "$session.start_date",
+            "session_end_date": "$session.end_date",
+            "session_location": "$session.location",
+            "coordinator_name": {"$ifNull": [{"$arrayElemAt": ["$coordinator.full_name", 0]}, "Unknown"]},
+            "company_name": {"$ifNull": [{"$arrayElemAt": ["$company.name", 0]}, "Unknown"]},
+            "company_id": "$session.company_id",
+            "program_name": {"$ifNull": [{"$arrayElemAt": ["$program.name", 0]}, "Unknown"]},
+            "program_id": "$session.program_id",
+            "participant_count": {"$size": {"$ifNull": ["$session.participant_ids", []]}}
+        }},
+        {"$project": {"_id": 0, "session": 0, "coordinator": 0, "company": 0, "program": 0, "search_text": 0, "has_session": 0}}
+    ]
     
-    # Enrich each report with session, coordinator, company, program details
-    enriched_reports = []
+    total, reports = await asyncio.gather(
+        db.training_reports.count_documents(query),
+        db.training_reports.aggregate(pipeline).to_list(limit + 1)
+    )
     
+    next_cursor = None
+    if len(reports) > limit:
+        reports = reports[:limit]
+        last = reports[-1]
+        next_cursor = encode_page_cursor([last.get('submitted_at'), last['cursor_id']])
     for report in reports:
-        session = await db.sessions.find_one({"id": report['session_id']}, {"_id": 0})
-        if not session:
-            continue
-        
-        # Get coordinator details
-        coordinator = await db.users.find_one({"id": report.get('coordinator_id')}, {"_id": 0})
-        
-        # Get company and program details
-        company = await db.companies.find_one({"id": session.get('company_id')}, {"_id": 0})
-        program = await db.programs.find_one({"id": session.get('program_id')}, {"_id": 0})
-        
-        # Get participant count
-        participant_count = len(session.get('participant_ids', []))
-        
-        # Apply filters
-        if company_id and session.get('company_id') != company_id:
-            continue
-        
-        if program_id and session.get('program_id') != program_id:
-            continue
-        
-        # Apply date filter
-        if start_date:
-            session_date = session.get('start_date')
-            if session_date and session_date < start_date:
-                continue
-        
-        if end_date:
-            session_date = session.get('end_date')
-            if session_date and session_date > end_date:
-                continue
-        
-        # Build enriched report
-        enriched = {
-            **report,
-            "session_name": session.get('name', 'Unknown'),
-            "session_start_date": session.get('start_date'),
-            "session_end_date": session.get('end_date'),
-            "session_location": session.get('location'),
-            "coordinator_name": coordinator.get('full_name') if coordinator else 'Unknown',
-            "company_name": company.get('name') if company else 'Unknown',
-            "company_id": session.get('company_id'),
-            "program_name": program.get('name') if program else 'Unknown',
-            "program_id": session.get('program_id'),
-            "participant_count": participant_count
-        }
-        
-        # Apply search filter
-        if search:
-            search_lower = search.lower()
-            searchable_text = f"{enriched['session_name']} {enriched['coordinator_name']} {enriched['company_name']} {enriched['program_name']} {enriched['session_location']}".lower()
-            
-            if search_lower not in searchable_text:
-                continue
-        
-        enriched_reports.append(enriched)
-    
-    # Sort by submitted date (most recent first)
-    enriched_reports.sort(key=lambda x: x.get('submitted_at', ''), reverse=True)
+        report.pop('cursor_id', None)
     
     return {
-        "total": len(enriched_reports),
-        "reports": enriched_reports
+        "total": total,
+        "reports": reports,
+        "next_cursor": next_cursor
     }
 
 
-@api_router.post("/training-reports/{session_id}/generate-ai-report")
-async def generate_ai_report(session_id: str, current_user: User = Depends(get_current_user)):
-    """Generate AI training report using ChatGPT"""
+# AI report cache: LLM output is stored in report_cache under a fingerprint of everything that
+# went into the prompt plus the model name, so regenerating an unchanged report is a lookup.
+AI_REPORT_MODEL = "gpt-4o"
+ai_report_cache_stats = {"hits": 0, "misses": 0, "refreshes": 0}
+
+def ai_report_fingerprint(*prompt_parts: str) -> str:
+    return hashlib.sha256(json.dumps(prompt_parts).encode()).hexdigest()
+
+async def get_cached_ai_report(fingerprint: str, model: str, force_refresh: bool = False) -> Optional[dict]:
+    if force_refresh:
+        ai_report_cache_stats["refreshes"] += 1
+        return None
+    cached = await db.report_cache.find_one({"fingerprint": fingerprint, "model": model}, {"_id": 0})
+    ai_report_cache_stats["hits" if cached else "misses"] += 1
+    return cached
+
+async def store_cached_ai_report(fingerprint: str, model: str, kind: str, session_id: str, content: str):
+    await db.report_cache.update_one(
+        {"fingerprint": fingerprint, "model": model},
+        {"$set": {
+            "kind": kind,
+            "session_id": session_id,
+            "content": content,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }},
+        upsert=True
+    )
+
+@api_router.post("/training-reports/{session_id}/generate-ai-report", status_code=202)
+async def generate_ai_report(session_id: str, force_refresh: bool = False, current_user: User = Depends(get_current_user)):
+    """Queue AI training report generation; poll the returned job. force_refresh skips the report cache."""
     if current_user.role != "coordinator" and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only coordinators can generate reports")
     
+    if not await db.sessions.find_one({"id": session_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    job = await job_queue.enqueue("ai_report", {"session_id": session_id, "force_refresh": force_refresh}, current_user)
+    return job_accepted(job)
+
+@job_handler("ai_report", can_read=staff_report_reader)
+async def build_ai_report(params: dict, current_user: User) -> dict:
+    """Generate AI training report using ChatGPT"""
     from emergentintegrations.llm.chat import LlmChat, UserMessage, FileContentWithMimeType
     from dotenv import load_dotenv
     load_dotenv()
     
+    session_id = params['session_id']
+    
     # Get session details
     session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
     if not session:
@@ -2126,13 +4624,11 @@ async def generate_ai_report(session_id: str, current_user: User = Depends(get_c
     # Get participants count
     participant_count = len(session.get('participant_ids', []))
     
-    # Get attendance records
-    attendance_records = await db.attendance.find({"session_id": session_id}, {"_id": 0}).to_list(1000)
-    total_attendance = len(set([r['participant_id'] for r in attendance_records]))
-    
-    # Get test results
-    test_results = await db.test_results.find({"session_id": session_id}, {"_id": 0}).to_list(1000)
-    passed_tests = len([r for r in test_results if r.get('passed', False)])
+    # Attendance and test outcomes from the session's stats
+    stats = await get_session_stats(session_id)
+    total_attendance = stats["attendance"]["participants"]
+    total_tests = stats["tests"]["pre"]["count"] + stats["tests"]["post"]["count"]
+    passed_tests = stats["tests"]["pre"]["passed"] + stats["tests"]["post"]["passed"]
     
     # Get training report with photos
     training_report = await db.training_reports.find_one({"session_id": session_id}, {"_id": 0})
@@ -2148,7 +4644,7 @@ Training Location: {session.get('location', 'N/A')}
 Training Period: {session.get('start_date', 'N/A')} to {session.get('end_date', 'N/A')}
 Total Participants: {participant_count}
 Attendance: {total_attendance} out of {participant_count} participants
-Assessment Pass Rate: {passed_tests} out of {len(test_results)} passed
+Assessment Pass Rate: {passed_tests} out of {total_tests} passed
 
 **DOCUMENTATION:**
 - Group Photo: {'Attached' if training_report and training_report.get('group_photo') else 'Not provided'}
@@ -2181,7 +4677,7 @@ Assessment Pass Rate: {passed_tests} out of {len(test_results)} passed
 ## 5. PARTICIPANT PERFORMANCE
 - Total Enrolled: {participant_count}
 - Attendance Rate: {round((total_attendance/participant_count)*100) if participant_count > 0 else 0}%
-- Assessment Pass Rate: {round((passed_tests/len(test_results))*100) if len(test_results) > 0 else 0}%
+- Assessment Pass Rate: {round((passed_tests/total_tests)*100) if total_tests > 0 else 0}%
 
 ## 6. KEY LEARNING OUTCOMES
 [List 4-5 key skills/knowledge participants gained]
@@ -2203,59 +4699,145 @@ Assessment Pass Rate: {passed_tests} out of {len(test_results)} passed
 
 ---
 Report Prepared By: Training Coordinator
-Date: {datetime.now(timezone.utc).strftime('%Y-%m-%d')}
+Date: {{report_date}}
 
 Please generate this report professionally with proper formatting, specific details based on the data provided, and maintain a formal tone suitable for official documentation.
 """
     
+    system_message = "You are a professional training report writer specializing in defensive driving and road safety training programs."
+    # Fingerprint before the date is filled in, so an unchanged session hits the cache on later days
+    fingerprint = ai_report_fingerprint("ai_report", system_message, context)
+    context = context.replace("{report_date}", datetime.now(timezone.utc).strftime('%Y-%m-%d'))
+    
     try:
-        # Initialize LLM Chat
-        api_key = os.environ.get('EMERGENT_LLM_KEY', '')
-        if not api_key:
-            raise HTTPException(status_code=500, detail="EMERGENT_LLM_KEY not configured")
-        
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=f"report_{session_id}",
-            system_message="You are a professional training report writer specializing in defensive driving and road safety training programs."
-        ).with_model("openai", "gpt-4o")
-        
-        user_message = UserMessage(text=context)
-        
-        # Generate report
-        ai_response = await chat.send_message(user_message)
+        cached = await get_cached_ai_report(fingerprint, AI_REPORT_MODEL, params.get('force_refresh', False))
+        if cached:
+            ai_response = cached['content']
+        else:
+            # Initialize LLM Chat
+            api_key = os.environ.get('EMERGENT_LLM_KEY', '')
+            if not api_key:
+                raise PermanentJobError("EMERGENT_LLM_KEY not configured")
+            
+            chat = LlmChat(
+                api_key=api_key,
+                session_id=f"report_{session_id}",
+                system_message=system_message
+            ).with_model("openai", AI_REPORT_MODEL)
+            
+            user_message = UserMessage(text=context)
+            
+            # Generate report
+            ai_response = await chat.send_message(user_message)
+            await store_cached_ai_report(fingerprint, AI_REPORT_MODEL, "ai_report", session_id, ai_response)
         
         return {
             "session_id": session_id,
             "generated_report": ai_response,
+            "cached": bool(cached),
+            "generated_at": cached['created_at'] if cached else datetime.now(timezone.utc).isoformat(),
             "metadata": {
                 "participant_count": participant_count,
                 "attendance_rate": f"{total_attendance}/{participant_count}",
-                "test_pass_rate": f"{passed_tests}/{len(test_results)}",
+                "test_pass_rate": f"{passed_tests}/{total_tests}",
                 "photos_included": bool(training_report)
             }
         }
         
+    except (HTTPException, PermanentJobError):
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate AI report: {str(e)}")
+        detail = f"Failed to generate AI report: {str(e)}"
+        if not job_retryable(e):
+            raise PermanentJobError(detail) from e
+        raise HTTPException(status_code=500, detail=detail) from e
 
 
 # Professional DOCX Report Generation
-@api_router.post("/training-reports/{session_id}/generate-docx")
+async def load_docx_report_data(session: dict) -> dict:
+    """
+    Load everything the DOCX report reads for a session up front: one query per collection,
+    run concurrently, then one $in lookup for every user the report names.
+    """
+    session_id = session['id']
+    participant_ids = session.get('participant_ids', [])
+    
+    async def first_test_results() -> dict:
+        # Keep the earliest submission per participant and test type, as find_one did
+        results = {}
+        async for result in db.test_results.find(
+            {"session_id": session_id, "participant_id": {"$in": participant_ids}, "test_type": {"$in": ["pre", "post"]}},
+            {"_id": 0, "participant_id": 1, "test_type": 1, "score": 1, "passed": 1}
+        ).sort("_id", ASCENDING):
+            results.setdefault((result['participant_id'], result['test_type']), result)
+        return results
+    
+    async def feedback_templates() -> dict:
+        templates = await db.feedback_templates.find(
+            {"id": {"$in": ["coordinator_feedback_template", "chief_trainer_feedback_template"]}}, {"_id": 0}
+        ).to_list(length=None)
+        return {template['id']: template for template in templates}
+    
+    (
+        test_results, checklists, course_feedback, training_report,
+        coordinator_feedback, chief_trainer_feedback, templates
+    ) = await asyncio.gather(
+        first_test_results(),
+        db.vehicle_checklists.find({"session_id": session_id}, {"_id": 0}).to_list(100),
+        db.course_feedback.find({"session_id": session_id}, {"_id": 0}).to_list(100),
+        db.training_reports.find_one({"session_id": session_id}, {"_id": 0}),
+        db.coordinator_feedback.find_one({"session_id": session_id}, {"_id": 0}),
+        db.chief_trainer_feedback.find_one({"session_id": session_id}, {"_id": 0}),
+        feedback_templates()
+    )
+    
+    user_ids = set(participant_ids)
+    user_ids.update(checklist['participant_id'] for checklist in checklists)
+    user_ids.update(feedback['participant_id'] for feedback in course_feedback)
+    users = await db.users.find(
+        {"id": {"$in": list(user_ids)}}, {"_id": 0, "id": 1, "full_name": 1, "id_number": 1}
+    ).to_list(length=None)
+    
+    return {
+        "users": {user['id']: user for user in users},
+        "test_results": test_results,
+        "checklists": checklists,
+        "course_feedback": course_feedback,
+        "training_report": training_report,
+        "coordinator_feedback": coordinator_feedback,
+        "chief_trainer_feedback": chief_trainer_feedback,
+        "feedback_templates": templates
+    }
+
+@api_router.post("/training-reports/{session_id}/generate-docx", status_code=202)
 async def generate_docx_report(session_id: str, current_user: User = Depends(get_current_user)):
-    """Generate a professional DOCX training report with all data populated"""
+    """Queue generation of the professional DOCX training report; poll the returned job"""
     
     if current_user.role not in ["coordinator", "admin"]:
         raise HTTPException(status_code=403, detail="Only coordinators and admins can generate reports")
     
+    if not await db.sessions.find_one({"id": session_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    job = await job_queue.enqueue("docx_report", {"session_id": session_id}, current_user)
+    return job_accepted(job)
+
+@job_handler("docx_report", can_read=staff_report_reader)
+async def build_docx_report(params: dict, current_user: User) -> dict:
+    """Generate a professional DOCX training report with all data populated"""
+    session_id = params['session_id']
+    
     try:
         # Gather all session data
         session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
         
-        program = await db.programs.find_one({"id": session.get('program_id')}, {"_id": 0}) if session.get('program_id') else None
-        company = await db.companies.find_one({"id": session.get('company_id')}, {"_id": 0}) if session.get('company_id') else None
+        program, company, data = await asyncio.gather(
+            db.programs.find_one({"id": session.get('program_id')}, {"_id": 0}) if session.get('program_id') else asyncio.sleep(0),
+            db.companies.find_one({"id": session.get('company_id')}, {"_id": 0}) if session.get('company_id') else asyncio.sleep(0),
+            load_docx_report_data(session)
+        )
         
         # Validate required data
         if not program:
@@ -2263,25 +4845,15 @@ async def generate_docx_report(session_id: str, current_user: User = Depends(get
         if not company:
             raise HTTPException(status_code=400, detail="Company not found for this session. Please ensure the session has a valid company assigned.")
         
+        users = data["users"]
+        
         # Get participants with full details
-        participant_ids = session.get('participant_ids', [])
         participants = []
-        for pid in participant_ids:
-            user = await db.users.find_one({"id": pid}, {"_id": 0})
+        for pid in session.get('participant_ids', []):
+            user = users.get(pid)
             if user:
-                # Get pre and post test results
-                pre_test = await db.test_results.find_one({
-                    "participant_id": pid,
-                    "session_id": session_id,
-                    "test_type": "pre"
-                }, {"_id": 0})
-                
-                post_test = await db.test_results.find_one({
-                    "participant_id": pid,
-                    "session_id": session_id,
-                    "test_type": "post"
-                }, {"_id": 0})
-                
+                pre_test = data["test_results"].get((pid, "pre"))
+                post_test = data["test_results"].get((pid, "post"))
                 participants.append({
                     "name": user.get('full_name'),
                     "id_number": user.get('id_number', 'N/A'),
@@ -2293,10 +4865,9 @@ async def generate_docx_report(session_id: str, current_user: User = Depends(get
                 })
         
         # Get vehicle checklists with issues
-        checklists = await db.vehicle_checklists.find({"session_id": session_id}, {"_id": 0}).to_list(100)
         vehicle_issues = []
-        for checklist in checklists:
-            participant = await db.users.find_one({"id": checklist['participant_id']}, {"_id": 0})
+        for checklist in data["checklists"]:
+            participant = users.get(checklist['participant_id'])
             issues_list = []
             for item in checklist.get('checklist_items', []):
                 if item.get('status') == 'needs_repair':
@@ -2313,7 +4884,7 @@ async def generate_docx_report(session_id: str, current_user: User = Depends(get
                 })
         
         # Get training photos from training report
-        training_report = await db.training_reports.find_one({"session_id": session_id}, {"_id": 0})
+        training_report = data["training_report"]
         training_photos = {
             "group_photo": training_report.get('group_photo') if training_report else None,
             "theory_photo_1": training_report.get('theory_photo_1') if training_report else None,
@@ -2324,251 +4895,37 @@ async def generate_docx_report(session_id: str, current_user: User = Depends(get
         }
         
         # Get participant feedback
-        all_feedback = await db.course_feedback.find({"session_id": session_id}, {"_id": 0}).to_list(100)
         feedback_data = []
-        for feedback in all_feedback:
-            participant = await db.users.find_one({"id": feedback['participant_id']}, {"_id": 0})
+        for feedback in data["course_feedback"]:
+            participant = users.get(feedback['participant_id'])
             feedback_data.append({
                 "participant_name": participant.get('full_name') if participant else 'Unknown',
                 "responses": feedback.get('responses', [])
             })
         
-        # Create DOCX document
-        doc = Document()
-        
-        # COVER PAGE
-        doc.add_heading('DEFENSIVE DRIVING TRAINING', 0)
-        doc.add_heading('COMPLETION REPORT', 0)
-        doc.add_paragraph()
-        doc.add_paragraph(f"Program: {program.get('name', 'N/A')}")
-        doc.add_paragraph(f"Company: {company.get('name', 'N/A')}")
-        doc.add_paragraph(f"Location: {session.get('location', 'N/A')}")
-        doc.add_paragraph(f"Training Period: {session.get('start_date', 'N/A')} to {session.get('end_date', 'N/A')}")
-        doc.add_paragraph(f"Submitted by: {current_user.full_name}")
-        doc.add_paragraph(f"Date: {datetime.now(timezone.utc).strftime('%Y-%m-%d')}")
-        doc.add_page_break()
-        
-        # EXECUTIVE SUMMARY
-        doc.add_heading('1. EXECUTIVE SUMMARY', 1)
-        pre_avg = sum([p['pre_test_score'] for p in participants]) / len(participants) if participants else 0
-        post_avg = sum([p['post_test_score'] for p in participants]) / len(participants) if participants else 0
-        doc.add_paragraph(f"This report summarizes the Defensive Driving Training conducted for {company.get('name', 'N/A')} from {session.get('start_date', 'N/A')} to {session.get('end_date', 'N/A')}. A total of {len(participants)} participants completed the training program.")
-        doc.add_paragraph(f"Pre-training assessment average: {pre_avg:.1f}%")
-        doc.add_paragraph(f"Post-training assessment average: {post_avg:.1f}%") 
-        doc.add_paragraph(f"Overall improvement: {(post_avg - pre_avg):.1f}%")
-        doc.add_page_break()
-        
-        # TRAINING DETAILS
-        doc.add_heading('2. TRAINING DETAILS', 1)
-        doc.add_paragraph(f"Program: {program.get('name', 'N/A')}")
-        doc.add_paragraph(f"Location: {session.get('location', 'N/A')}")
-        doc.add_paragraph(f"Dates: {session.get('start_date', 'N/A')} to {session.get('end_date', 'N/A')}")
-        doc.add_paragraph(f"Total Participants: {len(participants)}")
-        doc.add_paragraph()
-        doc.add_paragraph("Participants List:")
-        table = doc.add_table(rows=1, cols=2)
-        table.style = 'Light Grid Accent 1'
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'Name'
-        hdr_cells[1].text = 'ID Number'
-        for p in participants:
-            row_cells = table.add_row().cells
-            row_cells[0].text = p['name']
-            row_cells[1].text = str(p['id_number'])
-        doc.add_page_break()
-        
-        # INDIVIDUAL PARTICIPANT PERFORMANCE (DETAILED)
-        doc.add_heading('3. PARTICIPANT PERFORMANCE (Detailed)', 1)
-        doc.add_paragraph("Individual participant test results showing pre-test, post-test, and improvement:")
-        doc.add_paragraph()
-        
-        for idx, p in enumerate(participants, 1):
-            doc.add_paragraph(f"{idx}. {p['name']} (ID: {p['id_number']})", style='Heading 3')
-            perf_text = f"   Pre-Test: {p['pre_test_score']:.0f}% {'✅ PASS' if p['pre_test_passed'] else '❌ FAIL'} | "
-            perf_text += f"Post-Test: {p['post_test_score']:.0f}% {'✅ PASS' if p['post_test_passed'] else '❌ FAIL'} | "
-            perf_text += f"Improvement: {p['improvement']:+.0f}%"
-            if p['improvement'] > 0:
-                perf_text += " 📈"
-            doc.add_paragraph(perf_text)
-            doc.add_paragraph()
-        
-        doc.add_page_break()
-        
-        # PERFORMANCE SUMMARY TABLE
-        doc.add_heading('4. TEST RESULTS SUMMARY', 1)
-        table = doc.add_table(rows=1, cols=6)
-        table.style = 'Light Grid Accent 1'
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'Participant'
-        hdr_cells[1].text = 'ID Number'
-        hdr_cells[2].text = 'Pre-Test'
-        hdr_cells[3].text = 'Post-Test'
-        hdr_cells[4].text = 'Improvement'
-        hdr_cells[5].text = 'Status'
-        
-        for p in participants:
-            row_cells = table.add_row().cells
-            row_cells[0].text = p['name']
-            row_cells[1].text = str(p['id_number'])
-            row_cells[2].text = f"{p['pre_test_score']:.0f}%"
-            row_cells[3].text = f"{p['post_test_score']:.0f}%"
-            row_cells[4].text = f"{p['improvement']:+.0f}%"
-            row_cells[5].text = 'PASS' if p['post_test_passed'] else 'FAIL'
-        
-        doc.add_page_break()
-        
-        # TRAINING PHOTOS
-        doc.add_heading('5. TRAINING PHOTOS', 1)
-        if training_photos['group_photo']:
-            doc.add_paragraph("Group Photo:", style='Heading 3')
-            doc.add_paragraph(f"[Photo URL: {training_photos['group_photo']}]")
-            doc.add_paragraph()
-        
-        if training_photos['theory_photo_1'] or training_photos['theory_photo_2']:
-            doc.add_paragraph("Theory Session Photos:", style='Heading 3')
-            if training_photos['theory_photo_1']:
-                doc.add_paragraph(f"[Photo 1 URL: {training_photos['theory_photo_1']}]")
-            if training_photos['theory_photo_2']:
-                doc.add_paragraph(f"[Photo 2 URL: {training_photos['theory_photo_2']}]")
-            doc.add_paragraph()
-        
-        if training_photos['practical_photo_1'] or training_photos['practical_photo_2'] or training_photos['practical_photo_3']:
-            doc.add_paragraph("Practical Session Photos:", style='Heading 3')
-            if training_photos['practical_photo_1']:
-                doc.add_paragraph(f"[Photo 1 URL: {training_photos['practical_photo_1']}]")
-            if training_photos['practical_photo_2']:
-                doc.add_paragraph(f"[Photo 2 URL: {training_photos['practical_photo_2']}]")
-            if training_photos['practical_photo_3']:
-                doc.add_paragraph(f"[Photo 3 URL: {training_photos['practical_photo_3']}]")
-        
-        doc.add_page_break()
-        
-        # PARTICIPANT FEEDBACK
-        doc.add_heading('6. PARTICIPANT FEEDBACK', 1)
-        if feedback_data:
-            # Calculate average star ratings
-            star_questions = []
-            text_questions = []
-            
-            # Categorize questions
-            if feedback_data:
-                for response in feedback_data[0]['responses']:
-                    if isinstance(response['answer'], int):
-                        star_questions.append(response['question'])
-                    else:
-                        text_questions.append(response['question'])
-            
-            # Display star ratings summary
-            if star_questions:
-                doc.add_paragraph("Rating Summary (5-Star Scale):", style='Heading 3')
-                for question in star_questions:
-                    ratings = [r['answer'] for fb in feedback_data for r in fb['responses'] if r['question'] == question and isinstance(r['answer'], int)]
-                    if ratings:
-                        avg_rating = sum(ratings) / len(ratings)
-                        stars = '⭐' * int(round(avg_rating))
-                        doc.add_paragraph(f"{question}: {stars} ({avg_rating:.1f}/5.0)")
-                doc.add_paragraph()
-            
-            # Display comments and suggestions
-            if text_questions:
-                doc.add_paragraph("Comments & Suggestions:", style='Heading 3')
-                for idx, fb in enumerate(feedback_data, 1):
-                    doc.add_paragraph(f"{idx}. {fb['participant_name']}", style='Heading 4')
-                    for response in fb['responses']:
-                        if not isinstance(response['answer'], int):  # Text responses
-                            doc.add_paragraph(f"   Q: {response['question']}")
-                            doc.add_paragraph(f"   A: {response['answer']}")
-                            doc.add_paragraph()
-        else:
-            doc.add_paragraph("No feedback submitted yet.")
-        
-        doc.add_page_break()
-        
-        # VEHICLE INSPECTION ISSUES
-        doc.add_heading('7. VEHICLE INSPECTION ISSUES', 1)
-        if vehicle_issues:
-            for vehicle_issue in vehicle_issues:
-                doc.add_paragraph(f"{vehicle_issue['participant_name']}", style='Heading 3')
-                for issue in vehicle_issue['issues']:
-                    doc.add_paragraph(f"   - {issue['item']}: {issue['comment']}")
-                    if issue['photo_url']:
-                        doc.add_paragraph(f"     [Photo: {issue['photo_url']}]")
-                doc.add_paragraph()
-        else:
-            doc.add_paragraph("✓ No vehicle issues reported. All vehicles inspected are in good condition.")
-        
-        doc.add_page_break()
-        
-        # COORDINATOR FEEDBACK
-        doc.add_heading('8. COORDINATOR FEEDBACK', 1)
-        coordinator_feedback = await db.coordinator_feedback.find_one({"session_id": session_id}, {"_id": 0})
-        if coordinator_feedback:
-            responses = coordinator_feedback.get('responses', {})
-            for question_id, answer in responses.items():
-                # Get question text from template
-                template = await db.feedback_templates.find_one({"id": "coordinator_feedback_template"}, {"_id": 0})
-                if template:
-                    for q in template.get('questions', []):
-                        if q.get('id') == question_id:
-                            doc.add_paragraph(f"{q.get('question')}:", style='Heading 3')
-                            if q.get('type') == 'rating':
-                                stars = '⭐' * int(answer) if isinstance(answer, (int, float)) else answer
-                                doc.add_paragraph(f"   Rating: {stars} ({answer}/{q.get('scale', 5)})")
-                            else:
-                                doc.add_paragraph(f"   {answer}")
-                            doc.add_paragraph()
-        else:
-            doc.add_paragraph("[Coordinator feedback pending]")
-        
-        doc.add_page_break()
-        
-        # CHIEF TRAINER FEEDBACK
-        doc.add_heading('9. CHIEF TRAINER FEEDBACK', 1)
-        chief_trainer_feedback = await db.chief_trainer_feedback.find_one({"session_id": session_id}, {"_id": 0})
-        if chief_trainer_feedback:
-            responses = chief_trainer_feedback.get('responses', {})
-            for question_id, answer in responses.items():
-                # Get question text from template
-                template = await db.feedback_templates.find_one({"id": "chief_trainer_feedback_template"}, {"_id": 0})
-                if template:
-                    for q in template.get('questions', []):
-                        if q.get('id') == question_id:
-                            doc.add_paragraph(f"{q.get('question')}:", style='Heading 3')
-                            if q.get('type') == 'rating':
-                                stars = '⭐' * int(answer) if isinstance(answer, (int, float)) else answer
-                                doc.add_paragraph(f"   Rating: {stars} ({answer}/{q.get('scale', 5)})")
-                            else:
-                                doc.add_paragraph(f"   {answer}")
-                            doc.add_paragraph()
-        else:
-            doc.add_paragraph("[Chief trainer feedback pending]")
-        
-        doc.add_page_break()
-        
-        # RECOMMENDATIONS
-        doc.add_heading('10. RECOMMENDATIONS', 1)
-        doc.add_paragraph("[Please add recommendations here]")
-        doc.add_paragraph()
-        doc.add_paragraph()
-        doc.add_paragraph()
-        doc.add_page_break()
-        
-        # SIGNATURES
-        doc.add_heading('11. SIGNATURES', 1)
-        doc.add_paragraph()
-        doc.add_paragraph("_" * 40)
-        doc.add_paragraph(f"Coordinator: {current_user.full_name}")
-        doc.add_paragraph(f"Date: ________________")
-        doc.add_paragraph()
-        doc.add_paragraph()
-        doc.add_paragraph("_" * 40)
-        doc.add_paragraph("PIC/Supervisor Signature")
-        doc.add_paragraph(f"Date: ________________")
+        snapshot = {
+            "session": session,
+            "program": program,
+            "company": company,
+            "participants": participants,
+            "vehicle_issues": vehicle_issues,
+            "training_photos": training_photos,
+            "feedback_data": feedback_data,
+            # Averaged over the listed participants' latest results, so anyone who missed a test counts as 0
+            "pre_avg": sum(p["pre_test_score"] for p in participants) / len(participants) if participants else 0,
+            "post_avg": sum(p["post_test_score"] for p in participants) / len(participants) if participants else 0,
+            "coordinator_feedback": data["coordinator_feedback"],
+            "coordinator_feedback_template": data["feedback_templates"].get("coordinator_feedback_template"),
+            "chief_trainer_feedback": data["chief_trainer_feedback"],
+            "chief_trainer_feedback_template": data["feedback_templates"].get("chief_trainer_feedback_template"),
+            "submitted_by": current_user.full_name,
+            "report_date": datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        }
         
-        # Save DOCX
+        # Build and save the DOCX in a worker process
         report_filename = f"Training_Report_{session_id}_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.docx"
         report_path = REPORT_DIR / report_filename
-        doc.save(str(report_path))
+        await asyncio.get_running_loop().run_in_executor(docx_executor, build_training_report_docx, snapshot, str(report_path))
         
         # Update training report record with DOCX filename
         await db.training_reports.update_one(
@@ -2583,6 +4940,8 @@ async def generate_docx_report(session_id: str, current_user: User = Depends(get
             "download_url": f"/api/training-reports/{session_id}/download-docx"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Failed to generate DOCX report: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}")
@@ -2714,6 +5073,7 @@ async def upload_final_pdf_report(
             }},
             upsert=True
         )
+        await refresh_report_listing_fields({"session_id": session_id})
         
         return {
             "message": "Final report submitted successfully",
@@ -2766,41 +5126,51 @@ async def get_supervisor_reports(current_user: User = Depends(get_current_user))
     
     return enriched_reports
 
-@api_router.post("/training-reports/{session_id}/submit-final")
+async def get_final_report_docx(session_id: str) -> Path:
+    """The latest report DOCX for a session (edited if uploaded, otherwise generated)"""
+    training_report = await db.training_reports.find_one({"session_id": session_id}, {"_id": 0})
+    
+    if not training_report:
+        raise HTTPException(status_code=404, detail="No report found. Please generate a report first.")
+    
+    docx_filename = training_report.get('edited_docx_filename') or training_report.get('docx_filename')
+    
+    if not docx_filename:
+        raise HTTPException(status_code=404, detail="No report file found")
+    
+    docx_path = REPORT_DIR / docx_filename
+    
+    if not docx_path.exists():
+        raise HTTPException(status_code=404, detail="Report file not found")
+    
+    return docx_path
+
+@api_router.post("/training-reports/{session_id}/submit-final", status_code=202)
 async def submit_final_report(session_id: str, current_user: User = Depends(get_current_user)):
-    """Submit final report - converts to PDF and notifies supervisor/admin"""
+    """Queue the final report submission (PDF conversion and notifications); poll the returned job"""
     
     if current_user.role not in ["coordinator", "admin"]:
         raise HTTPException(status_code=403, detail="Only coordinators and admins can submit reports")
     
+    await get_final_report_docx(session_id)
+    
+    job = await job_queue.enqueue("submit_final_report", {"session_id": session_id}, current_user)
+    return job_accepted(job)
+
+@job_handler("submit_final_report", can_read=staff_report_reader)
+async def run_submit_final_report(params: dict, current_user: User) -> dict:
+    """Submit final report - converts to PDF and notifies supervisor/admin"""
+    session_id = params['session_id']
+    
     try:
-        # Get the latest report (edited if exists, otherwise generated)
-        training_report = await db.training_reports.find_one({"session_id": session_id}, {"_id": 0})
-        
-        if not training_report:
-            raise HTTPException(status_code=404, detail="No report found. Please generate a report first.")
-        
-        docx_filename = training_report.get('edited_docx_filename') or training_report.get('docx_filename')
-        
-        if not docx_filename:
-            raise HTTPException(status_code=404, detail="No report file found")
-        
-        docx_path = REPORT_DIR / docx_filename
-        
-        if not docx_path.exists():
-            raise HTTPException(status_code=404, detail="Report file not found")
+        docx_path = await get_final_report_docx(session_id)
         
         # Convert DOCX to PDF using LibreOffice
-        pdf_filename = docx_filename.replace('.docx', '.pdf')
+        pdf_filename = docx_path.name.replace('.docx', '.pdf')
         pdf_path = REPORT_PDF_DIR / pdf_filename
         
-        subprocess.run([
-            'libreoffice',
-            '--headless',
-            '--convert-to', 'pdf',
-            '--outdir', str(REPORT_PDF_DIR),
-            str(docx_path)
-        ], check=True)
+        if not await convert_docx_to_pdf(docx_path, pdf_path):
+            raise HTTPException(status_code=500, detail="Failed to convert report to PDF")
         
         # Update training report status
         await db.training_reports.update_one(
@@ -2812,6 +5182,7 @@ async def submit_final_report(session_id: str, current_user: User = Depends(get_
                 "submitted_by": current_user.id
             }}
         )
+        await refresh_report_listing_fields({"session_id": session_id})
         
         # Get session and create notifications for supervisor and admin
         session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
@@ -2848,9 +5219,8 @@ async def submit_final_report(session_id: str, current_user: User = Depends(get_
             "download_url": f"/api/training-reports/{session_id}/download-pdf"
         }
         
-    except subprocess.CalledProcessError as e:
-        logging.error(f"PDF conversion failed: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to convert report to PDF")
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Failed to submit report: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to submit report: {str(e)}")
@@ -2901,6 +5271,10 @@ async def submit_trainer_checklist(checklist_data: TrainerChecklistSubmit, curre
     doc['verified_at'] = doc['verified_at'].isoformat()
     
     await db.vehicle_checklists.insert_one(doc)
+    await bump_session_stats(checklist_data.session_id, {
+        "checklists.submitted": 1,
+        "checklists.needs_repair": sum(1 for item in checklist_data.items if item.status == 'needs_repair')
+    })
     
     # If chief trainer submitted comments, save to session
     if checklist_data.chief_trainer_comments:
@@ -3043,11 +5417,12 @@ async def submit_checklist(checklist_data: ChecklistSubmit, current_user: User =
         doc['verified_at'] = doc['verified_at'].isoformat()
     
     await db.vehicle_checklists.insert_one(doc)
+    await bump_session_stats(checklist_data.session_id, {
+        "checklists.submitted": 1,
+        "checklists.needs_repair": sum(1 for item in doc['checklist_items'] if item.get('status') == 'needs_repair')
+    })
     
-    await db.participant_access.update_one(
-        {"participant_id": current_user.id, "session_id": checklist_data.session_id},
-        {"$set": {"checklist_submitted": True}}
-    )
+    await update_access_flags(current_user.id, checklist_data.session_id, {"checklist_submitted": True})
     
     return checklist_obj
 
@@ -3207,13 +5582,10 @@ async def submit_feedback(feedback_data: FeedbackSubmit, current_user: User = De
     doc['submitted_at'] = doc['submitted_at'].isoformat()
     
     await db.course_feedback.insert_one(doc)
+    await bump_session_stats(feedback_data.session_id, {"feedback.responses": 1})
     
     # Ensure participant_access record exists and update feedback status
-    await db.participant_access.update_one(
-        {"participant_id": current_user.id, "session_id": feedback_data.session_id},
-        {"$set": {"feedback_submitted": True}},
-        upsert=True
-    )
+    await update_access_flags(current_user.id, feedback_data.session_id, {"feedback_submitted": True}, upsert=True)
     
     return feedback_obj
 
@@ -3490,6 +5862,9 @@ async def upload_certificate_template(file: UploadFile = File(...), current_user
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
     
+    # Certificates rendered from the previous template must not be served again
+    await asyncio.to_thread(invalidate_certificate_template)
+    
     template_url = f"/api/static/templates/{filename}"
     
     await db.settings.update_one(
@@ -3551,7 +5926,7 @@ async def upload_participant_certificate(
     certificate_url = f"/api/static/certificates_pdf/{unique_filename}"
     
     # Update participant access record with certificate info
-    await db.participant_access.update_one(
+    result = await db.participant_access.update_one(
         {"participant_id": participant_id, "session_id": session_id},
         {
             "$set": {
@@ -3562,6 +5937,8 @@ async def upload_participant_certificate(
         },
         upsert=True
     )
+    if result.upserted_id is not None:
+        await bump_session_stats(session_id, {"participants": 1})
     
     return {
         "certificate_url": certificate_url,
@@ -3702,68 +6079,278 @@ async def check_certificate_eligibility(
 
 
 # Get All Certificates (Admin Only)
+async def certificate_repository_query(
+    search: Optional[str] = None,
+    company_id: Optional[str] = None,
+    program_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+) -> dict:
+    """
+    participant_access filter for rows with an uploaded certificate. Session and participant
+    filters are resolved to id lists first, so the repository can sort, page and count on the
+    participant_access indexes and join only the rows it returns.
+    """
+    query = {"certificate_url": {"$exists": True, "$ne": None}}
+    
+    session_query = {}
+    if company_id:
+        session_query["company_id"] = company_id
+    if program_id:
+        session_query["program_id"] = program_id
+    if start_date:
+        session_query["start_date"] = {"$gte": start_date}
+    if end_date:
+        session_query["end_date"] = {"$lte": end_date}
+    if session_id:
+        session_query["id"] = session_id
+    if len(session_query) > (1 if session_id else 0):
+        query["session_id"] = {"$in": await db.sessions.distinct("id", session_query)}
+    elif session_id:
+        query["session_id"] = session_id
+    
+    if search:
+        pattern = {"$regex": re.escape(search), "$options": "i"}
+        query["participant_id"] = {"$in": await db.users.distinct("id", {"$or": [
+            {"full_name": pattern},
+            {"id_number": pattern},
+            {"email": pattern}
+        ]})}
+    return query
+
+# Joins session, participant, program and company and shapes a repository row; run only for
+# rows being returned
+CERTIFICATE_REPOSITORY_PROJECTION = [
+    {"$lookup": {"from": "sessions", "localField": "session_id", "foreignField": "id", "as": "session"}},
+    {"$unwind": {"path": "$session", "preserveNullAndEmptyArrays": True}},
+    {"$lookup": {"from": "users", "localField": "participant_id", "foreignField": "id", "as": "participant"}},
+    {"$unwind": {"path": "$participant", "preserveNullAndEmptyArrays": True}},
+    {"$lookup": {"from": "programs", "localField": "session.program_id", "foreignField": "id", "as": "program"}},
+    {"$lookup": {"from": "companies", "localField": "session.company_id", "foreignField": "id", "as": "company"}},
+    {"$project": {
+        "_id": 0,
+        "certificate_url": 1,
+        "uploaded_at": "$certificate_uploaded_at",
+        "uploaded_by": "$certificate_uploaded_by",
+        "participant_id": 1,
+        "participant_name": {"$ifNull": ["$participant.full_name", "Unknown"]},
+        "participant_id_number": {"$ifNull": ["$participant.id_number", "N/A"]},
+        "participant_email": {"$ifNull": ["$participant.email", "N/A"]},
+        "session_id": 1,
+        "session_name": {"$ifNull": ["$session.name", "Unknown Session"]},
+        "session_start_date": "$session.start_date",
+        "session_end_date": "$session.end_date",
+        "program_id": "$session.program_id",
+        "program_name": {"$ifNull": [{"$arrayElemAt": ["$program.name", 0]}, "N/A"]},
+        "company_id": "$session.company_id",
+        "company_name": {"$ifNull": [{"$arrayElemAt": ["$company.name", 0]}, "N/A"]},
+        "feedback_submitted": {"$ifNull": ["$feedback_submitted", False]}
+    }}
+]
+
 @api_router.get("/certificates/repository")
-async def get_certificates_repository(current_user: User = Depends(get_current_user)):
-    """Get all uploaded certificates for admin repository."""
+async def get_certificates_repository(
+    search: Optional[str] = None,
+    company_id: Optional[str] = None,
+    program_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get uploaded certificates for admin repository, most recent first.
+    Without `cursor` or `limit` this is the full list, as before. With either of them it returns
+    a page as {total, certificates, next_cursor} (50 rows unless `limit` says otherwise); pass the
+    returned next_cursor back as `cursor` to fetch the next page.
+    """
     
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can access certificate repository")
     
-    # Get all participant access records that have certificates
-    certificates = await db.participant_access.find(
-        {"certificate_url": {"$exists": True, "$ne": None}},
-        {"_id": 0}
-    ).to_list(length=None)
+    query = await certificate_repository_query(search, company_id, program_id, session_id, start_date, end_date)
+    sort = {"$sort": {"certificate_uploaded_at": -1, "_id": -1}}
+    if cursor is None and limit is None:
+        return await db.participant_access.aggregate([{"$match": query}, sort, *CERTIFICATE_REPOSITORY_PROJECTION]).to_list(None)
+    limit = limit or 50
+    
+    # Keyset pagination on (certificate_uploaded_at, _id), served by the certificate_uploaded_at index
+    page_query = dict(query)
+    if cursor:
+        last_uploaded_at, last_id = decode_page_cursor(cursor)
+        page_query["$or"] = [
+            {"certificate_uploaded_at": {"$lt": last_uploaded_at}},
+            {"certificate_uploaded_at": last_uploaded_at, "_id": {"$lt": last_id}}
+        ]
+    pipeline = [
+        {"$match": page_query},
+        sort,
+        {"$limit": limit + 1},
+        {"$addFields": {"cursor_id": {"$toString": "$_id"}}},
+        *CERTIFICATE_REPOSITORY_PROJECTION[:-1],
+        {"$project": {**CERTIFICATE_REPOSITORY_PROJECTION[-1]["$project"], "cursor_id": 1}}
+    ]
     
-    # Enrich with participant, session, and program details
-    enriched_certificates = []
+    total, certificates = await asyncio.gather(
+        db.participant_access.count_documents(query),
+        db.participant_access.aggregate(pipeline).to_list(limit + 1)
+    )
     
+    next_cursor = None
+    if len(certificates) > limit:
+        certificates = certificates[:limit]
+        last = certificates[-1]
+        next_cursor = encode_page_cursor([last.get('uploaded_at'), last['cursor_id']])
     for cert in certificates:
-        participant_id = cert.get('participant_id')
-        session_id = cert.get('session_id')
-        
-        # Get participant details
-        participant = await db.users.find_one({"id": participant_id}, {"_id": 0})
-        
-        # Get session details
-        session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
-        
-        # Get program details if session has program_id
-        program = None
-        if session and session.get('program_id'):
-            program = await db.programs.find_one({"id": session['program_id']}, {"_id": 0})
-        
-        # Get company details if session has company_id
-        company = None
-        if session and session.get('company_id'):
-            company = await db.companies.find_one({"id": session['company_id']}, {"_id": 0})
-        
-        enriched_certificates.append({
-            "certificate_url": cert.get('certificate_url'),
-            "uploaded_at": cert.get('certificate_uploaded_at'),
-            "uploaded_by": cert.get('certificate_uploaded_by'),
-            "participant_id": participant_id,
-            "participant_name": participant.get('full_name') if participant else 'Unknown',
-            "participant_id_number": participant.get('id_number') if participant else 'N/A',
-            "participant_email": participant.get('email') if participant else 'N/A',
-            "session_id": session_id,
-            "session_name": session.get('name') if session else 'Unknown Session',
-            "session_start_date": session.get('start_date') if session else None,
-            "session_end_date": session.get('end_date') if session else None,
-            "program_name": program.get('name') if program else 'N/A',
-            "company_name": company.get('name') if company else 'N/A',
-            "feedback_submitted": cert.get('feedback_submitted', False),
-        })
+        cert.pop('cursor_id', None)
     
-    # Sort by upload date (most recent first)
-    enriched_certificates.sort(key=lambda x: x.get('uploaded_at') or '', reverse=True)
+    return {
+        "total": total,
+        "certificates": certificates,
+        "next_cursor": next_cursor
+    }
+
+@api_router.get("/certificates/repository/stream")
+async def stream_certificates_repository(
+    search: Optional[str] = None,
+    company_id: Optional[str] = None,
+    program_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream the filtered certificate repository as NDJSON (one certificate per line), most recent
+    first, so the client can render rows as they arrive instead of waiting for the full list.
+    """
+    
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can access certificate repository")
+    
+    pipeline = [
+        {"$match": await certificate_repository_query(search, company_id, program_id, session_id, start_date, end_date)},
+        {"$sort": {"certificate_uploaded_at": -1, "_id": -1}},
+        *CERTIFICATE_REPOSITORY_PROJECTION
+    ]
+    
+    async def generate():
+        async for cert in db.participant_access.aggregate(pipeline, batchSize=200):
+            yield json.dumps(cert, default=str) + "\n"
     
-    return enriched_certificates
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+# Download Certificates as a ZIP
+def certificate_archive_name(value: Optional[str]) -> str:
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', value or '').strip('_') or 'unknown'
 
+@api_router.get("/certificates/export-zip")
+async def export_certificates_zip(
+    session_id: Optional[str] = None,
+    program_id: Optional[str] = None,
+    company_id: Optional[str] = None,
+    current_user: User = Depends(get_download_user)
+):
+    """
+    Stream a ZIP of every certificate PDF for a session, program or company. The archive is
+    written as it is sent, one file chunk at a time, so nothing is staged on disk or held in memory.
+    Browsers link here with a download token so the archive streams straight to disk.
+    """
+    if current_user.role not in ["admin", "coordinator"]:
+        raise HTTPException(status_code=403, detail="Only coordinators and admins can export certificates")
+    
+    session_query = {}
+    if session_id:
+        session_query["id"] = session_id
+    if program_id:
+        session_query["program_id"] = program_id
+    if company_id:
+        session_query["company_id"] = company_id
+    if not session_query:
+        raise HTTPException(status_code=400, detail="Provide a session_id, program_id or company_id")
+    if current_user.role == "coordinator":
+        session_query["coordinator_id"] = current_user.id
+    
+    sessions = await db.sessions.find(session_query, {"_id": 0, "id": 1, "name": 1}).to_list(length=None)
+    if not sessions:
+        raise HTTPException(status_code=404, detail="No sessions found")
+    session_ids = [session['id'] for session in sessions]
+    use_folders = len(sessions) > 1
+    
+    # Uploaded certificates (participant_access) take precedence over generated ones (certificates)
+    pipeline = [
+        {"$match": {"session_id": {"$in": session_ids}, "certificate_url": {"$ne": None}}},
+        {"$project": {"_id": 0, "participant_id": 1, "session_id": 1, "certificate_url": 1, "source": {"$literal": 1}}},
+        {"$unionWith": {"coll": "participant_access", "pipeline": [
+            {"$match": {"session_id": {"$in": session_ids}, "certificate_url": {"$exists": True, "$ne": None}}},
+            {"$project": {"_id": 0, "participant_id": 1, "session_id": 1, "certificate_url": 1, "source": {"$literal": 0}}}
+        ]}},
+        {"$sort": {"session_id": 1, "participant_id": 1, "source": 1}},
+        {"$lookup": {"from": "users", "localField": "participant_id", "foreignField": "id", "as": "participant"}},
+        {"$lookup": {"from": "sessions", "localField": "session_id", "foreignField": "id", "as": "session"}},
+        {"$project": {
+            "participant_id": 1,
+            "session_id": 1,
+            "certificate_url": 1,
+            "participant_name": {"$arrayElemAt": ["$participant.full_name", 0]},
+            "participant_id_number": {"$arrayElemAt": ["$participant.id_number", 0]},
+            "session_name": {"$arrayElemAt": ["$session.name", 0]}
+        }}
+    ]
+    
+    async def generate():
+        sink = _ZipStreamSink()
+        previous = None
+        used_names = set()
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+            async for cert in db.certificates.aggregate(pipeline, allowDiskUse=True, batchSize=100):
+                current = (cert['session_id'], cert['participant_id'])
+                if current == previous:
+                    continue
+                previous = current
+                
+                pdf_path = CERTIFICATE_PDF_DIR / cert['certificate_url'].split('/')[-1]
+                if not pdf_path.exists():
+                    logging.warning(f"Certificate file missing from export: {pdf_path.name}")
+                    continue
+                
+                name = f"{certificate_archive_name(cert.get('participant_name'))}_{certificate_archive_name(cert.get('participant_id_number'))}"
+                if use_folders:
+                    name = f"{certificate_archive_name(cert.get('session_name'))}/{name}"
+                arcname = f"{name}.pdf"
+                suffix = 2
+                while arcname in used_names:
+                    arcname = f"{name}_{suffix}.pdf"
+                    suffix += 1
+                used_names.add(arcname)
+                
+                with open(pdf_path, "rb") as source, archive.open(arcname, 'w') as entry:
+                    while True:
+                        chunk = await asyncio.to_thread(source.read, 64 * 1024)
+                        if not chunk:
+                            break
+                        entry.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+        # Closing the archive writes the central directory
+        yield sink.drain()
+    
+    label = certificate_archive_name(sessions[0]['name'] if session_id else (program_id or company_id))
+    return StreamingResponse(
+        generate(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=certificates_{label}.zip"}
+    )
 
 # Generate Certificate
-@api_router.post("/certificates/generate/{session_id}/{participant_id}")
+@api_router.post("/certificates/generate/{session_id}/{participant_id}", status_code=202)
 async def generate_certificate(session_id: str, participant_id: str, current_user: User = Depends(get_current_user)):
+    """Check eligibility and queue the certificate render; poll the returned job"""
     # Only admin can generate, or participant can generate their own
     if current_user.role != "admin" and current_user.id != participant_id:
         raise HTTPException(status_code=403, detail="Unauthorized")
@@ -3782,11 +6369,28 @@ async def generate_certificate(session_id: str, participant_id: str, current_use
         raise HTTPException(status_code=400, detail="Please submit feedback first. Go to your dashboard and click 'Submit Feedback' button.")
     
     # Get participant details
+    if not await db.users.find_one({"id": participant_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Participant not found")
+    
+    # Get session details
+    if not await db.sessions.find_one({"id": session_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    if get_certificate_template() is None:
+        raise HTTPException(status_code=404, detail="Certificate template not found. Please upload a template first.")
+    
+    job = await job_queue.enqueue("certificate", {"session_id": session_id, "participant_id": participant_id}, current_user)
+    return job_accepted(job)
+
+@job_handler("certificate", can_read=lambda params, user: user.id == params['participant_id'])
+async def build_certificate(params: dict, current_user: User) -> dict:
+    session_id = params['session_id']
+    participant_id = params['participant_id']
+    
     participant = await db.users.find_one({"id": participant_id}, {"_id": 0})
     if not participant:
         raise HTTPException(status_code=404, detail="Participant not found")
     
-    # Get session details
     session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -3802,50 +6406,15 @@ async def generate_certificate(session_id: str, participant_id: str, current_use
     # Get settings for company name (already in template, no replacement needed)
     
     # Load template
-    template_path = TEMPLATE_DIR / "certificate_template.docx"
-    if not template_path.exists():
+    template = get_certificate_template()
+    if template is None:
         raise HTTPException(status_code=404, detail="Certificate template not found. Please upload a template first.")
     
-    # Create document from template
-    doc = Document(template_path)
-    
-    # Replace placeholders in paragraphs
-    replacements = {
-        '«PARTICIPANT_NAME»': participant['full_name'],
-        '«IC_NUMBER»': participant['id_number'],
-        '«COMPANY_NAME»': company_name,
-        '«PROGRAMME NAME»': program_name,
-        '<<PROGRAMME NAME>>': program_name,
-        '«VENUE»': session['location'],
-        '«DATE»': session['end_date']
-    }
-    
-    # Replace in paragraphs
-    for paragraph in doc.paragraphs:
-        for key, value in replacements.items():
-            if key in paragraph.text:
-                paragraph.text = paragraph.text.replace(key, value)
-    
-    # Replace in tables
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for key, value in replacements.items():
-                    if key in cell.text:
-                        cell.text = cell.text.replace(key, value)
-    
-    # Save as new DOCX document
-    cert_filename = f"certificate_{participant_id}_{session_id}.docx"
-    cert_path = CERTIFICATE_DIR / cert_filename
-    doc.save(cert_path)
-    
-    # Convert to PDF
-    pdf_filename = f"certificate_{participant_id}_{session_id}.pdf"
-    pdf_path = CERTIFICATE_PDF_DIR / pdf_filename
+    replacements = build_certificate_replacements(participant, session, program_name, company_name)
     
-    # Convert and verify
-    conversion_success = convert_docx_to_pdf(cert_path, pdf_path)
-    if not conversion_success or not pdf_path.exists():
+    # Render DOCX and convert to PDF
+    pdf_filename = await render_certificate_pdf(template, replacements, participant_id, session_id)
+    if not pdf_filename:
         raise HTTPException(status_code=500, detail="Failed to convert certificate to PDF. Please contact support.")
     
     # Store certificate record (using PDF URL)
@@ -3887,6 +6456,165 @@ async def generate_certificate(session_id: str, participant_id: str, current_use
         "message": "Certificate generated successfully"
     }
 
+# Generate Certificates for a whole Session
+@job_handler("session_certificates", can_read=lambda params, user: user.id == params['coordinator_id'])
+async def build_session_certificates(params: dict, current_user: User) -> dict:
+    """
+    Render every eligible participant's certificate in parallel, then upsert the records in bulk.
+    Progress (completed/failed/errors) is published on the job as each certificate finishes.
+    """
+    session_id = params['session_id']
+    session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    template = get_certificate_template()
+    if template is None:
+        raise HTTPException(status_code=404, detail="Certificate template not found. Please upload a template first.")
+    
+    participant_ids = session.get('participant_ids', [])
+    eligible_ids = await db.participant_access.distinct("participant_id", {
+        "session_id": session_id,
+        "participant_id": {"$in": participant_ids},
+        "feedback_submitted": True
+    })
+    participants = await db.users.find(
+        {"id": {"$in": eligible_ids}},
+        {"_id": 0, "id": 1, "full_name": 1, "id_number": 1}
+    ).to_list(length=None)
+    
+    program = await db.programs.find_one({"id": session['program_id']}, {"_id": 0, "name": 1})
+    program_name = program['name'] if program else "Training Program"
+    company = await db.companies.find_one({"id": session['company_id']}, {"_id": 0, "name": 1})
+    company_name = company['name'] if company else ""
+    
+    # A retried attempt starts its progress over
+    progress = {
+        "total": len(participants),
+        "completed": 0,
+        "failed": 0,
+        "skipped": len(participant_ids) - len(participants),
+        "errors": []
+    }
+    await report_job_progress({"$set": {"progress": dict(progress, errors=[])}})
+    
+    # Keep at most one render per office worker in flight so the job doesn't crowd out other callers
+    slots = asyncio.Semaphore(len(office_pool.workers))
+    issued = {}
+    
+    async def generate_one(participant: dict):
+        replacements = build_certificate_replacements(participant, session, program_name, company_name)
+        pdf_filename = None
+        error = None
+        async with slots:
+            for _ in range(3):
+                try:
+                    pdf_filename = await render_certificate_pdf(template, replacements, participant['id'], session_id)
+                    break
+                except HTTPException as e:
+                    if e.status_code != 503:
+                        error = e.detail
+                        break
+                    await asyncio.sleep(OFFICE_RETRY_AFTER_SECONDS)
+                except Exception as e:
+                    error = str(e)
+                    break
+        
+        if pdf_filename:
+            issued[participant['id']] = pdf_filename
+            progress["completed"] += 1
+            await report_job_progress({"$inc": {"progress.completed": 1}})
+        else:
+            failure = {
+                "participant_id": participant['id'],
+                "participant_name": participant.get('full_name'),
+                "error": error or "Failed to convert certificate to PDF"
+            }
+            progress["failed"] += 1
+            progress["errors"].append(failure)
+            await report_job_progress({"$inc": {"progress.failed": 1}, "$push": {"progress.errors": failure}})
+    
+    await asyncio.gather(*(generate_one(participant) for participant in participants))
+    
+    issue_date = datetime.now(timezone.utc).isoformat()
+    operations = [
+        UpdateOne(
+            {"participant_id": participant_id, "session_id": session_id},
+            {
+                "$set": {"certificate_url": f"/api/static/certificates_pdf/{pdf_filename}", "issue_date": issue_date},
+                "$setOnInsert": {"id": str(uuid.uuid4()), "program_name": program_name}
+            },
+            upsert=True
+        )
+        for participant_id, pdf_filename in issued.items()
+    ]
+    if operations:
+        await db.certificates.bulk_write(operations, ordered=False)
+    
+    return {"session_id": session_id, **progress}
+
+@api_router.post("/certificates/generate-session/{session_id}", status_code=202)
+async def generate_session_certificates(session_id: str, current_user: User = Depends(get_current_user)):
+    """Queue generating certificates for every participant in the session who has submitted feedback"""
+    session = await db.sessions.find_one({"id": session_id}, {"_id": 0, "coordinator_id": 1})
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    if current_user.role == "coordinator":
+        if session.get("coordinator_id") != current_user.id:
+            raise HTTPException(status_code=403, detail="You can only generate certificates for your assigned sessions")
+    elif current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only coordinators and admins can generate session certificates")
+    
+    if get_certificate_template() is None:
+        raise HTTPException(status_code=404, detail="Certificate template not found. Please upload a template first.")
+    
+    job = await job_queue.enqueue(
+        "session_certificates",
+        {"session_id": session_id, "coordinator_id": session.get("coordinator_id")},
+        current_user
+    )
+    return job_accepted(job)
+
+# Background Job Routes
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Poll a background job; `result` is filled in once status is 'completed'"""
+    job = await db.jobs.find_one({"id": job_id}, {"_id": 0, "worker": 0, "lease_until": 0, "claim_id": 0, "dedupe_key": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not can_read_job(job, current_user):
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    return job
+
+@api_router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Cancel a queued or running job; a running handler is stopped within JOB_POLL_SECONDS"""
+    job = await db.jobs.find_one({"id": job_id}, {"_id": 0, "status": 1, "created_by": 1})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if current_user.role != "admin" and job.get('created_by') != current_user.id:
+        raise HTTPException(status_code=403, detail="Only the job's creator or an admin can cancel it")
+    
+    cancelled = await db.jobs.update_one(
+        {"id": job_id, "status": {"$in": ["queued", "running"]}},
+        {
+            "$set": {"status": "cancelled", "error": "Cancelled", "finished_at": datetime.now(timezone.utc).isoformat()},
+            "$unset": {"dedupe_key": ""}
+        }
+    )
+    return {"job_id": job_id, "status": "cancelled" if cancelled.modified_count else job['status']}
+
+@api_router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, current_user: User = Depends(get_current_user)):
+    job = await get_job(job_id, current_user)
+    if job['status'] == "failed":
+        raise HTTPException(status_code=500, detail=job.get('error') or "Job failed")
+    if job['status'] == "cancelled":
+        raise HTTPException(status_code=409, detail="Job was cancelled")
+    if job['status'] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is still {job['status']}")
+    return job['result']
+
 @api_router.get("/certificates/download/{certificate_id}")
 async def download_certificate(certificate_id: str, current_user: User = Depends(get_current_user)):
     cert = await db.certificates.find_one({"id": certificate_id}, {"_id": 0})
@@ -3987,6 +6715,13 @@ async def get_template(filename: str):
         raise HTTPException(status_code=404, detail="Template not found")
     return FileResponse(file_path)
 
+@api_router.get("/static/report-photos/{filename}")
+async def get_report_photo(filename: str):
+    file_path = REPORT_PHOTOS_DIR / filename
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="Photo not found")
+    return FileResponse(file_path)
+
 @api_router.post("/checklist-photos/upload")
 async def upload_checklist_photo(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
     if current_user.role != "trainer":
@@ -4016,8 +6751,8 @@ async def get_checklist_photo(filename: str):
 
 # ============ AI REPORT GENERATION ============
 
-async def generate_training_report_content(session_id: str, program_id: str, company_id: str) -> str:
-    """Generate comprehensive training report using GPT-5"""
+async def generate_training_report_content(session_id: str, program_id: str, company_id: str, force_refresh: bool = False) -> str:
+    """Generate comprehensive training report using GPT-5; unchanged inputs are served from report_cache"""
     
     # Gather all data
     session = await db.sessions.find_one({"id": session_id}, {"_id": 0})
@@ -4054,10 +6789,9 @@ async def generate_training_report_content(session_id: str, program_id: str, com
         "session_id": session_id
     }, {"_id": 0}).to_list(100)
     
-    # Get attendance
-    attendance = await db.attendance_records.find({
-        "session_id": session_id
-    }, {"_id": 0}).to_list(100)
+    # Counts, averages and rates come from the session's stats
+    stats = await get_session_stats(session_id)
+    summary = summarize_session_stats(stats)
     
     # Create participant ID to name mapping
     participant_map = {p.get('id'): p.get('full_name') for p in participants}
@@ -4083,21 +6817,21 @@ async def generate_training_report_content(session_id: str, program_id: str, com
             "id_map": participant_map
         },
         "pre_test_results": {
-            "total_participants": len(pre_tests),
-            "average_score": sum([t.get('score', 0) for t in pre_tests]) / len(pre_tests) if pre_tests else 0,
-            "pass_rate": sum([1 for t in pre_tests if t.get('passed', False)]) / len(pre_tests) * 100 if pre_tests else 0,
+            "total_participants": summary['pre_test']['count'],
+            "average_score": summary['pre_test']['average_score'],
+            "pass_rate": summary['pre_test']['pass_rate'],
             "details": [{"participant": t.get('participant_id'), "score": t.get('score'), "passed": t.get('passed')} for t in pre_tests]
         },
         "post_test_results": {
-            "total_participants": len(post_tests),
-            "average_score": sum([t.get('score', 0) for t in post_tests]) / len(post_tests) if post_tests else 0,
-            "pass_rate": sum([1 for t in post_tests if t.get('passed', False)]) / len(post_tests) * 100 if post_tests else 0,
-            "improvement": (sum([t.get('score', 0) for t in post_tests]) / len(post_tests) if post_tests else 0) - (sum([t.get('score', 0) for t in pre_tests]) / len(pre_tests) if pre_tests else 0),
+            "total_participants": summary['post_test']['count'],
+            "average_score": summary['post_test']['average_score'],
+            "pass_rate": summary['post_test']['pass_rate'],
+            "improvement": summary['improvement'],
             "details": [{"participant": t.get('participant_id'), "score": t.get('score'), "passed": t.get('passed')} for t in post_tests]
         },
         "checklist_summary": {
-            "total_checklists": len(checklists),
-            "items_needing_repair": sum([len([item for item in c.get('checklist_items', []) if item.get('status') == 'needs_repair']) for c in checklists]),
+            "total_checklists": summary['checklists']['submitted'],
+            "items_needing_repair": summary['checklists']['needs_repair'],
             "common_issues": [],
             "details": [{"participant": c.get('participant_id'), "items": c.get('checklist_items', [])} for c in checklists]
         },
@@ -4107,8 +6841,8 @@ async def generate_training_report_content(session_id: str, program_id: str, com
             "comments": [f.get('responses', {}) for f in feedbacks]
         },
         "attendance": {
-            "total_records": len(attendance),
-            "attendance_rate": len([a for a in attendance if a.get('clock_out_time')]) / len(attendance) * 100 if attendance else 100
+            "total_records": stats['attendance']['clock_ins'],
+            "attendance_rate": stats['attendance']['clock_outs'] / stats['attendance']['clock_ins'] * 100 if stats['attendance']['clock_ins'] else 100
         }
     }
     
@@ -4189,14 +6923,20 @@ ABSOLUTE CRITICAL RULES FOR VEHICLE INSPECTION SECTION:
 4. NEVER write "undefined" or leave item unnamed
 5. Be intelligent in extracting the core item name from any description"""
 
+    fingerprint = ai_report_fingerprint("training_report_content", prompt)
+    cached = await get_cached_ai_report(fingerprint, AI_REPORT_MODEL, force_refresh)
+    if cached:
+        return cached['content']
+    
     # Call GPT-5
     try:
         api_key = os.getenv('EMERGENT_LLM_KEY')
         llm = LlmChat(api_key=api_key)
         
         messages = [UserMessage(content=prompt)]
-        response = llm.chat(messages=messages, model="gpt-4o")
+        response = llm.chat(messages=messages, model=AI_REPORT_MODEL)
         
+        await store_cached_ai_report(fingerprint, AI_REPORT_MODEL, "training_report_content", session_id, response.content)
         return response.content
     except Exception as e:
         logging.error(f"GPT-5 report generation failed: {str(e)}")
@@ -4217,7 +6957,8 @@ async def generate_report(request: ReportGenerateRequest, current_user: User = D
     content = await generate_training_report_content(
         request.session_id,
         session['program_id'],
-        session['company_id']
+        session['company_id'],
+        request.force_refresh
     )
     
     # Save as draft
@@ -4315,7 +7056,7 @@ async def get_supervisor_sessions(current_user: User = Depends(get_current_user)
     return sessions
 
 @api_router.get("/supervisor/attendance/{session_id}")
-async def get_session_attendance(session_id: str, current_user: User = Depends(get_current_user)):
+async def get_supervisor_session_attendance(session_id: str, current_user: User = Depends(get_current_user)):
     """Get attendance for session (Supervisor)"""
     if current_user.role != "pic_supervisor":
         raise HTTPException(status_code=403, detail="Only supervisors can access this")
@@ -4331,8 +7072,13 @@ async def get_session_attendance(session_id: str, current_user: User = Depends(g
     }, {"_id": 0}).to_list(100)
     
     # Get participant details
+    participant_ids = list({record['participant_id'] for record in attendance})
+    participants = await db.users.find(
+        {"id": {"$in": participant_ids}}, {"_id": 0, "id": 1, "full_name": 1, "email": 1}
+    ).to_list(length=None) if participant_ids else []
+    participant_map = {p['id']: p for p in participants}
     for record in attendance:
-        participant = await db.users.find_one({"id": record['participant_id']}, {"_id": 0, "password": 0})
+        participant = participant_map.get(record['participant_id'])
         if participant:
             record['participant_name'] = participant.get('full_name', 'Unknown')
             record['participant_email'] = participant.get('email', '')
@@ -4374,8 +7120,7 @@ async def setup_admin_account():
         existing_admin = await db.users.find_one({"role": "admin"})
         
         # Hash password
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        hashed_password = pwd_context.hash(admin_password)
+        hashed_password = await hash_password(admin_password)
         
         if existing_admin:
             # Update existing admin
@@ -4388,6 +7133,7 @@ async def setup_admin_account():
                     "id_number": admin_id_number
                 }}
             )
+            invalidate_cached_user(existing_admin.get('id'))
             logging.info(f"✅ Admin account updated: {admin_email}")
         else:
             # Create new admin
@@ -4411,6 +7157,73 @@ async def setup_admin_account():
         logging.error(f"❌ Failed to setup admin account: {str(e)}")
 
 
+@app.on_event("startup")
+async def ensure_indexes():
+    """Reconcile INDEX_REGISTRY in the background so large builds don't delay startup"""
+    if os.environ.get('ENSURE_INDEXES_ON_STARTUP', 'true').lower() != 'true':
+        return
+    
+    async def run():
+        try:
+            report = await reconcile_indexes(create_missing=True)
+            index_startup_status.update(failed=report["failed"], conflicts=report["conflicts"], error=None)
+            if report["created"]:
+                logging.info(f"✅ Created indexes: {', '.join(report['created'])}")
+            if report["failed"]:
+                logging.error(
+                    f"❌ Failed to create indexes: {report['failed']}. Unique indexes are usually blocked by "
+                    f"duplicate rows; run `python manage.py dedupe-unique-keys --apply` then `python manage.py ensure-indexes`"
+                )
+            if report["conflicts"]:
+                logging.warning(f"⚠️ Index option conflicts: {report['conflicts']}")
+            if report["extra"]:
+                logging.info(f"Indexes not in registry: {', '.join(report['extra'])}")
+        except Exception as e:
+            index_startup_status["error"] = str(e)
+            logging.error(f"❌ Index reconciliation failed: {str(e)}")
+        finally:
+            index_startup_status["ran_at"] = datetime.now(timezone.utc).isoformat()
+    
+    app.state.index_task = asyncio.create_task(run())
+
+
+@app.on_event("startup")
+async def backfill_report_listings():
+    """
+    Fill the admin listing fields on training reports written before they existed, in the
+    background; until then company/program filters and search can't match those reports.
+    Same as `python manage.py refresh-report-listings`, limited to reports never refreshed.
+    """
+    if os.environ.get('BACKFILL_REPORT_LISTINGS_ON_STARTUP', 'true').lower() != 'true':
+        return
+    
+    async def run():
+        try:
+            updated = await refresh_report_listing_fields({"has_session": {"$exists": False}})
+            if updated:
+                logging.info(f"✅ Backfilled listing fields for {updated} training reports")
+        except Exception as e:
+            logging.error(f"❌ Report listing backfill failed, run `python manage.py refresh-report-listings`: {str(e)}")
+    
+    app.state.report_listing_task = asyncio.create_task(run())
+
+
+@app.on_event("startup")
+async def start_office_pool():
+    """Start the document conversion workers; instances warm up in the background"""
+    await office_pool.start()
+
+
+@app.on_event("startup")
+async def start_job_queue():
+    job_queue.start()
+
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Running jobs are handed back to the queue, which needs the database
+    await job_queue.stop()
     client.close()
+    password_executor.shutdown(wait=False, cancel_futures=True)
+    docx_executor.shutdown(wait=False, cancel_futures=True)
+    await office_pool.stop()
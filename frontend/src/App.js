@@ -38,6 +38,38 @@ axiosInstance.interceptors.request.use(
   }
 );
 
+// Heavy endpoints answer 202 with a job id; poll the job until it finishes and resolve with its result.
+// Failures reject with the same shape as an axios error so callers can keep reading response.data.detail.
+// Aborting `signal` (e.g. when the page unmounts) cancels the job on the server.
+export const runJob = async (request, { interval = 1000, maxInterval = 5000, signal } = {}) => {
+  const response = await request;
+  if (response.status !== 202 || !response.data?.job_id) {
+    return response.data;
+  }
+
+  const jobId = response.data.job_id;
+  let delay = interval;
+  for (;;) {
+    await new Promise((resolve) => setTimeout(resolve, delay));
+    if (signal?.aborted) {
+      await axiosInstance.post(`/jobs/${jobId}/cancel`).catch(() => {});
+      const error = new Error("Job cancelled");
+      error.response = { data: { detail: "Job cancelled" } };
+      throw error;
+    }
+    const { data: job } = await axiosInstance.get(`/jobs/${jobId}`);
+    if (job.status === "completed") {
+      return job.result;
+    }
+    if (job.status === "failed" || job.status === "cancelled") {
+      const error = new Error(job.error || "Job failed");
+      error.response = { data: { detail: job.error } };
+      throw error;
+    }
+    delay = Math.min(delay * 1.5, maxInterval);
+  }
+};
+
 function App() {
   const [user, setUser] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -1,5 +1,5 @@
 import { useState, useEffect } from "react";
-import { axiosInstance } from "../App";
+import { axiosInstance, API } from "../App";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { Label } from "@/components/ui/label";
@@ -82,6 +82,8 @@ const AdminDashboard = ({ user, onLogout }) => {
   
   // Reports Archive states
   const [allReports, setAllReports] = useState([]);
+  const [reportsTotal, setReportsTotal] = useState(0);
+  const [reportsCursor, setReportsCursor] = useState(null);
   const [loadingReports, setLoadingReports] = useState(false);
   const [reportsSearch, setReportsSearch] = useState("");
   const [filterCompany, setFilterCompany] = useState("all");
@@ -579,10 +581,11 @@ const AdminDashboard = ({ user, onLogout }) => {
 
 
   // Reports Archive functions
-  const loadAllReports = async () => {
+  const loadAllReports = async (loadMore = false) => {
     setLoadingReports(true);
     try {
       const params = {};
+      if (loadMore === true && reportsCursor) params.cursor = reportsCursor;
       
       if (reportsSearch) params.search = reportsSearch;
       if (filterCompany && filterCompany !== "all") params.company_id = filterCompany;
@@ -591,7 +594,10 @@ const AdminDashboard = ({ user, onLogout }) => {
       if (filterEndDate) params.end_date = filterEndDate;
       
       const response = await axiosInstance.get("/training-reports/admin/all", { params });
-      setAllReports(response.data.reports || []);
+      const reports = response.data.reports || [];
+      setAllReports(loadMore === true ? [...allReports, ...reports] : reports);
+      setReportsTotal(response.data.total || 0);
+      setReportsCursor(response.data.next_cursor || null);
     } catch (error) {
       console.error("Failed to load reports:", error);
       toast.error(error.response?.data?.detail || "Failed to load training reports");
@@ -604,17 +610,70 @@ const AdminDashboard = ({ user, onLogout }) => {
   // Certificates Repository functions
   const loadAllCertificates = async () => {
     setLoadingCertificates(true);
+    setAllCertificates([]);
     try {
-      const response = await axiosInstance.get("/certificates/repository");
-      setAllCertificates(response.data || []);
+      // Stream NDJSON so the table fills in while the repository is still being read
+      const response = await fetch(`${API}/certificates/repository/stream`, {
+        headers: { Authorization: `Bearer ${localStorage.getItem("token")}` },
+      });
+      if (!response.ok) {
+        const error = await response.json().catch(() => ({}));
+        throw new Error(error.detail || "Failed to load certificates");
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffered = "";
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split("\n");
+        buffered = lines.pop();
+        const rows = lines.filter((line) => line.trim()).map((line) => JSON.parse(line));
+        if (rows.length > 0) {
+          setAllCertificates((prev) => [...prev, ...rows]);
+          setLoadingCertificates(false);
+        }
+      }
     } catch (error) {
       console.error("Failed to load certificates:", error);
-      toast.error(error.response?.data?.detail || "Failed to load certificates");
+      toast.error(error.message || "Failed to load certificates");
     } finally {
       setLoadingCertificates(false);
     }
   };
 
+  const handleDownloadCertificatesZip = async () => {
+    const params = {};
+    if (filterCertSession !== "all") {
+      params.session_id = filterCertSession;
+    } else {
+      params.program_id = programs.find((program) => program.name === filterCertProgram)?.id;
+    }
+    
+    try {
+      // A plain link lets the browser stream the archive to disk; it can't send the auth header,
+      // so it carries a short-lived token for this one URL instead
+      const exportUrl = new URL(`${API}/certificates/export-zip`, window.location.origin);
+      const { data } = await axiosInstance.post("/auth/download-token", { path: exportUrl.pathname });
+      Object.entries(params).forEach(([key, value]) => {
+        if (value) exportUrl.searchParams.set(key, value);
+      });
+      exportUrl.searchParams.set("token", data.token);
+      
+      const link = document.createElement('a');
+      link.href = exportUrl.toString();
+      link.download = "certificates.zip";
+      link.style.display = 'none';
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
+    } catch (error) {
+      toast.error("Failed to download certificates");
+    }
+  };
+
   const handleDownloadCertificate = async (certificateUrl, participantName) => {
     try {
       // Extract session_id and participant_id from URL if needed, or use direct URL
@@ -1740,13 +1799,13 @@ const AdminDashboard = ({ user, onLogout }) => {
 
                   {allReports.length > 0 && (
                     <p className="text-sm text-gray-600">
-                      Found {allReports.length} training report{allReports.length !== 1 ? 's' : ''}
+                      Found {reportsTotal} training report{reportsTotal !== 1 ? 's' : ''}
                     </p>
                   )}
                 </div>
 
                 {/* Reports Grid */}
-                {loadingReports ? (
+                {loadingReports && allReports.length === 0 ? (
                   <div className="flex justify-center items-center py-12">
                     <div className="animate-spin rounded-full h-12 w-12 border-b-2 border-blue-600"></div>
                   </div>
@@ -1827,6 +1886,18 @@ const AdminDashboard = ({ user, onLogout }) => {
                     ))}
                   </div>
                 )}
+
+                {reportsCursor && allReports.length > 0 && (
+                  <div className="flex justify-center mt-6">
+                    <Button
+                      onClick={() => loadAllReports(true)}
+                      variant="outline"
+                      disabled={loadingReports}
+                    >
+                      {loadingReports ? "Loading..." : `Load more (${allReports.length} of ${reportsTotal})`}
+                    </Button>
+                  </div>
+                )}
               </CardContent>
             </Card>
 
@@ -2500,6 +2571,13 @@ const AdminDashboard = ({ user, onLogout }) => {
                       </SelectContent>
                     </Select>
                     
+                    {(filterCertSession !== "all" || filterCertProgram !== "all") && (
+                      <Button variant="outline" onClick={handleDownloadCertificatesZip}>
+                        <Download className="w-4 h-4 mr-2" />
+                        Download ZIP
+                      </Button>
+                    )}
+                    
                     {(certificatesSearch || filterCertSession !== "all" || filterCertProgram !== "all") && (
                       <Button 
                         variant="outline" 
@@ -1,5 +1,5 @@
 import { useState, useEffect } from "react";
-import { axiosInstance } from "../App";
+import { axiosInstance, runJob } from "../App";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { Label } from "@/components/ui/label";
@@ -379,7 +379,7 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
     }
   };
 
-  const handleGenerateAIReport = async () => {
+  const handleGenerateAIReport = async (forceRefresh = false) => {
     if (!selectedSession) {
       toast.error("Please select a session first");
       return;
@@ -387,10 +387,14 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
 
     setGeneratingReport(true);
     try {
-      const response = await axiosInstance.post(`/training-reports/${selectedSession.id}/generate-ai-report`);
+      const report = await runJob(axiosInstance.post(
+        `/training-reports/${selectedSession.id}/generate-ai-report`,
+        null,
+        { params: { force_refresh: forceRefresh } }
+      ));
       
       // Add checklist issues section to the AI report
-      let fullReport = response.data.generated_report;
+      let fullReport = report.generated_report;
       
       if (checklistIssues.length > 0) {
         fullReport += "\n\n## VEHICLE INSPECTION ISSUES\n\n";
@@ -411,7 +415,9 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
       }
       
       setAiGeneratedReport(fullReport);
-      toast.success("AI report generated successfully with checklist data!");
+      toast.success(report.cached
+        ? "Loaded the saved AI report - session data is unchanged. Use Regenerate for a fresh one."
+        : "AI report generated successfully with checklist data!");
     } catch (error) {
       toast.error(error.response?.data?.detail || "Failed to generate AI report");
     } finally {
@@ -429,12 +435,12 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
 
     setGeneratingDOCX(true);
     try {
-      const response = await axiosInstance.post(`/training-reports/${selectedSession.id}/generate-docx`);
+      const report = await runJob(axiosInstance.post(`/training-reports/${selectedSession.id}/generate-docx`));
       
       setProfessionalReportStatus(prev => ({
         ...prev,
         docx_generated: true,
-        docx_filename: response.data.filename
+        docx_filename: report.filename
       }));
       
       toast.success("Professional report generated! Click 'Download DOCX' to edit it.");
@@ -527,12 +533,12 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
 
     setSubmittingFinal(true);
     try {
-      const response = await axiosInstance.post(`/training-reports/${selectedSession.id}/submit-final`);
+      const report = await runJob(axiosInstance.post(`/training-reports/${selectedSession.id}/submit-final`));
       
       setProfessionalReportStatus(prev => ({
         ...prev,
         pdf_submitted: true,
-        pdf_filename: response.data.pdf_filename
+        pdf_filename: report.pdf_filename
       }));
       
       toast.success("Final report submitted successfully! PDF has been sent to supervisors and admins.");
@@ -1539,23 +1545,34 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
                           <h3 className="font-semibold text-lg">AI-Powered Report (Optional)</h3>
                           <p className="text-sm text-gray-600">Quick text-based report generation</p>
                         </div>
-                        <Button
-                          onClick={handleGenerateAIReport}
-                          disabled={generatingReport}
-                          style={{ backgroundColor: primaryColor }}
-                        >
-                          {generatingReport ? (
-                            <>
-                              <div className="animate-spin rounded-full h-4 w-4 border-b-2 border-white mr-2"></div>
-                              Generating...
-                            </>
-                          ) : (
-                            <>
-                              <Sparkles className="w-4 h-4 mr-2" />
-                              Generate AI Report
-                            </>
+                        <div className="flex gap-2">
+                          {aiGeneratedReport && (
+                            <Button
+                              variant="outline"
+                              onClick={() => handleGenerateAIReport(true)}
+                              disabled={generatingReport}
+                            >
+                              Regenerate
+                            </Button>
                           )}
-                        </Button>
+                          <Button
+                            onClick={() => handleGenerateAIReport()}
+                            disabled={generatingReport}
+                            style={{ backgroundColor: primaryColor }}
+                          >
+                            {generatingReport ? (
+                              <>
+                                <div className="animate-spin rounded-full h-4 w-4 border-b-2 border-white mr-2"></div>
+                                Generating...
+                              </>
+                            ) : (
+                              <>
+                                <Sparkles className="w-4 h-4 mr-2" />
+                                Generate AI Report
+                              </>
+                            )}
+                          </Button>
+                        </div>
                       </div>
 
                       <Textarea
@@ -1920,7 +1937,7 @@ const CoordinatorDashboard = ({ user, onLogout }) => {
                                 if (!selectedSession) return;
                                 setGeneratingDOCX(true);
                                 try {
-                                  await axiosInstance.post(`/training-reports/${selectedSession.id}/generate-docx`);
+                                  await runJob(axiosInstance.post(`/training-reports/${selectedSession.id}/generate-docx`));
                                   toast.success("Report generated! Click download to get the file.");
                                   setProfessionalReportStatus({...professionalReportStatus, docx_generated: true});
                                 } catch (error) {
@@ -1,6 +1,6 @@
 import { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
-import { axiosInstance } from "../App";
+import { axiosInstance, runJob } from "../App";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { Label } from "@/components/ui/label";
@@ -110,8 +110,8 @@ const ParticipantDashboard = ({ user, onLogout }) => {
 
   const handleDownloadCertificate = async (sessionId) => {
     try {
-      const response = await axiosInstance.post(`/certificates/generate/${sessionId}/${user.id}`);
-      const certificateUrl = response.data.certificate_url;
+      const certificate = await runJob(axiosInstance.post(`/certificates/generate/${sessionId}/${user.id}`));
+      const certificateUrl = certificate.certificate_url;
       
       // Fetch the PDF as blob
       const pdfResponse = await axiosInstance.get(certificateUrl, {
@@ -178,8 +178,8 @@ const ParticipantDashboard = ({ user, onLogout }) => {
   const handlePreviewCertificate = async (sessionId) => {
     try {
       // First generate/get the certificate
-      const response = await axiosInstance.post(`/certificates/generate/${sessionId}/${user.id}`);
-      const certificateUrl = response.data.certificate_url;
+      const certificate = await runJob(axiosInstance.post(`/certificates/generate/${sessionId}/${user.id}`));
+      const certificateUrl = certificate.certificate_url;
       
       // Open PDF in new tab - simple and reliable
       window.open(`${process.env.REACT_APP_BACKEND_URL}${certificateUrl}`, '_blank');
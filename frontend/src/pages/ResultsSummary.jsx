@@ -4,7 +4,7 @@ import { axiosInstance } from "../App";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { toast } from "sonner";
-import { ArrowLeft, ChevronDown, ChevronRight, CheckCircle, XCircle } from "lucide-react";
+import { ArrowLeft, ChevronDown, ChevronRight, CheckCircle, XCircle, Download } from "lucide-react";
 
 const ResultsSummary = () => {
   const { sessionId } = useParams();
@@ -29,6 +29,25 @@ const ResultsSummary = () => {
     }
   };
 
+  const handleExportCsv = async () => {
+    try {
+      const response = await axiosInstance.get(`/sessions/${sessionId}/results-summary`, {
+        params: { format: "csv", sort_by: "name", order: "asc" },
+        responseType: "blob",
+      });
+      const url = window.URL.createObjectURL(new Blob([response.data], { type: "text/csv" }));
+      const link = document.createElement("a");
+      link.href = url;
+      link.download = `results_${summary.session_name.replace(/\s+/g, "_")}.csv`;
+      document.body.appendChild(link);
+      link.click();
+      document.body.removeChild(link);
+      window.URL.revokeObjectURL(url);
+    } catch (error) {
+      toast.error("Failed to export results");
+    }
+  };
+
   const loadDetailedResult = async (resultId) => {
     try {
       const response = await axiosInstance.get(`/tests/results/${resultId}`);
@@ -64,14 +83,20 @@ const ResultsSummary = () => {
       <div className="max-w-7xl mx-auto px-4 sm:px-6 lg:px-8">
         {/* Header */}
         <div className="mb-6">
-          <Button
-            variant="outline"
-            onClick={() => navigate(-1)}
-            data-testid="back-button"
-          >
-            <ArrowLeft className="w-4 h-4 mr-2" />
-            Back
-          </Button>
+          <div className="flex justify-between">
+            <Button
+              variant="outline"
+              onClick={() => navigate(-1)}
+              data-testid="back-button"
+            >
+              <ArrowLeft className="w-4 h-4 mr-2" />
+              Back
+            </Button>
+            <Button variant="outline" onClick={handleExportCsv} data-testid="export-csv-button">
+              <Download className="w-4 h-4 mr-2" />
+              Export CSV
+            </Button>
+          </div>
           <h1 className="text-3xl font-bold text-gray-900 mt-4">{summary.session_name}</h1>
           <p className="text-gray-600">Results Summary - {summary.participants.length} Participants</p>
         </div>
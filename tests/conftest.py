@@ -0,0 +1,56 @@
+"""
+Shared setup for the backend tests.
+
+Unit tests import server.py directly and need no database. Integration tests take the
+`run_with_db` fixture, which runs a coroutine against a throwaway database on the MongoDB
+named by TEST_MONGO_URL and skips when that variable is not set.
+
+    TEST_MONGO_URL=mongodb://localhost:27017 python -m pytest -q tests
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+TEST_MONGO_URL = os.environ.get("TEST_MONGO_URL")
+
+# server.py connects lazily at import; never let it point at a real database by accident
+os.environ["MONGO_URL"] = TEST_MONGO_URL or "mongodb://localhost:27017"
+os.environ["DB_NAME"] = f"test_{uuid.uuid4().hex[:12]}"
+
+
+@pytest.fixture
+def run_with_db(monkeypatch):
+    """Run `test(db)` on a fresh database wired in as server.db, then drop that database"""
+    if not TEST_MONGO_URL:
+        pytest.skip("TEST_MONGO_URL is not set")
+    from motor.motor_asyncio import AsyncIOMotorClient
+    import server
+
+    def run(test, *modules):
+        async def main():
+            # Motor clients belong to the event loop they were created on
+            client = AsyncIOMotorClient(TEST_MONGO_URL)
+            db = client[f"test_{uuid.uuid4().hex[:12]}"]
+            for module in (server, *modules):
+                monkeypatch.setattr(module, "db", db)
+                if hasattr(module, "client"):
+                    monkeypatch.setattr(module, "client", client)
+            monkeypatch.setattr(server, "db_name", db.name)
+            server.user_cache.clear()
+            server.verified_unique_indexes.clear()
+            try:
+                return await test(db)
+            finally:
+                await client.drop_database(db.name)
+                client.close()
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+ADMIN = server.User(email="admin@example.com", full_name="Admin", id_number="A1", role="admin")
+
+
+def test_clock_out_filter_only_matches_an_open_clock_in():
+    assert server.attendance_clock_out_filter("u1", "s1", "2026-05-01") == {
+        "participant_id": "u1", "session_id": "s1", "date": "2026-05-01",
+        "clock_in": {"$ne": None}, "clock_out": None
+    }
+
+
+def test_clock_in_update_only_matches_a_row_without_clock_in():
+    attendance_filter, update = server.attendance_clock_in_update("u1", "s1", "2026-05-01", "08:00:00")
+
+    assert attendance_filter == {"participant_id": "u1", "session_id": "s1", "date": "2026-05-01", "clock_in": None}
+    assert update["$set"] == {"clock_in": "08:00:00"}
+    assert set(update["$setOnInsert"]) == {"id", "clock_out", "created_at"}
+    assert update["$setOnInsert"]["clock_out"] is None
+
+
+@pytest.mark.parametrize("action, role, status_code", [
+    ("clock_sideways", "admin", 400),
+    ("clock_in", "participant", 403),
+    ("clock_out", "trainer", 403),
+])
+def test_batch_rejects_bad_actions_and_roles(action, role, status_code):
+    batch = server.AttendanceBatch(session_id="s1", action=action, participant_ids=["u1"])
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.batch_attendance(batch, current_user=ADMIN.model_copy(update={"role": role})))
+    assert error.value.status_code == status_code
+
+
+def today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+async def seed_session(db):
+    await server.reconcile_indexes(create_missing=True)
+    await db.sessions.insert_one({"id": "s1", "coordinator_id": "coord", "participant_ids": ["u1", "u2", "u3", "u4"]})
+    await db.users.insert_many([
+        {"id": f"u{index}", "id_number": f"IC{index}", "role": "participant"} for index in (1, 2, 3, 4, 5)
+    ])
+    await server.get_session_stats("s1")
+
+
+def statuses(response: dict) -> list:
+    return [(outcome.get("participant_id") or outcome.get("id_number"), outcome["status"]) for outcome in response["outcomes"]]
+
+
+def test_batch_clock_in_reports_an_outcome_per_participant(run_with_db):
+    async def test(db):
+        await seed_session(db)
+        await db.attendance.insert_one({"participant_id": "u2", "session_id": "s1", "date": today(), "clock_in": "07:00:00", "clock_out": None})
+        await db.attendance.insert_one({"participant_id": "u3", "session_id": "s1", "date": "2000-01-01", "clock_in": "07:00:00"})
+        await server.rebuild_session_stats("s1")
+        response = await server.batch_attendance(server.AttendanceBatch(
+            session_id="s1", action="clock_in",
+            participant_ids=["u1", "u2", "u5", "u1"], id_numbers=["IC3", "IC9"]
+        ), current_user=ADMIN)
+        return response, await server.get_session_stats("s1")
+
+    response, stats = run_with_db(test)
+
+    assert statuses(response) == [
+        ("u1", "clocked_in"), ("u2", "already_clocked_in"), ("u5", "not_in_session"),
+        ("u1", "duplicate"), ("u3", "clocked_in"), ("IC9", "not_found"),
+    ]
+    assert response["recorded"] == 2
+    # u2 was already counted before the batch; u3 had attended on an earlier day
+    assert stats["attendance"] == {"participants": 3, "clock_ins": 4, "clock_outs": 0}
+
+
+def test_batch_clock_out_counts_only_rows_it_closed(run_with_db):
+    async def test(db):
+        await seed_session(db)
+        await db.attendance.insert_many([
+            {"participant_id": "u1", "session_id": "s1", "date": today(), "clock_in": "08:00:00", "clock_out": None},
+            {"participant_id": "u2", "session_id": "s1", "date": today(), "clock_in": "08:00:00", "clock_out": "12:00:00"},
+        ])
+        await server.rebuild_session_stats("s1")
+        response = await server.batch_attendance(server.AttendanceBatch(
+            session_id="s1", action="clock_out", participant_ids=["u1", "u2", "u3"]
+        ), current_user=ADMIN)
+        return response, await server.get_session_stats("s1")
+
+    response, stats = run_with_db(test)
+
+    assert statuses(response) == [("u1", "clocked_out"), ("u2", "already_clocked_out"), ("u3", "not_clocked_in")]
+    assert response["recorded"] == 1
+    assert stats["attendance"]["clock_outs"] == 2
+
+
+def test_batch_clock_out_that_loses_a_race_is_not_counted(run_with_db, monkeypatch):
+    clock_out_filter = server.attendance_clock_out_filter
+    # The row changes between the pre-read and the conditional update, so the update matches nothing
+    monkeypatch.setattr(
+        server, "attendance_clock_out_filter",
+        lambda participant_id, session_id, date: {**clock_out_filter(participant_id, session_id, date), "id": "changed"}
+    )
+
+    async def test(db):
+        await seed_session(db)
+        await db.attendance.insert_one({"participant_id": "u1", "session_id": "s1", "date": today(), "clock_in": "08:00:00", "clock_out": None})
+        await server.rebuild_session_stats("s1")
+        response = await server.batch_attendance(server.AttendanceBatch(
+            session_id="s1", action="clock_out", participant_ids=["u1"]
+        ), current_user=ADMIN)
+        return response, await server.get_session_stats("s1")
+
+    response, stats = run_with_db(test)
+
+    assert response["recorded"] == 0
+    assert response["outcomes"][0]["status"] in ("not_clocked_in", "already_clocked_out")
+    assert stats["attendance"]["clock_outs"] == 0
+
+
+def test_coordinator_can_only_record_their_own_sessions(run_with_db):
+    async def test(db):
+        await seed_session(db)
+        other = ADMIN.model_copy(update={"id": "someone-else", "role": "coordinator"})
+        with pytest.raises(HTTPException) as error:
+            await server.batch_attendance(server.AttendanceBatch(session_id="s1", action="clock_in", participant_ids=["u1"]), current_user=other)
+        return error.value
+
+    assert run_with_db(test).status_code == 403
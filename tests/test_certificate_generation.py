@@ -0,0 +1,125 @@
+import io
+
+import pytest
+from docx import Document
+from fastapi import HTTPException
+
+import server
+
+COORDINATOR = server.User(id="coord", email="coord@example.com", full_name="Coordinator", id_number="C1", role="coordinator")
+
+
+def template_bytes(closing: str = "Congratulations") -> bytes:
+    document = Document()
+    document.add_paragraph("This certifies that «PARTICIPANT_NAME» («IC_NUMBER»)")
+    document.add_paragraph("completed <<PROGRAMME NAME>> at «VENUE» on «DATE»")
+    document.add_paragraph(closing)
+    table = document.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "«COMPANY_NAME»"
+    table.cell(0, 1).text = "Signature"
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+REPLACEMENTS = server.build_certificate_replacements(
+    {"full_name": "Aminah Binti Ali", "id_number": "900101-13-5678"},
+    {"location": "Kuching", "end_date": "2026-05-02"},
+    "Defensive Driving",
+    "Acme Haulage",
+)
+
+
+def test_replacements_cover_every_placeholder():
+    assert set(REPLACEMENTS) == set(server.CERTIFICATE_PLACEHOLDERS)
+
+
+def test_compiled_template_fills_paragraphs_and_table_cells():
+    template = server.CompiledCertificateTemplate(template_bytes())
+
+    rendered = Document(io.BytesIO(template.render(REPLACEMENTS)))
+
+    paragraphs = [paragraph.text for paragraph in rendered.paragraphs]
+    assert paragraphs[0] == "This certifies that Aminah Binti Ali (900101-13-5678)"
+    assert paragraphs[1] == "completed Defensive Driving at Kuching on 2026-05-02"
+    assert paragraphs[2] == "Congratulations"
+    assert [cell.text for cell in rendered.tables[0].rows[0].cells] == ["Acme Haulage", "Signature"]
+
+
+def test_renders_do_not_leak_into_each_other():
+    template = server.CompiledCertificateTemplate(template_bytes())
+
+    template.render(REPLACEMENTS)
+    second = Document(io.BytesIO(template.render({**REPLACEMENTS, "«PARTICIPANT_NAME»": "Badrul"})))
+
+    assert second.paragraphs[0].text.startswith("This certifies that Badrul ")
+
+
+def test_cache_key_depends_on_template_and_values_only():
+    template = server.CompiledCertificateTemplate(template_bytes())
+    same_template = server.CompiledCertificateTemplate(template_bytes())
+    other_template = server.CompiledCertificateTemplate(template_bytes(closing="Well done"))
+    reordered = dict(reversed(list(REPLACEMENTS.items())))
+
+    key = server.certificate_cache_key(template, REPLACEMENTS)
+
+    assert server.certificate_cache_key(same_template, reordered) == key
+    assert server.certificate_cache_key(other_template, REPLACEMENTS) != key
+    assert server.certificate_cache_key(template, {**REPLACEMENTS, "«DATE»": "2026-05-03"}) != key
+
+
+def test_session_batch_renders_eligible_participants_and_records_failures(run_with_db, monkeypatch):
+    template = server.CompiledCertificateTemplate(template_bytes())
+    monkeypatch.setattr(server, "get_certificate_template", lambda: template)
+    rendered = []
+
+    async def render_certificate_pdf(template, replacements, participant_id, session_id):
+        rendered.append(participant_id)
+        if participant_id == "u2":
+            raise HTTPException(status_code=500, detail="conversion failed")
+        return f"certificate_{participant_id}_{session_id}.pdf"
+    monkeypatch.setattr(server, "render_certificate_pdf", render_certificate_pdf)
+
+    async def test(db):
+        await db.programs.insert_one({"id": "p1", "name": "Defensive Driving"})
+        await db.companies.insert_one({"id": "c1", "name": "Acme Haulage"})
+        await db.sessions.insert_one({
+            "id": "s1", "program_id": "p1", "company_id": "c1", "coordinator_id": "coord",
+            "location": "Kuching", "end_date": "2026-05-02", "participant_ids": ["u1", "u2", "u3"]
+        })
+        await db.users.insert_many([
+            {"id": f"u{index}", "full_name": f"Participant {index}", "id_number": f"ID{index}"} for index in (1, 2, 3)
+        ])
+        await db.participant_access.insert_many([
+            {"participant_id": "u1", "session_id": "s1", "feedback_submitted": True},
+            {"participant_id": "u2", "session_id": "s1", "feedback_submitted": True},
+            {"participant_id": "u3", "session_id": "s1", "feedback_submitted": False},
+        ])
+        await db.certificates.insert_one({
+            "id": "existing", "participant_id": "u1", "session_id": "s1", "certificate_url": "/old.pdf"
+        })
+        result = await server.build_session_certificates({"session_id": "s1", "coordinator_id": "coord"}, COORDINATOR)
+        return result, await db.certificates.find({}, {"_id": 0}).to_list(None)
+
+    result, certificates = run_with_db(test)
+
+    assert sorted(rendered) == ["u1", "u2"]
+    assert (result["total"], result["completed"], result["failed"], result["skipped"]) == (2, 1, 1, 1)
+    assert result["errors"] == [{"participant_id": "u2", "participant_name": "Participant 2", "error": "conversion failed"}]
+    assert certificates == [{
+        "id": "existing", "participant_id": "u1", "session_id": "s1",
+        "certificate_url": "/api/static/certificates_pdf/certificate_u1_s1.pdf",
+        "issue_date": certificates[0]["issue_date"]
+    }]
+
+
+def test_session_batch_needs_a_template(run_with_db, monkeypatch):
+    monkeypatch.setattr(server, "get_certificate_template", lambda: None)
+
+    async def test(db):
+        await db.sessions.insert_one({"id": "s1", "program_id": "p1", "company_id": "c1", "participant_ids": []})
+        with pytest.raises(HTTPException) as error:
+            await server.build_session_certificates({"session_id": "s1", "coordinator_id": None}, COORDINATOR)
+        return error.value
+
+    assert run_with_db(test).status_code == 404
@@ -0,0 +1,121 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+ADMIN = server.User(email="admin@example.com", full_name="Admin", id_number="A1", role="admin")
+
+REPOSITORY_DEFAULTS = {
+    "search": None, "company_id": None, "program_id": None, "session_id": None,
+    "start_date": None, "end_date": None, "cursor": None, "limit": None
+}
+
+
+def test_repository_is_admin_only():
+    trainer = ADMIN.model_copy(update={"role": "trainer"})
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.get_certificates_repository(current_user=trainer, **REPOSITORY_DEFAULTS))
+    assert error.value.status_code == 403
+
+
+async def seed_certificates(db):
+    await db.companies.insert_many([{"id": "c1", "name": "Acme Haulage"}, {"id": "c2", "name": "Borneo Freight"}])
+    await db.programs.insert_one({"id": "p1", "name": "Defensive Driving"})
+    await db.sessions.insert_many([
+        {"id": "s1", "name": "Morning", "company_id": "c1", "program_id": "p1", "start_date": "2026-05-01", "end_date": "2026-05-02"},
+        {"id": "s2", "name": "Evening", "company_id": "c2", "program_id": "p1", "start_date": "2026-06-01", "end_date": "2026-06-02"},
+    ])
+    names = ["Aminah", "Badrul", "Chong", "Devi", "Eddie"]
+    await db.users.insert_many([
+        {"id": f"u{index}", "full_name": name, "id_number": f"90010{index}", "email": f"{name.lower()}@example.com"}
+        for index, name in enumerate(names)
+    ])
+    # Two uploads share a timestamp so the _id tiebreak is exercised
+    uploaded = ["2026-05-03", "2026-05-04", "2026-05-04", "2026-06-03", "2026-06-04"]
+    await db.participant_access.insert_many([
+        {"participant_id": f"u{index}", "session_id": "s1" if index < 3 else "s2",
+         "certificate_url": f"/api/static/certificates/u{index}.pdf", "certificate_uploaded_at": at}
+        for index, at in enumerate(uploaded)
+    ])
+    await db.participant_access.insert_one({"participant_id": "u0", "session_id": "s2", "certificate_url": None})
+
+
+async def all_pages(limit: int, **filters) -> tuple:
+    """Participant ids across every page, and the set of totals the pages reported"""
+    ids, cursor, totals = [], None, set()
+    while True:
+        page = await server.get_certificates_repository(
+            current_user=ADMIN, **{**REPOSITORY_DEFAULTS, **filters, "cursor": cursor, "limit": limit}
+        )
+        ids += [certificate["participant_id"] for certificate in page["certificates"]]
+        totals.add(page["total"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids, totals
+
+
+def test_unpaginated_call_returns_the_full_list(run_with_db):
+    async def test(db):
+        await seed_certificates(db)
+        return await server.get_certificates_repository(current_user=ADMIN, **REPOSITORY_DEFAULTS)
+
+    certificates = run_with_db(test)
+
+    assert isinstance(certificates, list)
+    assert len(certificates) == 5
+    first = certificates[0]
+    assert first["participant_id"] == "u4"
+    assert (first["participant_name"], first["company_name"], first["program_name"]) == ("Eddie", "Borneo Freight", "Defensive Driving")
+    assert first["uploaded_at"] == "2026-06-04"
+    assert "cursor_id" not in first
+
+
+def test_keyset_pages_match_the_full_list(run_with_db):
+    async def test(db):
+        await seed_certificates(db)
+        full = await server.get_certificates_repository(current_user=ADMIN, **REPOSITORY_DEFAULTS)
+        return [certificate["participant_id"] for certificate in full], await all_pages(limit=2)
+
+    full, (paged, totals) = run_with_db(test)
+
+    assert paged == full
+    assert len(set(paged)) == 5
+    assert totals == {5}
+
+
+def test_filters_resolve_sessions_and_participants_first(run_with_db):
+    async def test(db):
+        await seed_certificates(db)
+        return (
+            await all_pages(limit=2, company_id="c1"),
+            await all_pages(limit=2, search="DEVI"),
+            await all_pages(limit=2, session_id="s2"),
+            await all_pages(limit=2, start_date="2026-05-15"),
+            await all_pages(limit=2, search="nobody"),
+        )
+
+    by_company, by_search, by_session, by_date, no_match = run_with_db(test)
+
+    assert sorted(by_company[0]) == ["u0", "u1", "u2"]
+    assert by_search == (["u3"], {1})
+    assert by_session[0] == ["u4", "u3"]
+    assert by_date[0] == ["u4", "u3"]
+    assert no_match == ([], {0})
+
+
+def test_stream_yields_one_json_row_per_certificate(run_with_db):
+    async def test(db):
+        await seed_certificates(db)
+        response = await server.stream_certificates_repository(
+            current_user=ADMIN, search=None, company_id="c2", program_id=None, session_id=None, start_date=None, end_date=None
+        )
+        return [chunk async for chunk in response.body_iterator]
+
+    lines = run_with_db(test)
+
+    rows = [json.loads(line) for line in lines]
+    assert all(line.endswith("\n") for line in lines)
+    assert [row["participant_id"] for row in rows] == ["u4", "u3"]
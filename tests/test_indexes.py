@@ -0,0 +1,110 @@
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import server
+
+
+def test_index_key_normalises_text_indexes_and_directions():
+    assert server._index_key({"session_id": 1.0, "date": -1}) == (("session_id", 1), ("date", -1))
+    assert server._index_key({"session_id": 1, "search_text": "text", "notes": "text"}) == (
+        ("session_id", 1), ("_fts", "text"), ("_ftsx", 1)
+    )
+
+
+@pytest.mark.parametrize("collection_name", list(server.DEDUPE_RULES))
+def test_every_dedupe_rule_backs_a_registered_unique_index(collection_name):
+    key_fields, _ = server.DEDUPE_RULES[collection_name]
+    unique_keys = [
+        tuple(model.document["key"]) for model in server.INDEX_REGISTRY[collection_name]
+        if model.document.get("unique")
+    ]
+    assert tuple(key_fields) in unique_keys
+
+
+def test_attendance_merge_keeps_the_widest_clock_window():
+    rows = [
+        {"clock_in": "08:05", "clock_out": None},
+        {"clock_in": "08:00", "clock_out": "16:00"},
+        {"clock_in": None, "clock_out": "17:30"},
+    ]
+    assert server.merge_attendance_duplicates(rows) == {"clock_in": "08:00", "clock_out": "17:30"}
+    assert server.merge_attendance_duplicates([{"clock_in": None}]) == {"clock_in": None, "clock_out": None}
+
+
+def test_access_merge_ors_flags_and_takes_the_latest_certificate():
+    rows = [
+        {"can_access_pre_test": True, "certificate_url": "/old.pdf", "certificate_uploaded_at": "2026-01-01", "certificate_uploaded_by": "a"},
+        {"post_test_completed": True, "certificate_url": "/new.pdf", "certificate_uploaded_at": "2026-02-01", "certificate_uploaded_by": "b"},
+        {"feedback_submitted": False},
+    ]
+    merged = server.merge_access_duplicates(rows)
+
+    assert merged["can_access_pre_test"] is True
+    assert merged["post_test_completed"] is True
+    assert merged["feedback_submitted"] is False
+    assert set(server.ACCESS_STAT_FIELDS) <= set(merged)
+    assert (merged["certificate_url"], merged["certificate_uploaded_by"]) == ("/new.pdf", "b")
+
+
+def test_access_merge_without_uploads_leaves_certificate_fields_alone():
+    assert "certificate_url" not in server.merge_access_duplicates([{}, {"can_access_checklist": True}])
+
+
+def test_certificate_merge_takes_the_latest_issue():
+    rows = [
+        {"certificate_url": "/a.pdf", "issue_date": "2026-03-01"},
+        {"certificate_url": "/b.pdf", "issue_date": "2026-04-01"},
+        {"certificate_url": "/c.pdf", "issue_date": None},
+    ]
+    assert server.merge_certificate_duplicates(rows) == {"certificate_url": "/b.pdf", "issue_date": "2026-04-01"}
+
+
+def test_dedupe_merges_duplicates_and_unblocks_the_unique_indexes(run_with_db):
+    async def test(db):
+        key = {"participant_id": "p1", "session_id": "s1", "date": "2026-05-01"}
+        kept_id, extra_id = ObjectId(), ObjectId()
+        await db.attendance.insert_many([
+            {"_id": kept_id, **key, "clock_in": "08:10", "clock_out": None},
+            {"_id": extra_id, **key, "clock_in": "08:00", "clock_out": "16:00"},
+        ])
+        await db.users.insert_many([
+            {"id": "u-old", "email": "dup@example.com", "created_at": "2026-01-01", "is_active": True},
+            {"id": "u-new", "email": "dup@example.com", "created_at": "2026-02-01", "is_active": True},
+        ])
+
+        dry_run = await server.dedupe_unique_keys(apply=False)
+        untouched = await db.attendance.count_documents({})
+        report = await server.dedupe_unique_keys(apply=True)
+        indexes = await server.reconcile_indexes(create_missing=True)
+        return (
+            dry_run, untouched, report, indexes, kept_id,
+            await db.attendance.find({}).to_list(None),
+            await db.users.find_one({"id": "u-new"}),
+        )
+
+    dry_run, untouched, report, indexes, kept_id, attendance, duplicate_user = run_with_db(test)
+
+    assert untouched == 2
+    assert len(dry_run["attendance"]) == 1
+    assert report["sessions"] == ["s1"]
+    assert report["users"] == [{"email": "dup@example.com", "kept": "u-old", "deactivated": ["u-new"]}]
+    assert [(row["_id"], row["clock_in"], row["clock_out"]) for row in attendance] == [(kept_id, "08:00", "16:00")]
+    assert duplicate_user["is_active"] is False
+    assert duplicate_user["email"].startswith("duplicate-")
+    assert indexes["failed"] == []
+    assert "attendance.participant_session_date_unique" in indexes["created"]
+
+
+def test_require_unique_index_refuses_writes_until_the_index_exists(run_with_db):
+    async def test(db):
+        with pytest.raises(HTTPException) as error:
+            await server.require_unique_index("attendance", "participant_session_date_unique")
+        await server.reconcile_indexes(create_missing=True)
+        await server.require_unique_index("attendance", "participant_session_date_unique")
+        return error.value
+
+    error = run_with_db(test)
+
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "30"
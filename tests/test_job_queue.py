@@ -0,0 +1,244 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+OWNER = server.User(id="owner", email="owner@example.com", full_name="Owner", id_number="O1", role="coordinator")
+
+
+def test_dedupe_key_ignores_param_order_but_not_type_or_values():
+    key = server.job_dedupe_key("docx_report", {"session_id": "s1", "format": "docx"})
+
+    assert server.job_dedupe_key("docx_report", {"format": "docx", "session_id": "s1"}) == key
+    assert server.job_dedupe_key("ai_report", {"session_id": "s1", "format": "docx"}) != key
+    assert server.job_dedupe_key("docx_report", {"session_id": "s2", "format": "docx"}) != key
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"upstream returned {status_code}")
+        self.status_code = status_code
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (server.PermanentJobError("no API key"), False),
+    (HTTPException(status_code=404, detail="Session not found"), False),
+    (HTTPException(status_code=503, detail="Office pool busy"), True),
+    (HTTPException(status_code=500, detail="Conversion failed"), True),
+    (UpstreamError(401), False),
+    (UpstreamError(408), True),
+    (UpstreamError(429), True),
+    (UpstreamError(502), True),
+    (ValueError("bad data"), False),
+    (KeyError("missing"), False),
+    (RuntimeError("connection reset"), True),
+])
+def test_job_retryable(error, retryable):
+    assert server.job_retryable(error) is retryable
+
+
+def test_can_read_job():
+    job = {"type": "docx_report", "params": {"session_id": "s1"}, "created_by": "owner"}
+    participant = OWNER.model_copy(update={"id": "p1", "role": "participant"})
+
+    assert server.can_read_job(job, OWNER)
+    assert server.can_read_job(job, participant.model_copy(update={"role": "admin"}))
+    assert server.can_read_job(job, OWNER.model_copy(update={"id": "other-coordinator"}))
+    assert not server.can_read_job(job, participant)
+    assert not server.can_read_job({**job, "type": "unregistered"}, participant)
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+    """Register test job types for the duration of a test"""
+    def register(job_type: str, handler):
+        monkeypatch.setitem(server.JOB_HANDLERS, job_type, handler)
+    return register
+
+
+async def prepare(db):
+    await server.reconcile_indexes(create_missing=True)
+    doc = OWNER.model_dump()
+    doc["created_at"] = doc["created_at"].isoformat()
+    await db.users.insert_one(doc)
+    return server.JobQueue(1)
+
+
+def test_enqueue_returns_the_active_job_for_the_same_params(run_with_db, handlers):
+    async def handler(params, current_user):
+        return {"echo": params["value"]}
+    handlers("echo", handler)
+
+    async def test(db):
+        queue = await prepare(db)
+        first = await queue.enqueue("echo", {"value": 1}, OWNER)
+        again = await queue.enqueue("echo", {"value": 1}, OWNER)
+        await queue.execute(await queue.claim())
+        other = await queue.enqueue("echo", {"value": 2}, OWNER)
+        after_finish = await queue.enqueue("echo", {"value": 1}, OWNER)
+        return first, again, other, after_finish, await db.jobs.find_one({"id": first["id"]}, {"_id": 0})
+
+    first, again, other, after_finish, finished = run_with_db(test)
+
+    assert again["id"] == first["id"]
+    assert other["id"] != first["id"]
+    assert finished["status"] == "completed"
+    assert finished["result"] == {"echo": 1}
+    assert "dedupe_key" not in finished
+    assert after_finish["id"] != first["id"]
+
+
+def test_concurrent_enqueues_settle_on_one_job(run_with_db, handlers):
+    handlers("echo", None)
+
+    async def test(db):
+        queue = await prepare(db)
+        jobs = await asyncio.gather(*(queue.enqueue("echo", {"value": 1}, OWNER) for _ in range(5)))
+        return {job["id"] for job in jobs}, await db.jobs.count_documents({})
+
+    ids, stored = run_with_db(test)
+
+    assert len(ids) == 1
+    assert stored == 1
+
+
+def test_claim_leases_the_job_and_fences_stale_workers(run_with_db, handlers):
+    handlers("echo", None)
+
+    async def test(db):
+        queue = await prepare(db)
+        job = await queue.enqueue("echo", {"value": 1}, OWNER)
+        first = await queue.claim()
+        while_leased = await queue.claim()
+
+        # The first worker stalls past its lease and another worker takes the job over
+        expired = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat()
+        await db.jobs.update_one({"id": job["id"]}, {"$set": {"lease_until": expired}})
+        second = await queue.claim()
+
+        stale_progress = server.current_job.set(first)
+        await server.report_job_progress({"$set": {"progress": {"done": 99}}})
+        server.current_job.reset(stale_progress)
+        stale_finish = await queue.finish(first, {"status": "completed", "result": "stale"})
+        current_finish = await queue.finish(second, {"status": "completed", "result": "fresh"})
+        return first, while_leased, second, stale_finish, current_finish, await db.jobs.find_one({"id": job["id"]}, {"_id": 0})
+
+    first, while_leased, second, stale_finish, current_finish, stored = run_with_db(test)
+
+    assert first["status"] == "running" and first["attempts"] == 1
+    assert while_leased is None
+    assert second["attempts"] == 2
+    assert second["claim_id"] != first["claim_id"]
+    assert stale_finish is False
+    assert current_finish is True
+    assert stored["result"] == "fresh"
+    assert stored["progress"] is None
+
+
+def test_transient_failures_are_retried_with_backoff_and_permanent_ones_fail(run_with_db, handlers, monkeypatch):
+    monkeypatch.setattr(server, "JOB_RETRY_BASE_SECONDS", 30)
+
+    async def flaky(params, current_user):
+        raise RuntimeError("connection reset")
+
+    async def broken(params, current_user):
+        raise server.PermanentJobError("AI report generation is not configured")
+    handlers("flaky", flaky)
+    handlers("broken", broken)
+
+    async def test(db):
+        queue = await prepare(db)
+        flaky_job = await queue.enqueue("flaky", {}, OWNER)
+        await queue.execute(await queue.claim())
+        broken_job = await queue.enqueue("broken", {}, OWNER)
+        await queue.execute(await queue.claim())
+        return (
+            await db.jobs.find_one({"id": flaky_job["id"]}, {"_id": 0}),
+            await db.jobs.find_one({"id": broken_job["id"]}, {"_id": 0}),
+            queue.stats,
+        )
+
+    retried, failed, stats = run_with_db(test)
+
+    assert retried["status"] == "queued"
+    assert retried["error"] == "connection reset"
+    assert retried["run_after"] > (datetime.now(timezone.utc) + timedelta(seconds=20)).isoformat()
+    assert "dedupe_key" in retried
+    assert failed["status"] == "failed"
+    assert failed["attempts"] == 1
+    assert "dedupe_key" not in failed
+    assert (stats["retried"], stats["failed"]) == (1, 1)
+
+
+def test_a_job_over_its_attempts_is_failed_without_running(run_with_db, handlers):
+    ran = []
+
+    async def handler(params, current_user):
+        ran.append(params)
+    handlers("echo", handler)
+
+    async def test(db):
+        queue = await prepare(db)
+        job = await queue.enqueue("echo", {}, OWNER)
+        await db.jobs.update_one({"id": job["id"]}, {"$set": {"attempts": job["max_attempts"]}})
+        await queue.execute(await queue.claim())
+        return await db.jobs.find_one({"id": job["id"]}, {"_id": 0})
+
+    stored = run_with_db(test)
+
+    assert ran == []
+    assert stored["status"] == "failed"
+
+
+def test_cancelling_stops_the_handler_and_keeps_the_cancelled_status(run_with_db, handlers, monkeypatch):
+    monkeypatch.setattr(server, "JOB_POLL_SECONDS", 0.05)
+    started = []
+
+    async def slow(params, current_user):
+        started.append(True)
+        await asyncio.sleep(60)
+        return "too late"
+    handlers("slow", slow)
+
+    async def test(db):
+        queue = await prepare(db)
+        job = await queue.enqueue("slow", {}, OWNER)
+        claimed = await queue.claim()
+        run = asyncio.create_task(queue.run(claimed))
+        while not started:
+            await asyncio.sleep(0.01)
+        await db.jobs.update_one({"id": job["id"]}, {"$set": {"status": "cancelled"}})
+        await asyncio.wait_for(run, timeout=5)
+        return await db.jobs.find_one({"id": job["id"]}, {"_id": 0}), queue.stats
+
+    stored, stats = run_with_db(test)
+
+    assert stored["status"] == "cancelled"
+    assert stored["result"] is None
+    assert stats["cancelled"] == 1
+
+
+def test_shutdown_hands_the_job_back_without_counting_the_attempt(run_with_db, handlers):
+    started = []
+
+    async def slow(params, current_user):
+        started.append(True)
+        await asyncio.sleep(60)
+    handlers("slow", slow)
+
+    async def test(db):
+        queue = await prepare(db)
+        job = await queue.enqueue("slow", {}, OWNER)
+        queue.start()
+        while not started:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return await db.jobs.find_one({"id": job["id"]}, {"_id": 0})
+
+    stored = run_with_db(test)
+
+    assert stored["status"] == "queued"
+    assert stored["attempts"] == 0
@@ -0,0 +1,124 @@
+import pytest
+from fastapi import HTTPException
+
+import server
+
+ADMIN = server.User(email="admin@example.com", full_name="Admin", id_number="A1", role="admin")
+
+
+@pytest.fixture(autouse=True)
+def fast_hashing(monkeypatch):
+    """bcrypt is not what these tests are about"""
+    async def hash_passwords(passwords):
+        return [f"hashed:{password}" for password in passwords]
+    monkeypatch.setattr(server, "hash_passwords", hash_passwords)
+
+
+def row(email: str, full_name: str, id_number: str, **fields) -> dict:
+    return {"email": email, "full_name": full_name, "id_number": id_number, "password": "secret", **fields}
+
+
+async def insert_user(db, email: str, full_name: str, id_number: str) -> str:
+    user = server.User(email=email, full_name=full_name, id_number=id_number, role="participant")
+    doc = user.model_dump()
+    doc["created_at"] = doc["created_at"].isoformat()
+    await db.users.insert_one(doc)
+    return user.id
+
+
+def test_new_rows_are_created_once_per_person(run_with_db):
+    async def test(db):
+        results = await server.provision_users([
+            (row("a@example.com", "Alice", "1"), "participant"),
+            (row("b@example.com", "Bob", "2"), "participant"),
+            (row("a@example.com", "Alice", "1", phone_number="0123"), "pic_supervisor"),
+        ], company_id="c1")
+        return results, await db.users.find({}, {"_id": 0}).to_list(None)
+
+    results, users = run_with_db(test)
+
+    assert [result["is_existing"] for result in results] == [False, False, True]
+    assert results[0]["user"].id == results[2]["user"].id
+    assert len(users) == 2
+    alice = next(user for user in users if user["email"] == "a@example.com")
+    assert alice["phone_number"] == "0123"
+    assert alice["password"] == "hashed:secret"
+    assert alice["company_id"] == "c1"
+
+
+def test_existing_user_is_matched_and_updated(run_with_db):
+    async def test(db):
+        user_id = await insert_user(db, "old@example.com", "Carol", "3")
+        results = await server.provision_users([(row("new@example.com", "Carol", "3"), "participant")], company_id="c2")
+        return user_id, results, await db.users.find_one({"id": user_id}, {"_id": 0})
+
+    user_id, results, stored = run_with_db(test)
+
+    assert results[0]["is_existing"] is True
+    assert results[0]["conflict"] is None
+    assert results[0]["user"].id == user_id
+    assert stored["email"] == "new@example.com"
+    assert stored["company_id"] == "c2"
+
+
+def test_email_owned_by_another_user_reuses_that_user(run_with_db):
+    async def test(db):
+        owner_id = await insert_user(db, "shared@example.com", "Dana", "4")
+        other_id = await insert_user(db, "erin@example.com", "Erin", "5")
+        results = await server.provision_users([(row("shared@example.com", "Erin", "5"), "participant")], company_id="c1")
+        other = await db.users.find_one({"id": other_id}, {"_id": 0})
+        return owner_id, results, other
+
+    owner_id, results, other = run_with_db(test)
+
+    assert results[0]["user"].id == owner_id
+    assert "Dana" in results[0]["conflict"] and "Erin" in results[0]["conflict"]
+    assert other["email"] == "erin@example.com"
+
+
+def test_failed_bulk_write_removes_the_users_it_inserted(run_with_db, monkeypatch):
+    async def test(db):
+        await db.users.create_index("email", unique=True)
+
+        async def hash_passwords(passwords):
+            # A concurrent request takes one of the emails between resolution and the write
+            await insert_user(db, "late@example.com", "Someone Else", "99")
+            return [f"hashed:{password}" for password in passwords]
+        monkeypatch.setattr(server, "hash_passwords", hash_passwords)
+
+        with pytest.raises(HTTPException) as error:
+            await server.provision_users([
+                (row("f@example.com", "Frank", "6"), "participant"),
+                (row("late@example.com", "Gina", "7"), "participant"),
+            ], company_id="c1")
+        return error.value, sorted(user["email"] async for user in db.users.find({}))
+
+    error, emails = run_with_db(test)
+
+    assert error.status_code == 400
+    assert "row 2" in error.detail
+    assert emails == ["late@example.com"]
+
+
+def test_create_session_counts_its_participants(run_with_db):
+    async def test(db):
+        existing_id = await insert_user(db, "h@example.com", "Hana", "8")
+        session_data = server.SessionCreate(
+            name="Session", program_id="p1", company_id="c1", location="Here",
+            start_date="2026-01-01", end_date="2026-01-02",
+            participant_ids=[existing_id],
+            participants=[server.ParticipantData(**row("i@example.com", "Ivan", "9"))],
+        )
+        response = await server.create_session(session_data, current_user=ADMIN)
+        session_id = response["session"].id
+        return (
+            response,
+            await db.session_stats.find_one({"session_id": session_id}),
+            await db.participant_access.count_documents({"session_id": session_id}),
+        )
+
+    response, stats, access_count = run_with_db(test)
+
+    assert response["participant_results"] == [{"name": "Ivan", "email": "i@example.com", "is_existing": False}]
+    assert access_count == 2
+    assert stats["participants"] == 2
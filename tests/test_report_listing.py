@@ -0,0 +1,134 @@
+import asyncio
+import base64
+import json
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+import server
+
+ADMIN = server.User(email="admin@example.com", full_name="Admin", id_number="A1", role="admin")
+
+
+def test_page_cursor_round_trips():
+    object_id = ObjectId()
+    cursor = server.encode_page_cursor(["2026-05-01T08:00:00", str(object_id)])
+
+    assert "+" not in cursor and "/" not in cursor
+    assert server.decode_page_cursor(cursor) == ("2026-05-01T08:00:00", object_id)
+
+
+def test_page_cursor_keeps_a_missing_sort_value():
+    object_id = ObjectId()
+    assert server.decode_page_cursor(server.encode_page_cursor([None, str(object_id)])) == (None, object_id)
+
+
+def encoded(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    encoded({"submitted_at": "2026-05-01"}),
+    encoded(["2026-05-01"]),
+    encoded(["2026-05-01", "not-an-object-id"]),
+    encoded(["2026-05-01", 12]),
+    encoded(["2026-05-01", str(ObjectId()), "extra"]),
+])
+def test_malformed_cursors_are_rejected_with_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        server.decode_page_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_listing_is_admin_only():
+    participant = ADMIN.model_copy(update={"role": "participant"})
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.get_all_training_reports(current_user=participant))
+    assert error.value.status_code == 403
+
+
+async def seed_reports(db):
+    await server.reconcile_indexes(create_missing=True)
+    await db.companies.insert_many([{"id": "c1", "name": "Acme Haulage"}, {"id": "c2", "name": "Borneo Freight"}])
+    await db.programs.insert_one({"id": "p1", "name": "Defensive Driving"})
+    await db.sessions.insert_many([
+        {"id": "s1", "name": "Morning", "company_id": "c1", "program_id": "p1", "location": "Kuching",
+         "start_date": "2026-05-01", "end_date": "2026-05-02", "participant_ids": ["u1", "u2"]},
+        {"id": "s2", "name": "Evening", "company_id": "c2", "program_id": "p1", "location": "Miri",
+         "start_date": "2026-06-01", "end_date": "2026-06-02", "participant_ids": ["u3"]},
+    ])
+    # Seven reports, two of them sharing a submitted_at so the _id tiebreak is exercised
+    submitted = ["2026-05-03", "2026-05-04", "2026-05-04", "2026-05-05", "2026-06-03", "2026-06-04", "2026-06-05"]
+    await db.training_reports.insert_many([
+        {"id": f"r{index}", "session_id": "s1" if index < 4 else "s2", "status": "submitted", "submitted_at": at}
+        for index, at in enumerate(submitted)
+    ])
+    await db.training_reports.insert_many([
+        {"id": "draft", "session_id": "s1", "status": "draft", "submitted_at": "2026-05-06"},
+        {"id": "orphan", "session_id": "deleted", "status": "submitted", "submitted_at": "2026-05-07"},
+    ])
+    await server.refresh_report_listing_fields({})
+
+
+LISTING_DEFAULTS = {"search": None, "company_id": None, "program_id": None, "status": None, "start_date": None, "end_date": None}
+
+
+async def all_pages(limit: int, **filters) -> tuple:
+    """Report ids across every page, and the set of totals the pages reported"""
+    ids, cursor, totals = [], None, set()
+    while True:
+        page = await server.get_all_training_reports(
+            current_user=ADMIN, limit=limit, cursor=cursor, **{**LISTING_DEFAULTS, **filters}
+        )
+        ids += [report["id"] for report in page["reports"]]
+        totals.add(page["total"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids, totals
+
+
+def test_keyset_pages_cover_every_report_once_newest_first(run_with_db):
+    async def test(db):
+        await seed_reports(db)
+        return await all_pages(limit=2), await all_pages(limit=50)
+
+    (paged, totals), (single, _) = run_with_db(test)
+
+    assert paged == single
+    assert len(paged) == len(set(paged)) == 7
+    assert paged[0] == "r6" and paged[-1] == "r0"
+    assert totals == {7}
+
+
+def test_listing_filters_run_on_the_denormalized_fields(run_with_db):
+    async def test(db):
+        await seed_reports(db)
+        return (
+            await all_pages(limit=2, company_id="c2"),
+            await all_pages(limit=2, search="Kuching"),
+            await all_pages(limit=2, start_date="2026-05-15"),
+            await all_pages(limit=2, status="draft"),
+        )
+
+    by_company, by_search, by_date, drafts = run_with_db(test)
+
+    assert by_company == (["r6", "r5", "r4"], {3})
+    assert sorted(by_search[0]) == ["r0", "r1", "r2", "r3"]
+    assert by_date[0] == ["r6", "r5", "r4"]
+    assert drafts[0] == ["draft"]
+
+
+def test_page_rows_carry_the_joined_details(run_with_db):
+    async def test(db):
+        await seed_reports(db)
+        return await server.get_all_training_reports(current_user=ADMIN, limit=1, cursor=None, **LISTING_DEFAULTS)
+
+    page = run_with_db(test)
+    report = page["reports"][0]
+
+    assert (report["company_name"], report["program_name"], report["session_name"]) == ("Borneo Freight", "Defensive Driving", "Evening")
+    assert report["participant_count"] == 1
+    assert "_id" not in report and "search_text" not in report
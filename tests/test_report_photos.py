@@ -0,0 +1,86 @@
+import base64
+
+import pytest
+
+import manage
+import server
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+
+def data_url(content: bytes, mime_type: str = "image/png") -> str:
+    return f"data:{mime_type};base64,{base64.b64encode(content).decode()}"
+
+
+@pytest.fixture
+def photos_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "REPORT_PHOTOS_DIR", tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize("value", [None, "", "/api/static/report-photos/abc.png", "https://example.com/a.png"])
+def test_non_data_urls_are_returned_unchanged(photos_dir, value):
+    assert server.store_report_photo(value) == value
+    assert list(photos_dir.iterdir()) == []
+
+
+def test_photo_is_stored_under_its_content_hash(photos_dir):
+    url = server.store_report_photo(data_url(PNG_BYTES))
+
+    filename = url.rsplit("/", 1)[1]
+    assert url.startswith("/api/static/report-photos/")
+    assert filename.endswith(".png")
+    assert (photos_dir / filename).read_bytes() == PNG_BYTES
+
+
+def test_storing_the_same_photo_twice_keeps_one_file(photos_dir):
+    first = server.store_report_photo(data_url(PNG_BYTES))
+    second = server.store_report_photo(data_url(PNG_BYTES))
+
+    assert first == second
+    assert len(list(photos_dir.iterdir())) == 1
+
+
+@pytest.mark.parametrize("value", [
+    "data:image/png,notbase64",
+    "data:image/png;base64,",
+    "data:image/png;base64,@@@@",
+    data_url(b"hello", "text/plain"),
+])
+def test_malformed_photos_are_rejected(photos_dir, value):
+    with pytest.raises(ValueError):
+        server.store_report_photo(value)
+    assert list(photos_dir.iterdir()) == []
+
+
+def test_store_report_photos_only_touches_photo_fields(photos_dir):
+    report = {
+        "session_id": "s1",
+        "notes": data_url(PNG_BYTES),
+        server.TRAINING_REPORT_PHOTO_FIELDS[0]: data_url(PNG_BYTES),
+        server.TRAINING_REPORT_PHOTO_FIELDS[1]: None,
+    }
+
+    server.store_report_photos(report)
+
+    assert report[server.TRAINING_REPORT_PHOTO_FIELDS[0]].startswith("/api/static/report-photos/")
+    assert report[server.TRAINING_REPORT_PHOTO_FIELDS[1]] is None
+    assert report["notes"].startswith("data:")
+
+
+def test_migrate_report_photos_rewrites_inline_photos(run_with_db, photos_dir):
+    field = server.TRAINING_REPORT_PHOTO_FIELDS[0]
+
+    async def test(db):
+        await db.training_reports.insert_many([
+            {"session_id": "inline", field: data_url(PNG_BYTES)},
+            {"session_id": "stored", field: "/api/static/report-photos/old.png"},
+        ])
+        await manage.migrate_report_photos(None)
+        return {report["session_id"]: report[field] async for report in db.training_reports.find({})}
+
+    photos = run_with_db(test, manage)
+
+    assert photos["inline"].startswith("/api/static/report-photos/")
+    assert photos["stored"] == "/api/static/report-photos/old.png"
+    assert len(list(photos_dir.iterdir())) == 1
@@ -0,0 +1,149 @@
+import server
+
+COUNTERS = ("participants", "released", "completed", "tests", "attendance", "checklists", "feedback")
+
+
+def counters(stats: dict) -> dict:
+    return {key: stats[key] for key in COUNTERS}
+
+
+def test_summary_derives_averages_and_rates():
+    stats = server.empty_session_stats("s1")
+    stats["participants"] = 4
+    stats["tests"]["pre"] = {"count": 4, "passed": 1, "score_total": 200.0}
+    stats["tests"]["post"] = {"count": 2, "passed": 2, "score_total": 170.0}
+    stats["completed"]["feedback"] = 3
+
+    summary = server.summarize_session_stats(stats)
+
+    assert summary["pre_test"] == {"count": 4, "passed": 1, "average_score": 50.0, "pass_rate": 25.0}
+    assert summary["post_test"] == {"count": 2, "passed": 2, "average_score": 85.0, "pass_rate": 100.0}
+    assert summary["improvement"] == 35.0
+    assert summary["feedback_submitted"] == 3
+
+
+def test_summary_of_an_empty_session_has_no_division_by_zero():
+    summary = server.summarize_session_stats(server.empty_session_stats("s1"))
+    assert summary["pre_test"]["average_score"] == 0
+    assert summary["improvement"] == 0
+
+
+async def seed_session(db):
+    await db.sessions.insert_one({"id": "s1", "participant_ids": ["u1", "u2", "u3"]})
+    await db.participant_access.insert_many([
+        {"participant_id": "u1", "session_id": "s1", "can_access_pre_test": True, "pre_test_completed": True, "feedback_submitted": True},
+        {"participant_id": "u2", "session_id": "s1", "can_access_pre_test": True},
+        {"participant_id": "u3", "session_id": "s1"},
+    ])
+    await db.test_results.insert_many([
+        {"session_id": "s1", "participant_id": "u1", "test_type": "pre", "score": 80.0, "passed": True},
+        {"session_id": "s1", "participant_id": "u2", "test_type": "pre", "score": 40.0, "passed": False},
+    ])
+    await db.attendance.insert_many([
+        {"session_id": "s1", "participant_id": "u1", "date": "2026-05-01", "clock_in": "08:00", "clock_out": "17:00"},
+        {"session_id": "s1", "participant_id": "u1", "date": "2026-05-02", "clock_in": "08:00", "clock_out": None},
+        {"session_id": "s1", "participant_id": "u2", "date": "2026-05-01", "clock_in": None},
+    ])
+    await db.vehicle_checklists.insert_one({"session_id": "s1", "checklist_items": [{"status": "needs_repair"}, {"status": "good"}]})
+    await db.course_feedback.insert_one({"session_id": "s1"})
+
+
+def test_first_read_builds_stats_from_the_source_collections(run_with_db):
+    async def test(db):
+        await seed_session(db)
+        return await server.get_session_stats("s1")
+
+    stats = run_with_db(test)
+
+    assert stats["participants"] == 3
+    assert stats["released"]["pre_test"] == 2
+    assert stats["completed"] == {"pre_test": 1, "post_test": 0, "checklist": 0, "feedback": 1}
+    assert stats["tests"]["pre"] == {"count": 2, "passed": 1, "score_total": 120.0}
+    assert stats["attendance"] == {"participants": 1, "clock_ins": 2, "clock_outs": 1}
+    assert stats["checklists"] == {"submitted": 1, "needs_repair": 1}
+    assert stats["feedback"] == {"responses": 1}
+    assert stats["version"] == 0
+
+
+def test_access_flag_changes_keep_counters_in_step_with_a_rebuild(run_with_db):
+    async def test(db):
+        await seed_session(db)
+        await server.get_session_stats("s1")
+        await server.update_access_flags("u3", "s1", {"can_access_pre_test": True, "pre_test_completed": True})
+        await server.update_access_flags("u1", "s1", {"can_access_pre_test": True})  # already set: no change
+        await server.update_access_flags("u4", "s1", {"feedback_submitted": True}, upsert=True)
+        changed = await server.set_session_access_flag("s1", "can_access_post_test", True)
+        bumped = await server.get_session_stats("s1")
+        await server.rebuild_session_stats("s1")
+        return changed, bumped, await server.get_session_stats("s1")
+
+    changed, bumped, rebuilt = run_with_db(test)
+
+    assert changed == 4
+    assert bumped["version"] == 3
+    assert bumped["participants"] == 4
+    assert bumped["released"]["pre_test"] == 3
+    assert bumped["released"]["post_test"] == 4
+    assert bumped["completed"]["feedback"] == 2
+    assert counters(bumped) == counters(rebuilt)
+
+
+def test_bumps_before_the_first_read_are_not_lost(run_with_db):
+    async def test(db):
+        await seed_session(db)
+        # No stats document yet: the bump is dropped and the first read counts the row instead
+        await server.update_access_flags("u4", "s1", {"can_access_checklist": True}, upsert=True)
+        return await server.get_session_stats("s1")
+
+    stats = run_with_db(test)
+
+    assert stats["participants"] == 4
+    assert stats["released"]["checklist"] == 1
+
+
+def test_rebuild_recomputes_sessions_bumped_while_it_ran(run_with_db, monkeypatch):
+    compute_session_stats = server.compute_session_stats
+    calls = []
+
+    async def racing_compute(session_ids, match):
+        stats = await compute_session_stats(session_ids, match)
+        calls.append(list(session_ids))
+        if len(calls) == 1:
+            # A write lands after the aggregation read the collections but before the $set
+            await server.update_access_flags("u4", "s1", {"feedback_submitted": True}, upsert=True)
+        return stats
+
+    async def test(db):
+        await seed_session(db)
+        await server.get_session_stats("s1")
+        monkeypatch.setattr(server, "compute_session_stats", racing_compute)
+        rebuilt = await server.rebuild_session_stats("s1")
+        return rebuilt, await server.get_session_stats("s1")
+
+    rebuilt, stats = run_with_db(test)
+
+    assert rebuilt == 1
+    assert calls == [["s1"], ["s1"]]
+    assert stats["participants"] == 4
+    assert stats["completed"]["feedback"] == 2
+
+
+def test_rebuild_gives_up_on_sessions_that_never_settle(run_with_db, monkeypatch):
+    compute_session_stats = server.compute_session_stats
+
+    async def always_racing(session_ids, match):
+        stats = await compute_session_stats(session_ids, match)
+        await server.bump_session_stats("s1", {"feedback.responses": 1})
+        return stats
+
+    async def test(db):
+        await seed_session(db)
+        await server.get_session_stats("s1")
+        monkeypatch.setattr(server, "compute_session_stats", always_racing)
+        return await server.rebuild_session_stats("s1"), await server.get_session_stats("s1")
+
+    rebuilt, stats = run_with_db(test)
+
+    assert rebuilt == 0
+    # The counters were left as the bumps made them rather than overwritten with a stale read
+    assert stats["feedback"]["responses"] == 1 + server.SESSION_STATS_REBUILD_ATTEMPTS
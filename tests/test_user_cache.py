@@ -0,0 +1,117 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import server
+
+
+@pytest.fixture(autouse=True)
+def empty_user_cache():
+    server.user_cache.clear()
+    yield
+    server.user_cache.clear()
+
+
+def make_user(**fields) -> server.User:
+    return server.User(**{
+        "email": "participant@example.com",
+        "full_name": "Test Participant",
+        "id_number": "900101-01-1234",
+        "role": "participant",
+        **fields
+    })
+
+
+def bearer(data: dict, expires_delta: timedelta = timedelta(minutes=5)) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=server.create_access_token(data, expires_delta))
+
+
+def test_cache_hit_returns_a_copy():
+    user = make_user()
+    server.user_cache[user.id] = user
+
+    loaded = asyncio.run(server.load_authenticated_user(user.id))
+    loaded.role = "admin"
+
+    assert loaded is not user
+    assert server.user_cache[user.id].role == "participant"
+
+
+def test_get_user_by_id_returns_a_copy():
+    user = make_user()
+    server.user_cache[user.id] = user
+
+    loaded = asyncio.run(server.get_user_by_id(user.id))
+
+    assert loaded == user
+    assert loaded is not user
+
+
+def test_invalidate_cached_user():
+    first, second = make_user(), make_user(email="other@example.com")
+    server.user_cache[first.id] = first
+    server.user_cache[second.id] = second
+
+    server.invalidate_cached_user(first.id)
+    assert first.id not in server.user_cache
+    assert second.id in server.user_cache
+
+    server.invalidate_cached_user()
+    assert len(server.user_cache) == 0
+
+
+def test_get_current_user_serves_cached_user():
+    user = make_user()
+    server.user_cache[user.id] = user
+
+    current = asyncio.run(server.get_current_user(bearer({"sub": user.id})))
+
+    assert current == user
+
+
+@pytest.mark.parametrize("data, expires_delta", [
+    ({"sub": "someone"}, timedelta(seconds=-1)),
+    ({"sub": "someone", "scope": "download", "path": "/api/certificates/export-zip"}, timedelta(minutes=5)),
+    ({"role": "admin"}, timedelta(minutes=5)),
+])
+def test_get_current_user_rejects_unusable_tokens(data, expires_delta):
+    server.user_cache["someone"] = make_user(id="someone")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.get_current_user(bearer(data, expires_delta)))
+
+    assert error.value.status_code == 401
+
+
+def test_cache_miss_loads_from_the_database_until_invalidated(run_with_db):
+    user = make_user()
+
+    async def test(db):
+        doc = user.model_dump()
+        doc["created_at"] = doc["created_at"].isoformat()
+        await db.users.insert_one({**doc, "password": "hashed"})
+
+        first = await server.load_authenticated_user(user.id)
+        await db.users.update_one({"id": user.id}, {"$set": {"role": "trainer"}})
+        cached = await server.load_authenticated_user(user.id)
+        server.invalidate_cached_user(user.id)
+        reloaded = await server.load_authenticated_user(user.id)
+        return first, cached, reloaded
+
+    first, cached, reloaded = run_with_db(test)
+
+    assert first.role == "participant"
+    assert cached.role == "participant"
+    assert reloaded.role == "trainer"
+
+
+def test_unknown_user_is_rejected(run_with_db):
+    async def test(db):
+        with pytest.raises(HTTPException) as error:
+            await server.load_authenticated_user("missing")
+        return error.value
+
+    assert run_with_db(test).status_code == 401